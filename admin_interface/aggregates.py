@@ -0,0 +1,59 @@
+from django.db.models import Count, Q, F, Window
+from django.db.models.functions import RowNumber
+
+ATTENDANCE_STATUSES = ['present', 'absent', 'late', 'excused']
+
+
+def empty_attendance_counts():
+    """Counts for a student with no attendance records"""
+    counts = {status: 0 for status in ATTENDANCE_STATUSES}
+    counts['total_records'] = 0
+    return counts
+
+
+def attendance_counts(queryset, group_by='student_id'):
+    """
+    Total and per-status attendance counts for every group in one
+    GROUP BY query using conditional COUNTs.
+    Returns a dict keyed by the group_by value.
+    """
+    conditional_counts = {
+        status: Count('id', filter=Q(status=status))
+        for status in ATTENDANCE_STATUSES
+    }
+    rows = queryset.order_by().values(group_by).annotate(
+        total_records=Count('id'),
+        **conditional_counts
+    )
+    return {
+        row.pop(group_by): row
+        for row in rows
+    }
+
+
+def attendance_percentage(counts):
+    """Share of recorded days the student was present"""
+    total = counts['total_records']
+    return round(counts['present'] / total * 100, 2) if total > 0 else 0
+
+
+def recent_attendance(queryset, limit=10, partition_by='student_id'):
+    """
+    Latest `limit` attendance records per student fetched with a single
+    ROW_NUMBER() window query. Returns a dict of student id -> records
+    ordered newest first.
+    """
+    records = queryset.annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F(partition_by)],
+            order_by=F('date').desc()
+        )
+    ).filter(row_number__lte=limit).select_related(
+        'student', 'recorded_by'
+    ).order_by(partition_by, '-date')
+
+    grouped = {}
+    for record in records:
+        grouped.setdefault(getattr(record, partition_by), []).append(record)
+    return grouped
@@ -0,0 +1,112 @@
+import numpy as np
+from django.core.cache import cache
+from .caching import cache_is_shared
+from .models import ExamResult
+from .transactions import on_commit_once
+
+ANALYTICS_CACHE_TIMEOUT = 60 * 60
+PERCENTILES = [25, 50, 75, 90]
+HISTOGRAM_BINS = np.arange(0, 110, 10)
+
+
+def analytics_cache_key(school_id, year, term):
+    return f"exam-analytics:{school_id}:{year}:{term}"
+
+
+def invalidate_exam_analytics(school_id, year, term):
+    """
+    Drop cached analytics for one (school, year, term) slice once the
+    current transaction commits. Deleting earlier would let a request that
+    reads before the commit cache the old marks again.
+    """
+    key = analytics_cache_key(school_id, year, term)
+    on_commit_once(('exam-analytics', key), lambda: cache.delete(key))
+
+
+def describe(marks):
+    """Summary statistics and a 10-point histogram for an array of marks"""
+    counts, _ = np.histogram(marks, bins=HISTOGRAM_BINS)
+    percentiles = np.percentile(marks, PERCENTILES)
+    return {
+        'count': int(marks.size),
+        'mean': round(float(marks.mean()), 2),
+        'median': round(float(np.median(marks)), 2),
+        'std': round(float(marks.std()), 2),
+        'min': round(float(marks.min()), 2),
+        'max': round(float(marks.max()), 2),
+        'percentiles': {
+            f"p{p}": round(float(value), 2)
+            for p, value in zip(PERCENTILES, percentiles)
+        },
+        'histogram': {
+            'bins': HISTOGRAM_BINS.tolist(),
+            'counts': counts.tolist(),
+        },
+    }
+
+
+def _groups(keys, marks):
+    """Yield (key, marks) for each distinct key, using one sort over all rows"""
+    labels, inverse = np.unique(keys, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    boundaries = np.flatnonzero(np.diff(inverse[order])) + 1
+    for label, group in zip(labels, np.split(marks[order], boundaries)):
+        yield label, group
+
+
+def compute_exam_analytics(school_id, year, term):
+    """
+    Per class, per class and subject, and school-wide per subject statistics
+    for one term, computed with NumPy over a single values_list query.
+    """
+    rows = list(
+        ExamResult.objects.filter(school_id=school_id, year=year, term=term)
+        .values_list('student__class_assigned', 'subject', 'marks')
+    )
+    result = {
+        'school': str(school_id),
+        'year': year,
+        'term': term,
+        'result_count': len(rows),
+        'classes': [],
+        'subjects': [],
+    }
+    if not rows:
+        return result
+
+    classes = np.array([row[0] or '' for row in rows], dtype=object).astype(str)
+    subjects = np.array([row[1] for row in rows], dtype=object).astype(str)
+    marks = np.array([row[2] for row in rows], dtype=float)
+
+    for class_name, class_marks in _groups(classes, marks):
+        mask = classes == class_name
+        result['classes'].append({
+            'class_name': class_name or None,
+            'overall': describe(class_marks),
+            'subjects': [
+                {'subject': subject, **describe(subject_marks)}
+                for subject, subject_marks in _groups(subjects[mask], marks[mask])
+            ],
+        })
+
+    result['subjects'] = [
+        {'subject': subject, **describe(subject_marks)}
+        for subject, subject_marks in _groups(subjects, marks)
+    ]
+    return result
+
+
+def get_exam_analytics(school_id, year, term):
+    """
+    Cached analytics for a (school, year, term) slice. Computed on every
+    call when the cache is private to each process, since results saved
+    through other workers could not invalidate it.
+    """
+    if not cache_is_shared():
+        return compute_exam_analytics(school_id, year, term)
+    key = analytics_cache_key(school_id, year, term)
+    analytics = cache.get(key)
+    if analytics is None:
+        analytics = compute_exam_analytics(school_id, year, term)
+        cache.set(key, analytics, ANALYTICS_CACHE_TIMEOUT)
+    return analytics
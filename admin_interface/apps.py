@@ -6,6 +6,9 @@ class AdminInterfaceConfig(AppConfig):
     name = 'admin_interface'
     
     def ready(self):
+        # Keep the per-school statistics counters in sync with model changes
+        from . import signals  # noqa: F401
+
         # Import the management command and run it during startup
         import os
         from django.core.management import call_command
@@ -0,0 +1,135 @@
+import statistics
+import time
+from django.db import connection
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import ExamResult, Role, Student, User
+
+# (name, role of the requesting user, url name, url kwargs, query params)
+# Values in braces are filled from the school being benchmarked.
+ENDPOINTS = [
+    ('school-statistics', Role.ADMIN, 'school-statistics', {}, {}),
+    ('student-list', Role.ADMIN, 'student-list', {}, {}),
+    ('teacher-list', Role.ADMIN, 'teacher-list', {}, {}),
+    ('parent-list', Role.ADMIN, 'parent-list', {}, {}),
+    ('notification-list', Role.ADMIN, 'notification-list', {}, {}),
+    ('event-list', Role.ADMIN, 'school-event-list', {}, {}),
+    ('product-list', Role.PARENT, 'product-list', {}, {}),
+    ('exam-results', Role.ADMIN, 'exam-results', {}, {'year': '{year}', 'term': '{term}'}),
+    ('exam-analytics', Role.ADMIN, 'exam-analytics', {}, {'year': '{year}', 'term': '{term}'}),
+    ('rankings', Role.ADMIN, 'ranking-list', {}, {'year': '{year}', 'term': '{term}'}),
+    ('student-detail', Role.ADMIN, 'comprehensive-student-detail', {'student_id': '{student}'}, {}),
+    ('attendance-list', Role.TEACHER, 'attendance-list', {}, {}),
+    ('message-inbox', Role.TEACHER, 'message-inbox', {}, {}),
+    ('parent-children', Role.PARENT, 'parent-children', {}, {}),
+    ('parent-me', Role.PARENT, 'parent-me', {}, {}),
+    ('parent-exam-results', Role.PARENT, 'parent-exam-results', {}, {}),
+    ('parent-attendance-summary', Role.PARENT, 'parent-attendance-summary', {}, {}),
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def benchmark_context(school):
+    """Users and sample ids the endpoints are requested with"""
+    users = {
+        role: User.objects.filter(school=school, role=role, is_active=True).order_by('email').first()
+        for role in (Role.ADMIN, Role.TEACHER, Role.PARENT)
+    }
+    # Parents with children exercise the per-child paths
+    users[Role.PARENT] = User.objects.filter(
+        school=school, role=Role.PARENT, children__isnull=False
+    ).order_by('email').first() or users[Role.PARENT]
+
+    latest = ExamResult.objects.filter(school=school).aggregate(year=Max('year'))['year']
+    term = (
+        ExamResult.objects.filter(school=school, year=latest).order_by('-term').values_list('term', flat=True).first()
+        if latest else None
+    )
+    student = Student.objects.filter(school=school).order_by('id').values_list('id', flat=True).first()
+    return users, {'year': latest, 'term': term, 'student': student}
+
+
+def _fill(values, context):
+    return {key: value.format(**context) for key, value in values.items()}
+
+
+def _time_requests(client, url, query, iterations, **headers):
+    """Latencies in ms, the last response and its query count"""
+    timings = []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url, query, **headers)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings, response, len(queries)
+
+
+def _latency(timings):
+    return {
+        'mean_ms': round(statistics.mean(timings), 2),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'min_ms': round(min(timings), 2),
+        'max_ms': round(max(timings), 2),
+    }
+
+
+def run_benchmarks(school, iterations=20, warmup=2, names=None):
+    """
+    Request each endpoint in ENDPOINTS as a user of `school` and record
+    latency percentiles and the number of queries of one request.
+    Endpoints that return an ETag are also timed revalidating with
+    If-None-Match, reported under `not_modified`.
+    Endpoints whose user or sample data is missing are reported as skipped.
+    """
+    users, context = benchmark_context(school)
+    results = []
+    for name, role, url_name, kwargs, params in ENDPOINTS:
+        if names and name not in names:
+            continue
+        user = users.get(role)
+        missing = [key for key, value in context.items() if value is None and (
+            f'{{{key}}}' in str(kwargs) or f'{{{key}}}' in str(params)
+        )]
+        if user is None or missing:
+            reason = f"no {role} user" if user is None else f"no {', '.join(missing)} in this school"
+            results.append({'name': name, 'skipped': reason})
+            continue
+
+        client = APIClient(HTTP_HOST='localhost')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        url = reverse(url_name, kwargs=_fill(kwargs, context))
+        query = _fill(params, context)
+
+        for _ in range(warmup):
+            client.get(url, query)
+
+        timings, response, queries = _time_requests(client, url, query, iterations)
+        result = {
+            'name': name,
+            'method': 'GET',
+            'url': url,
+            'params': query,
+            'role': role,
+            'status': response.status_code,
+            'queries': queries,
+            'response_bytes': len(response.content),
+            'iterations': iterations,
+            **_latency(timings),
+        }
+
+        if response.has_header('ETag'):
+            timings, response, queries = _time_requests(
+                client, url, query, iterations, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+            result['not_modified'] = {'status': response.status_code, 'queries': queries, **_latency(timings)}
+        results.append(result)
+    return results
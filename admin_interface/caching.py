@@ -0,0 +1,13 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def cache_is_shared():
+    """
+    Whether every process sees the default cache. An in-memory cache is
+    private to the process that wrote it: a write handled by one worker
+    (or a management command) could not invalidate what other workers
+    hold, so results that rely on invalidation are not cached there.
+    """
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
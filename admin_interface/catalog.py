@@ -0,0 +1,53 @@
+import hashlib
+from django.core.cache import cache
+from .caching import cache_is_shared
+from .conditional import bump_version, get_version
+from .models import Product
+
+CATALOG_CACHE_TIMEOUT = 60 * 60
+# Fields the cached catalog is built from; stock is overlaid per request
+CATALOG_FIELDS = ('name', 'description', 'price', 'image', 'image_variants', 'school_id')
+
+
+def catalog_snapshot(product):
+    """Catalog field values of a product, read without touching deferred fields"""
+    values = product.__dict__
+    if any(field not in values for field in CATALOG_FIELDS):
+        return None
+    return tuple(str(values[field]) if field == 'image' else values[field] for field in CATALOG_FIELDS)
+
+
+def invalidate_catalog(school_id):
+    """Build a school's catalog afresh once the current transaction commits"""
+    bump_version('product-catalog', school_id)
+
+
+def catalog_cache_key(school_id, base_url):
+    # Image URLs are absolute, so each host gets its own copy
+    host = hashlib.md5(base_url.encode()).hexdigest()
+    return f"product-catalog:{school_id}:{get_version('product-catalog', school_id)}:{host}"
+
+
+def get_catalog(school_id, base_url, build):
+    """
+    A school's serialized products from the cache, built with `build` on a
+    miss. Built on every call when the cache is private to each process,
+    since changes made in other workers could not invalidate it.
+    """
+    if not cache_is_shared():
+        return list(build())
+    key = catalog_cache_key(school_id, base_url)
+    products = cache.get(key)
+    if products is None:
+        products = [dict(product) for product in build()]
+        cache.set(key, products, CATALOG_CACHE_TIMEOUT)
+    return products
+
+
+def with_current_stock(products):
+    """Serialized products with their stock read fresh in one narrow query"""
+    stock = {
+        str(pk): level
+        for pk, level in Product.objects.filter(id__in=[product['id'] for product in products]).values_list('id', 'stock')
+    }
+    return [{**product, 'stock': stock.get(product['id'], product['stock'])} for product in products]
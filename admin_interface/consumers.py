@@ -1,7 +1,13 @@
 import json
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils.dateparse import parse_datetime
+from .message_buffer import message_buffer
 from .models import Message, User
+from .notifications import notification_group, notifications_since, targets_for
 from .permissions import IsTeacher, IsParent
 
 class ChatConsumer(AsyncWebsocketConsumer):
@@ -18,6 +24,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
 
+        # Receiver id -> whether this user may message them, for the connection's lifetime
+        self.receiver_verdicts = {}
+
         self.room_name = f"user_{self.user.id}"
         await self.channel_layer.group_add(self.room_name, self.channel_name)
         await self.accept()
@@ -25,6 +34,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         if hasattr(self, 'room_name'):
             await self.channel_layer.group_discard(self.room_name, self.channel_name)
+        await message_buffer.flush()
 
     async def receive(self, text_data):
         try:
@@ -33,15 +43,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
             receiver_id = data["receiver_id"]
 
             # Validate receiver exists and is allowed to receive messages
-            if not await self.can_message_user(receiver_id):
+            allowed = self.receiver_verdicts.get(receiver_id)
+            if allowed is None:
+                allowed = await self.can_message_user(receiver_id)
+                self.receiver_verdicts[receiver_id] = allowed
+            if not allowed:
                 await self.send(text_data=json.dumps({
                     "error": "Invalid receiver or not allowed to message this user"
                 }))
                 return
 
-            # Save message to database
-            await self.save_message(message, receiver_id)
-
             # Send message to receiver's room
             await self.channel_layer.group_send(
                 f"user_{receiver_id}",
@@ -51,6 +62,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     "sender_id": str(self.user.id)
                 }
             )
+
+            # Persisted in batches by the write-behind buffer
+            await message_buffer.add(Message(
+                sender=self.user,
+                receiver_id=receiver_id,
+                content=message,
+                school_id=self.user.school_id
+            ))
         except Exception as e:
             await self.send(text_data=json.dumps({
                 "error": str(e)
@@ -63,14 +82,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
             "sender_id": event["sender_id"]
         }))
 
-    @database_sync_to_async
-    def save_message(self, content, receiver_id):
-        receiver = User.objects.get(id=receiver_id)
-        return Message.objects.create(
-            sender=self.user,
-            receiver=receiver,
-            content=content
-        )
+    async def unread_update(self, event):
+        """Forward changed unread counters of this user"""
+        await self.send(text_data=json.dumps({
+            "type": "unread_update",
+            "total_unread": event["total_unread"],
+            "conversations": event["conversations"]
+        }))
 
     @database_sync_to_async
     def can_message_user(self, receiver_id):
@@ -82,5 +100,66 @@ class ChatConsumer(AsyncWebsocketConsumer):
             elif self.user.role == 'parent':
                 return receiver.role == 'teacher'
             return False
-        except User.DoesNotExist:
-            return False 
\ No newline at end of file
+        except (User.DoesNotExist, ValidationError):
+            return False 
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes new notifications of the user's school to the audiences of their
+    role. Connect with `since=<ISO timestamp>` to first receive everything
+    created after that time; notifications may then arrive twice around the
+    switch to live delivery, so clients should ignore ids they already have.
+    """
+    async def connect(self):
+        self.user = self.scope["user"]
+        if self.user.is_anonymous or not targets_for(self.user):
+            await self.close()
+            return
+
+        # Join before catching up so nothing created meanwhile is missed
+        self.groups_joined = [
+            notification_group(self.user.school_id, target) for target in targets_for(self.user)
+        ]
+        for group in self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        since = query.get('since', [None])[0]
+        if since:
+            await self.catch_up(since)
+
+    async def disconnect(self, close_code):
+        for group in getattr(self, 'groups_joined', []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def catch_up(self, since):
+        try:
+            # An unescaped '+' of the UTC offset arrives as a space
+            since = parse_datetime(since.replace(' ', '+'))
+        except ValueError:
+            since = None
+        if since is None:
+            await self.send(text_data=json.dumps({"error": "since must be an ISO 8601 timestamp"}))
+            return
+
+        payloads, has_more = await self.missed_notifications(since)
+        for payload in payloads:
+            await self.send(text_data=payload)
+        await self.send(text_data=json.dumps({
+            "type": "catch_up",
+            "count": len(payloads),
+            # Older notifications were left out; fetch them from /api/notifications/
+            "has_more": has_more
+        }))
+
+    async def notification_message(self, event):
+        """Forward a notification, already serialized by the publisher"""
+        await self.send(text_data=event["payload"])
+
+    @database_sync_to_async
+    def missed_notifications(self, since):
+        return notifications_since(
+            self.user, since, getattr(settings, 'NOTIFICATION_CATCH_UP_LIMIT', 200)
+        )
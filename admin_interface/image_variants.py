@@ -0,0 +1,223 @@
+import io
+import logging
+import posixpath
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from .catalog import invalidate_catalog
+from .conditional import bump_version
+from .models import ImageVariantJob, Product, School, Teacher
+from .outbox import CLAIM_TIMEOUT, retry_delay
+
+logger = logging.getLogger(__name__)
+
+# Image field of each model that gets variants; they are stored in `<field>_variants`
+IMAGE_FIELDS = {
+    Product: 'image',
+    Teacher: 'profile_pic',
+    School: 'logo',
+}
+# Longest edge in pixels; smaller originals are never upscaled
+VARIANT_SIZES = {
+    'thumb': 160,
+    'medium': 640,
+    'large': 1280,
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variants_field(field):
+    return f'{field}_variants'
+
+
+def image_name(instance, field):
+    """Stored file name of an image field, read without touching deferred fields"""
+    value = instance.__dict__.get(field)
+    return str(value) if value else ''
+
+
+def enqueue_image_variants(instance, field):
+    """Queue (or requeue) variant generation for the file now in `field`"""
+    ImageVariantJob.objects.update_or_create(
+        model_label=instance._meta.label_lower,
+        object_id=str(instance.pk),
+        field=field,
+        defaults={
+            'source': image_name(instance, field),
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt_at': timezone.now(),
+            'last_error': '',
+            'completed_at': None,
+        }
+    )
+
+
+def variant_urls(instance, field, request=None):
+    """
+    URLs of the variants of the file currently in `field`, as
+    {size: {format: url}}; empty until the worker has processed that file
+    """
+    image = getattr(instance, field)
+    variants = getattr(instance, variants_field(field)) or {}
+    if not image or variants.get('source') != image.name:
+        return {}
+    urls = {}
+    for size, names in variants.get('sizes', {}).items():
+        urls[size] = {}
+        for image_format, name in names.items():
+            url = image.storage.url(name)
+            urls[size][image_format] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def render_variants(file):
+    """
+    Encode every size and format of an image as {size: {format: bytes}}.
+    The pixels are rotated upright from the EXIF orientation and written to
+    new files without EXIF, ICC or other metadata.
+    """
+    largest = max(VARIANT_SIZES.values())
+    with Image.open(file) as original:
+        if original.format == 'JPEG':
+            # Let the decoder downscale large camera photos while reading
+            original.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    rendered = {}
+    for size, edge in VARIANT_SIZES.items():
+        variant = image.copy()
+        variant.thumbnail((edge, edge), Image.LANCZOS)
+        variant.info = {}
+        rendered[size] = {}
+        for image_format, (pil_format, options) in VARIANT_FORMATS.items():
+            output = variant
+            if pil_format == 'JPEG' and variant.mode == 'RGBA':
+                # JPEG has no transparency, flatten onto white
+                output = Image.new('RGB', variant.size, (255, 255, 255))
+                output.paste(variant, mask=variant.getchannel('A'))
+            buffer = io.BytesIO()
+            output.save(buffer, pil_format, **options)
+            rendered[size][image_format] = buffer.getvalue()
+    return rendered
+
+
+def _variants_saved(instance):
+    """
+    A queryset update sends no signals, so expire the cached catalog and
+    product list ETag of a product's school here. No cached response shows
+    teacher or school images.
+    """
+    if isinstance(instance, Product):
+        invalidate_catalog(instance.school_id)
+        bump_version('products', instance.school_id)
+
+
+def generate_variants(job):
+    """
+    Write the variants of a job's image next to the original, record them
+    on the instance and delete the variants of the file it replaced.
+    Jobs whose record was deleted or whose file was replaced since are
+    skipped; a replacement queues its own job.
+    The variants are recorded with a queryset update, which skips the
+    model's save() validation and post_save signals.
+    """
+    model = apps.get_model(job.model_label)
+    instance = model.objects.filter(pk=job.object_id).first()
+    if instance is None:
+        return
+    image = getattr(instance, job.field)
+    if not image or image.name != job.source:
+        return
+
+    with image.open('rb'):
+        rendered = render_variants(image)
+
+    directory, filename = posixpath.split(image.name)
+    stem = posixpath.splitext(filename)[0]
+    sizes = {}
+    for size, formats in rendered.items():
+        sizes[size] = {
+            image_format: image.storage.save(
+                posixpath.join(directory, 'variants', f'{stem}_{size}.{image_format}'), ContentFile(data)
+            )
+            for image_format, data in formats.items()
+        }
+    current = {name for formats in sizes.values() for name in formats.values()}
+
+    # Only record them if the file was not replaced while they were rendered
+    updated = model.objects.filter(pk=instance.pk, **{job.field: image.name}).update(
+        **{variants_field(job.field): {'source': image.name, 'sizes': sizes}}
+    )
+    if not updated:
+        for name in current:
+            image.storage.delete(name)
+        return
+    _variants_saved(instance)
+
+    previous = getattr(instance, variants_field(job.field)) or {}
+    for formats in previous.get('sizes', {}).values():
+        for name in formats.values():
+            if name not in current:
+                image.storage.delete(name)
+
+
+def _claim_batch(batch_size):
+    """Lock due jobs (skipping those other workers hold) and push their next attempt past CLAIM_TIMEOUT"""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            ImageVariantJob.objects.select_for_update(skip_locked=True).filter(
+                status='pending',
+                next_attempt_at__lte=now
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        for job in batch:
+            job.next_attempt_at = now + CLAIM_TIMEOUT
+        ImageVariantJob.objects.bulk_update(batch, ['next_attempt_at'])
+    return batch
+
+
+def process_pending(batch_size=20, max_attempts=3):
+    """
+    Generate the variants of one batch of due jobs.
+    Failed jobs are rescheduled with exponential backoff and marked failed
+    after max_attempts. Returns (done, failed) counts for the batch.
+    """
+    batch = _claim_batch(batch_size)
+    done = failed = 0
+    for job in batch:
+        try:
+            generate_variants(job)
+        except Exception as e:
+            logger.error(f"Image variants for {job} failed: {e}")
+            job.attempts += 1
+            job.last_error = str(e)
+            if job.attempts >= max_attempts:
+                job.status = 'failed'
+            else:
+                job.next_attempt_at = timezone.now() + retry_delay(job.attempts)
+            failed += 1
+            continue
+        job.status = 'done'
+        job.completed_at = timezone.now()
+        job.last_error = ''
+        done += 1
+
+    # A job requeued by a new upload while this batch ran stays pending
+    for job in batch:
+        ImageVariantJob.objects.filter(pk=job.pk, source=job.source).update(
+            status=job.status,
+            attempts=job.attempts,
+            next_attempt_at=job.next_attempt_at,
+            last_error=job.last_error,
+            completed_at=job.completed_at
+        )
+    return done, failed
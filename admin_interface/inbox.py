@@ -0,0 +1,50 @@
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Q, Subquery, UUIDField, Value, When
+from django.db.models.functions import Coalesce
+from .models import Message, UnreadCounter
+
+
+def counterpart_of(user):
+    """The other participant of a message `user` sent or received"""
+    return Case(
+        When(sender_id=user.id, then=F('receiver_id')),
+        default=F('sender_id'),
+        output_field=UUIDField(),
+    )
+
+
+def conversation_heads(user):
+    """
+    The latest message of each of `user`'s conversations, annotated with the
+    counterpart's id and the user's unread count for it.
+
+    DISTINCT ON picks the latest message the user sent to each receiver and
+    the latest one received from each sender; a candidate is dropped when
+    the other direction has a newer message. The result is still a plain
+    Message queryset that can be keyset paginated on (created_at, id) and is
+    read in a single query.
+    """
+    messages = Message.objects.all()
+    if user.school_id:
+        messages = messages.filter(school_id=user.school_id)
+
+    latest_sent = messages.filter(sender=user, receiver__isnull=False).order_by(
+        'receiver_id', '-created_at', '-id'
+    ).distinct('receiver_id').values('id')
+    latest_received = messages.filter(receiver=user).order_by(
+        'sender_id', '-created_at', '-id'
+    ).distinct('sender_id').values('id')
+    newer_reply = messages.filter(
+        Q(created_at__gt=OuterRef('created_at')) | Q(created_at=OuterRef('created_at'), id__gt=OuterRef('id')),
+        sender_id=OuterRef('receiver_id'),
+        receiver_id=OuterRef('sender_id'),
+    )
+    unread = UnreadCounter.objects.filter(user_id=user.id, counterpart_id=OuterRef('counterpart_id'))
+
+    return Message.objects.filter(
+        Q(id__in=latest_sent) | Q(id__in=latest_received)
+    ).exclude(
+        Exists(newer_reply)
+    ).annotate(
+        counterpart_id=counterpart_of(user),
+        unread=Coalesce(Subquery(unread.values('count')[:1]), Value(0), output_field=IntegerField()),
+    ).select_related('sender', 'receiver')
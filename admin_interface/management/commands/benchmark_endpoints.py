@@ -0,0 +1,83 @@
+import json
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from admin_interface.benchmarks import ENDPOINTS, run_benchmarks
+from admin_interface.models import Attendance, ExamResult, School, Student
+
+
+class Command(BaseCommand):
+    help = 'Measure latency and query counts of the hot API endpoints and write them as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--school',
+            help='ID of the school to benchmark (default: the school with the most students)'
+        )
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per endpoint (default: 20)')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per endpoint (default: 2)')
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            dest='endpoints',
+            choices=[name for name, *_ in ENDPOINTS],
+            help='Only benchmark the given endpoint (can be repeated)'
+        )
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+
+        if options['school']:
+            try:
+                school = School.objects.get(id=options['school'])
+            except (School.DoesNotExist, ValidationError):
+                raise CommandError(f"School {options['school']} not found")
+        else:
+            school = School.objects.annotate(student_count=Count('students')).order_by('-student_count').first()
+            if school is None:
+                raise CommandError('No schools found, run populate_db first')
+
+        results = run_benchmarks(
+            school,
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            names=options['endpoints']
+        )
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'school': {
+                'id': str(school.id),
+                'name': school.name,
+                'students': Student.objects.filter(school=school).count(),
+                'exam_results': ExamResult.objects.filter(school=school).count(),
+                'attendance': Attendance.objects.filter(student__school=school).count(),
+            },
+            'results': results,
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+            for result in results:
+                if 'skipped' in result:
+                    self.stdout.write(self.style.WARNING(f"  - {result['name']}: skipped, {result['skipped']}"))
+                else:
+                    self.stdout.write(
+                        f"  - {result['name']}: {result['status']}, {result['queries']} queries, "
+                        f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms"
+                    )
+                    if 'not_modified' in result:
+                        not_modified = result['not_modified']
+                        self.stdout.write(
+                            f"    revalidated: {not_modified['status']}, {not_modified['queries']} queries, "
+                            f"p50 {not_modified['p50_ms']} ms, p95 {not_modified['p95_ms']} ms"
+                        )
+            self.stdout.write(self.style.SUCCESS(f"Wrote benchmark report to {options['output']}"))
+        else:
+            self.stdout.write(output)
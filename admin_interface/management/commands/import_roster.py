@@ -0,0 +1,57 @@
+import os
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from admin_interface.models import School
+from admin_interface.roster_import import RosterImportError, import_roster
+
+
+class Command(BaseCommand):
+    help = 'Import students and parents for a school from an XLSX or CSV roster'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the .xlsx or .csv roster file')
+        parser.add_argument(
+            '--school',
+            required=True,
+            help='ID of the school the students belong to'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows validated and written per transaction (default: 2000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file and report errors without writing anything'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            school = School.objects.get(id=options['school'])
+        except (School.DoesNotExist, ValidationError):
+            raise CommandError(f"School {options['school']} not found")
+
+        with open(options['path'], 'rb') as roster:
+            try:
+                report = import_roster(
+                    roster,
+                    os.path.basename(options['path']),
+                    school,
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run']
+                )
+            except RosterImportError as e:
+                raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f"  - row {error['row']}: {'; '.join(error['errors'])}"))
+
+        prefix = 'DRY RUN: ' if options['dry_run'] else ''
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}{report['total_rows']} rows read, {report['students_created']} students and "
+                f"{report['parents_created']} parents created, {report['error_count']} rows rejected"
+            )
+        )
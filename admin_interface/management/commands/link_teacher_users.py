@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+from admin_interface.models import Role, Teacher, User
+
+
+class Command(BaseCommand):
+    help = 'Link teacher profiles to the teacher User account with the same email'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many profiles would be linked without changing anything'
+        )
+
+    def handle(self, *args, **options):
+        unlinked = Teacher.objects.filter(user__isnull=True)
+        free_accounts = User.objects.filter(role=Role.TEACHER, teacher_profile__isnull=True)
+        accounts = free_accounts.filter(email=OuterRef('email')).values('id')[:1]
+        linkable = unlinked.filter(email__in=free_accounts.values('email'))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'DRY RUN - {linkable.count()} of {unlinked.count()} unlinked teacher profile(s) would be linked'
+            ))
+            return
+
+        # One UPDATE ... SET user_id = (SELECT ...) for every linkable profile
+        linked = linkable.update(user=Subquery(accounts))
+        remaining = Teacher.objects.filter(user__isnull=True)
+        for teacher in remaining.only('name', 'email'):
+            self.stdout.write(self.style.WARNING(f'  - {teacher.name} ({teacher.email}) has no teacher User account'))
+        self.stdout.write(self.style.SUCCESS(f'Linked {linked} teacher profile(s)'))
@@ -1,106 +1,297 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
 from faker import Faker
-from admin_interface.models import Teacher, Student, Parent, ExamResult, SchoolFee, Notification, User, Role
+from admin_interface.models import (
+    School, Teacher, Student, Parent, ExamResult, SchoolFee, Notification, Attendance, User, Role
+)
+from admin_interface.rankings import refresh_rankings
+from admin_interface.school_stats import rebuild_school_stats
 from django.contrib.auth.hashers import make_password
 import random
-from datetime import datetime, timedelta
+import time
+from datetime import date, timedelta
 import uuid
 
+SUBJECTS = ['Mathematics', 'English', 'Kiswahili', 'Science', 'Social Studies']
+TERMS = {
+    # term: (first month, last month) of the Kenyan school calendar
+    'Term 1': (1, 3),
+    'Term 2': (5, 7),
+    'Term 3': (9, 11),
+}
+GRADES = range(1, 9)
+STREAMS = ['A', 'B', 'C', 'D']
+ATTENDANCE_STATUSES = ['present', 'absent', 'late', 'excused']
+ATTENDANCE_WEIGHTS = [90, 5, 4, 1]
+PASSWORD = 'password123'
+
+
+def letter_grade(marks):
+    for bound, letter in ((80, 'A'), (65, 'B'), (50, 'C'), (40, 'D')):
+        if marks >= bound:
+            return letter
+    return 'E'
+
+
 class Command(BaseCommand):
-    help = 'Populate the database with fake data'
+    help = 'Populate the database with fake schools, people, attendance and exam results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schools', type=int, default=1, help='Schools to create (default: 1)')
+        parser.add_argument(
+            '--students-per-school', type=int, default=20,
+            help='Students per school (default: 20)'
+        )
+        parser.add_argument(
+            '--years', type=int, default=1,
+            help='School years of exam results, fees and attendance, ending this year (default: 1)'
+        )
+        parser.add_argument(
+            '--attendance-days', type=int, default=20,
+            help='School days per term with an attendance register (default: 20)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Rows per INSERT and students per transaction (default: 5000)'
+        )
+        parser.add_argument('--seed', type=int, help='Random seed for a reproducible dataset')
 
     def generate_phone(self):
         """Generate a valid 10-digit phone number"""
-        return f"07{random.randint(10000000, 99999999)}"  # Format: 07XXXXXXXX
+        return f"07{self.random.randint(10000000, 99999999)}"  # Format: 07XXXXXXXX
 
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **options):
+        for option in ('schools', 'students_per_school', 'years', 'batch_size'):
+            if options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be at least 1")
+
+        self.random = random.Random(options['seed'])
         fake = Faker()
+        fake.seed_instance(options['seed'])
+        self.first_names = [fake.first_name() for _ in range(300)]
+        self.last_names = [fake.last_name() for _ in range(300)]
+        self.sentences = [fake.sentence() for _ in range(50)]
+        self.cities = [fake.city() for _ in range(50)]
+        self.batch_size = options['batch_size']
+        self.attendance_days = options['attendance_days']
 
-        # First create parent users
-        parent_users = []
-        for _ in range(10):
-            parent_user = User.objects.create_user(
-                email=fake.unique.email(),
-                password='password123',
-                first_name=fake.name(),
-                role=Role.PARENT
+        # Hashing is deliberately slow, so every account shares one hash
+        self.password = make_password(PASSWORD)
+        # Keeps emails and registration numbers unique across runs
+        self.run_id = uuid.uuid4().hex[:6]
+
+        current_year = timezone.now().year
+        self.years = list(range(current_year - options['years'] + 1, current_year + 1))
+
+        started = time.monotonic()
+        totals = {'students': 0, 'parents': 0, 'teachers': 0, 'exam_results': 0, 'attendance': 0, 'fees': 0}
+        schools = []
+        for number in range(1, options['schools'] + 1):
+            school, counts = self.populate_school(number, options['students_per_school'])
+            schools.append(school)
+            for key, value in counts.items():
+                totals[key] += value
+            self.stdout.write(
+                f"Created {school.name}: {counts['students']} students, {counts['teachers']} teachers, "
+                f"{counts['exam_results']} exam results, {counts['attendance']} attendance records "
+                f"({time.monotonic() - started:.1f}s)"
             )
-            parent_users.append(parent_user)
-            self.stdout.write(f"Created parent user: {parent_user.email}")
 
-        # Create parent profiles
-        parents = []
-        for parent_user in parent_users:
-            parent = Parent.objects.create(
-                name=parent_user.first_name,
-                email=parent_user.email,
+        # bulk_create skips the signals that keep these up to date
+        school_ids = [school.id for school in schools]
+        rebuild_school_stats(school_ids)
+        for school_id in school_ids:
+            for year in self.years:
+                for term in TERMS:
+                    refresh_rankings(school_id, year, term)
+
+        summary = ', '.join(f"{value} {key.replace('_', ' ')}" for key, value in totals.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully populated {len(schools)} school(s) in {time.monotonic() - started:.1f}s: {summary}"
+        ))
+        self.stdout.write(f"Every account uses the password '{PASSWORD}'")
+
+    def person_name(self):
+        return f"{self.random.choice(self.first_names)} {self.random.choice(self.last_names)}"
+
+    def email(self, kind, school_number, number):
+        return f"{kind}{number}.s{school_number}.{self.run_id}@example.com"
+
+    def bulk_create(self, model, rows):
+        model.objects.bulk_create(rows, batch_size=self.batch_size)
+        return len(rows)
+
+    def school_days(self, year):
+        """Weekdays of each term that have an attendance register"""
+        days = {}
+        for term, (first_month, last_month) in TERMS.items():
+            day = date(year, first_month, 1)
+            end = date(year, last_month + 1, 1)
+            weekdays = []
+            while day < end:
+                if day.weekday() < 5:
+                    weekdays.append(day)
+                day += timedelta(days=1)
+            days[term] = sorted(self.random.sample(weekdays, min(self.attendance_days, len(weekdays))))
+        return days
+
+    def populate_school(self, number, student_count):
+        random = self.random
+        counts = {'students': 0, 'parents': 0, 'teachers': 0, 'exam_results': 0, 'attendance': 0, 'fees': 0}
+
+        with transaction.atomic():
+            school = School.objects.create(
+                name=f"{random.choice(self.cities)} {random.choice(['Academy', 'Primary School', 'Junior School'])}",
+                address=f"P.O. Box {random.randint(100, 9999)}, {random.choice(self.cities)}",
                 phone_number=self.generate_phone(),
-                password=make_password('password123')
+                email=f"school{number}.{self.run_id}@example.com",
+                registration_number=f"REG-{self.run_id}-{number:05d}",
             )
-            parents.append(parent)
-            self.stdout.write(f"Created parent profile: {parent.name}")
-
-        # Create teachers
-        subjects = ['Mathematics', 'English', 'Science', 'History', 'Geography']
-        for _ in range(10):
-            teacher = Teacher.objects.create(
-                name=fake.name(),
-                email=fake.unique.email(),
-                phone_number=self.generate_phone(),
-                class_assigned=f"Grade {random.randint(1, 12)}",
-                subjects=random.sample(subjects, random.randint(1, 3))
+            admin = User(
+                email=self.email('admin', number, 1),
+                password=self.password,
+                first_name=self.person_name(),
+                role=Role.ADMIN,
+                school=school,
             )
-            self.stdout.write(f"Created teacher: {teacher.name}")
+            User.objects.bulk_create([admin])
 
-        # Create students - now linking to parent users instead of parent profiles
-        students = []
-        for _ in range(20):
-            parent_user = random.choice(parent_users)  # Select a random parent user
-            student = Student.objects.create(
-                name=fake.name(),
-                guardian=parent_user.first_name,
-                contact=self.generate_phone(),
-                grade=random.randint(1, 12),
-                class_assigned=f"{random.randint(1, 12)}-{random.choice(['A', 'B', 'C'])}",
-                parent=parent_user  # Link to User model instead of Parent model
-            )
-            students.append(student)
-            self.stdout.write(f"Created student: {student.name}")
+            # One class teacher per stream in use, plus subject teachers
+            streams_per_grade = max(1, min(len(STREAMS), -(-student_count // (len(GRADES) * 40))))
+            classes = [f"{grade}{stream}" for grade in GRADES for stream in STREAMS[:streams_per_grade]]
+            teachers = []
+            teacher_users = []
+            for index in range(len(classes) + len(SUBJECTS)):
+                name = self.person_name()
+                email = self.email('teacher', number, index + 1)
+                teacher_user = User(
+                    email=email, password=self.password, first_name=name, role=Role.TEACHER, school=school
+                )
+                teacher_users.append(teacher_user)
+                teachers.append(Teacher(
+                    name=name,
+                    email=email,
+                    user=teacher_user,
+                    phone_number=self.generate_phone(),
+                    class_assigned=classes[index] if index < len(classes) else None,
+                    subjects=random.sample(SUBJECTS, random.randint(1, 3)),
+                    school=school,
+                ))
+            self.bulk_create(User, teacher_users)
+            counts['teachers'] = self.bulk_create(Teacher, teachers)
+            class_teachers = {teacher.class_assigned: teacher for teacher in teachers if teacher.class_assigned}
 
-        # Create Exam Results
-        for student in students:
-            for subject in subjects[:3]:  # Create results for 3 subjects
-                ExamResult.objects.create(
-                    student=student,
-                    exam_name=f"Term {random.randint(1,3)} Exam",
-                    subject=subject,
-                    marks=random.uniform(50.0, 100.0),
-                    grade=random.choice(['A', 'B', 'C', 'D']),
-                    term=f"Term {random.randint(1,3)}",
-                    year=2024,
-                    remarks=fake.sentence()
+            notifications = [
+                Notification(
+                    message=random.choice(self.sentences),
+                    target_group=random.choice(['all', 'teachers', 'students', 'parents']),
+                    created_by=admin,
+                    school=school,
                 )
+                for _ in range(10)
+            ]
+            self.bulk_create(Notification, notifications)
 
-        # Create School Fees Records
-        for student in students:
-            SchoolFee.objects.create(
-                student=student,
-                amount=random.uniform(10000.0, 50000.0),
-                term=f"Term {random.randint(1,3)}",
-                year=2024,
-                payment_date=fake.date_this_year(),
-                payment_method=random.choice(['mpesa', 'bank', 'cash']),
-                transaction_id=uuid.uuid4(),
-                status=random.choice(['pending', 'completed', 'failed'])
-            )
+        school_days = {year: self.school_days(year) for year in self.years}
+        created = 0
+        while created < student_count:
+            size = min(self.batch_size, student_count - created)
+            with transaction.atomic():
+                chunk = self.populate_students(school, number, created, size, classes, class_teachers, school_days)
+            for key, value in chunk.items():
+                counts[key] += value
+            created += size
 
-        # Create 10 Notifications
-        target_choices = ["teachers", "students", "both"]
-        for _ in range(10):
-            notification = Notification.objects.create(
-                message=fake.text(),
-                target_group=random.choice(target_choices)
+        return school, counts
+
+    def populate_students(self, school, school_number, offset, size, classes, class_teachers, school_days):
+        """Create `size` students with their parents, results, fees and attendance"""
+        random = self.random
+        parent_users = []
+        parents = []
+        students = []
+        while len(students) < size:
+            # Families of one to three children
+            parent_number = offset + len(parent_users) + 1
+            last_name = random.choice(self.last_names)
+            parent_name = f"{random.choice(self.first_names)} {last_name}"
+            email = self.email('parent', school_number, parent_number)
+            phone = self.generate_phone()
+            parent_user = User(
+                email=email, password=self.password, first_name=parent_name, role=Role.PARENT, school=school
             )
-            self.stdout.write(f"Created notification: {notification.message[:30]}...")
+            parent_users.append(parent_user)
+            parents.append(Parent(
+                id=parent_user.id, name=parent_name, email=email, phone_number=phone,
+                password=self.password, school=school
+            ))
+            for _ in range(min(random.choice([1, 1, 2, 2, 3]), size - len(students))):
+                class_assigned = random.choice(classes)
+                students.append(Student(
+                    name=f"{random.choice(self.first_names)} {last_name}",
+                    contact=phone,
+                    grade=int(class_assigned[:-1]),
+                    class_assigned=class_assigned,
+                    parent=parent_user,
+                    school=school,
+                ))
+
+        self.bulk_create(User, parent_users)
+        self.bulk_create(Parent, parents)
+        counts = {'parents': len(parents), 'students': self.bulk_create(Student, students)}
+
+        # Results and attendance are written as they fill a batch to bound memory
+        buffers = {ExamResult: [], SchoolFee: [], Attendance: []}
+        written = {ExamResult: 0, SchoolFee: 0, Attendance: 0}
+
+        def add(row):
+            rows = buffers[type(row)]
+            rows.append(row)
+            if len(rows) >= self.batch_size:
+                written[type(row)] += self.bulk_create(type(row), rows)
+                rows.clear()
+
+        for student in students:
+            ability = random.gauss(62, 12)
+            recorded_by = class_teachers[student.class_assigned]
+            for year, terms in school_days.items():
+                for term, days in terms.items():
+                    for subject in SUBJECTS:
+                        marks = round(min(100.0, max(0.0, random.gauss(ability, 10))), 2)
+                        add(ExamResult(
+                            student=student,
+                            exam_name=f"End of {term} Exam",
+                            subject=subject,
+                            marks=marks,
+                            grade=letter_grade(marks),
+                            term=term,
+                            year=year,
+                            school=school,
+                        ))
+                    add(SchoolFee(
+                        student=student,
+                        amount=random.choice([15000, 18000, 22500, 30000]),
+                        term=term,
+                        year=year,
+                        payment_date=days[0] if days else date(year, TERMS[term][0], 1),
+                        payment_method=random.choice(['mpesa', 'bank', 'cash']),
+                        status=random.choices(['completed', 'pending', 'failed'], [85, 12, 3])[0],
+                        school=school,
+                    ))
+                    statuses = random.choices(ATTENDANCE_STATUSES, ATTENDANCE_WEIGHTS, k=len(days))
+                    for day, status in zip(days, statuses):
+                        add(Attendance(
+                            student=student,
+                            date=day,
+                            status=status,
+                            reason='Sick' if status == 'excused' else '',
+                            recorded_by=recorded_by,
+                        ))
 
-        self.stdout.write(self.style.SUCCESS('Successfully populated the database'))
+        for model, rows in buffers.items():
+            written[model] += self.bulk_create(model, rows)
+        counts['exam_results'] = written[ExamResult]
+        counts['fees'] = written[SchoolFee]
+        counts['attendance'] = written[Attendance]
+        return counts
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from admin_interface.models import School, SchoolStatistics
+from admin_interface.school_stats import COUNTER_FIELDS, rebuild_school_stats
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-school statistics counters from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--school',
+            action='append',
+            dest='schools',
+            help='Only rebuild the given school id (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        school_ids = options['schools']
+        if school_ids:
+            found = set(str(pk) for pk in School.objects.filter(id__in=school_ids).values_list('id', flat=True))
+            missing = set(school_ids) - found
+            if missing:
+                raise CommandError(f'School(s) not found: {", ".join(sorted(missing))}')
+
+        previous = {
+            stats.scope: stats
+            for stats in SchoolStatistics.objects.all()
+        }
+        rebuilt = rebuild_school_stats(school_ids)
+
+        drifted = 0
+        for scope, stats in rebuilt.items():
+            old = previous.get(scope)
+            if old is None:
+                continue
+            changes = [
+                f'{field} {getattr(old, field)} -> {getattr(stats, field)}'
+                for field in COUNTER_FIELDS
+                if getattr(old, field) != getattr(stats, field)
+            ]
+            if old.students_per_grade != stats.students_per_grade:
+                changes.append('students_per_grade')
+            if changes:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(f'  - {scope}: {", ".join(changes)}'))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt statistics for {len(rebuilt)} scope(s), {drifted} had drifted'
+            )
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from admin_interface.models import ExamResult
+from admin_interface.rankings import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = 'Recompute class and grade positions for every term that has exam results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school', help='Only refresh the given school id')
+        parser.add_argument('--year', type=int, help='Only refresh the given year')
+        parser.add_argument('--term', help='Only refresh the given term')
+
+    def handle(self, *args, **options):
+        slices = ExamResult.objects.exclude(school__isnull=True)
+        if options['school']:
+            slices = slices.filter(school_id=options['school'])
+        if options['year']:
+            slices = slices.filter(year=options['year'])
+        if options['term']:
+            slices = slices.filter(term=options['term'])
+        slices = slices.order_by().values_list('school_id', 'year', 'term').distinct()
+
+        refreshed = 0
+        students = 0
+        for school_id, year, term in slices:
+            students += refresh_rankings(school_id, year, term)
+            refreshed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Refreshed rankings for {refreshed} term(s), {students} student row(s)')
+        )
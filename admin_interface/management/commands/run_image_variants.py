@@ -0,0 +1,53 @@
+import time
+from django.core.management.base import BaseCommand
+from admin_interface.image_variants import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG variants of uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Number of images processed per batch (default: 20)'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=3,
+            help='Attempts before a job is marked as failed (default: 3)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new uploads instead of exiting once the queue is drained'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to sleep between polls in --loop mode (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        total_done = total_failed = 0
+        while True:
+            done, failed = process_pending(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts']
+            )
+            total_done += done
+            total_failed += failed
+
+            # Failed jobs are rescheduled into the future, so an empty
+            # batch means nothing is due right now
+            if done + failed == 0:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Image variants drained: {total_done} images done, {total_failed} failed attempts')
+        )
@@ -0,0 +1,53 @@
+import time
+from django.core.management.base import BaseCommand
+from admin_interface.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox emails over a reused SMTP connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of emails sent per SMTP connection (default: 50)'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=5,
+            help='Attempts before an email is marked as failed (default: 5)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the outbox instead of exiting once it is drained'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to sleep between polls in --loop mode (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = deliver_pending(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts']
+            )
+            total_sent += sent
+            total_failed += failed
+
+            # Failed emails are rescheduled into the future, so an empty
+            # batch means nothing is due right now
+            if sent + failed == 0:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Outbox drained: {total_sent} sent, {total_failed} failed attempts')
+        )
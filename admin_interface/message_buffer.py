@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from .models import Message
+from .unread import adjust_unread, unread_pairs
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBuffer:
+    """
+    Per-process write-behind buffer for chat messages.
+
+    Consumers deliver messages to the channel layer right away and hand the
+    Message rows to the buffer, which persists them with one bulk_create when
+    CHAT_BUFFER_MAX_MESSAGES rows are pending or CHAT_BUFFER_MAX_DELAY_MS has
+    passed since the first pending row, whichever comes first. Consumers
+    flush on disconnect; rows still pending when the process dies are lost.
+    """
+    def __init__(self):
+        self._pending = []
+        self._timer = None
+
+    @property
+    def max_messages(self):
+        return getattr(settings, 'CHAT_BUFFER_MAX_MESSAGES', 50)
+
+    @property
+    def max_delay(self):
+        return getattr(settings, 'CHAT_BUFFER_MAX_DELAY_MS', 200) / 1000
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def add(self, message):
+        self._pending.append(message)
+        if len(self._pending) >= self.max_messages:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        """Persist every pending message"""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+
+        # Swap before awaiting so messages added meanwhile go to the next batch
+        batch, self._pending = self._pending, []
+        if batch:
+            await database_sync_to_async(self._write)(batch)
+
+    @staticmethod
+    def _write(batch):
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create(batch)
+                # bulk_create skips the signals that count unread messages
+                adjust_unread(unread_pairs(batch))
+        except Exception:
+            # One bad row (e.g. a receiver deleted meanwhile) must not drop the batch
+            logger.exception("Bulk insert of %d chat messages failed, saving one by one", len(batch))
+            for message in batch:
+                try:
+                    message.save()
+                except Exception:
+                    logger.exception("Could not save chat message %s", message.id)
+
+
+message_buffer = MessageBuffer()
@@ -0,0 +1,96 @@
+import threading
+from bisect import bisect_left
+
+# Upper bounds in seconds, as in the Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in Prometheus layout, keyed by label values"""
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts (last is +Inf), sum
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in sorted(self.snapshot().items()):
+            labels = ','.join(
+                f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values)
+            )
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_LABELS = ('method', 'route', 'status')
+
+request_duration = Histogram(
+    'http_request_duration_seconds',
+    'Wall time spent handling a request.',
+    REQUEST_LABELS, LATENCY_BUCKETS
+)
+request_db_duration = Histogram(
+    'http_request_db_duration_seconds',
+    'Time spent in database queries per request.',
+    REQUEST_LABELS, LATENCY_BUCKETS
+)
+request_db_queries = Histogram(
+    'http_request_db_queries',
+    'Database queries executed per request.',
+    REQUEST_LABELS, QUERY_BUCKETS
+)
+request_duplicate_queries = Histogram(
+    'http_request_db_duplicate_queries',
+    'Queries per request repeating a statement already run in that request.',
+    REQUEST_LABELS, QUERY_BUCKETS
+)
+
+HISTOGRAMS = [request_duration, request_db_duration, request_db_queries, request_duplicate_queries]
+
+
+def record_request(method, route, status, duration, db_duration, queries, duplicates):
+    labels = (method, route, str(status))
+    request_duration.observe(labels, duration)
+    request_db_duration.observe(labels, db_duration)
+    request_db_queries.observe(labels, queries)
+    request_duplicate_queries.observe(labels, duplicates)
+
+
+def render_metrics():
+    """All request histograms of this process in Prometheus text format"""
+    return '\n'.join(histogram.render() for histogram in HISTOGRAMS) + '\n'
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
@@ -1,35 +1,186 @@
 from channels.middleware import BaseMiddleware
+from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError
+from django.db import connections
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from contextlib import ExitStack
+from urllib.parse import parse_qs
 import json
+import time
 from django.http import JsonResponse
 from django.conf import settings
 import logging
 import traceback
+from .metrics import record_request
 
 logger = logging.getLogger(__name__)
 
+class UserCache:
+    """
+    Small in-process cache of authenticated users keyed by user id.
+    Entries expire after `ttl` seconds so role or status changes made by
+    another process are picked up quickly.
+    """
+    def __init__(self, ttl=60, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(user_id, None)
+            return None
+        return user
+
+    def set(self, user_id, user):
+        if len(self._entries) >= self.max_size:
+            # Drop the entry closest to expiry
+            oldest = min(self._entries, key=lambda key: self._entries[key][0])
+            self._entries.pop(oldest, None)
+        self._entries[user_id] = (time.monotonic() + self.ttl, user)
+
+    def invalidate(self, user_id):
+        self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+user_cache = UserCache(ttl=getattr(settings, 'WEBSOCKET_USER_CACHE_TTL', 60))
+
+
+@database_sync_to_async
+def get_active_user(user_id):
+    from django.contrib.auth import get_user_model
+    try:
+        return get_user_model().objects.get(id=user_id, is_active=True)
+    except (get_user_model().DoesNotExist, ValidationError, ValueError):
+        return None
+
+
 class WebSocketJWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates WebSocket connections from the SimpleJWT access token in the
+    `token` query parameter. The token is verified locally and the user is
+    resolved through `user_cache`, so reconnects cost no database query.
+    """
     async def __call__(self, scope, receive, send):
-        # Get the token from query string
-        query_string = scope.get('query_string', b'').decode()
-        token = None
-        
-        if 'token=' in query_string:
-            for param in query_string.split('&'):
-                if param.startswith('token='):
-                    token = param.split('=')[1]
-                    break
-        
-        if token:
-            # Add authentication logic here if needed
-            pass
-        else:
-            scope['user'] = AnonymousUser()
-        
-        # For now, just allow all WebSocket connections
-        scope['user'] = AnonymousUser()
+        scope = dict(scope)
+        scope['user'] = await self.authenticate(scope)
         return await super().__call__(scope, receive, send)
 
+    async def authenticate(self, scope):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        token = query.get('token', [None])[0]
+        if not token:
+            return AnonymousUser()
+
+        try:
+            user_id = str(AccessToken(token)[jwt_settings.USER_ID_CLAIM])
+        except (TokenError, KeyError):
+            return AnonymousUser()
+
+        user = user_cache.get(user_id)
+        if user is None:
+            user = await get_active_user(user_id)
+            if user is None:
+                return AnonymousUser()
+            user_cache.set(user_id, user)
+        return user
+
+def get_request_teacher(request):
+    """
+    Teacher profile (with its school) of the requesting user, looked up once
+    per request through User.teacher_profile.
+    A teacher whose profile was never linked (link_teacher_users has not run)
+    is matched by email and linked, so later requests find it by user_id.
+    Raises Teacher.DoesNotExist when the user has no teacher profile.
+    """
+    from .models import Role, Teacher
+    http_request = getattr(request, '_request', request)
+    if not hasattr(http_request, '_teacher_profile'):
+        user = request.user
+        teacher = None
+        if user.is_authenticated:
+            teachers = Teacher.objects.select_related('school')
+            teacher = teachers.filter(user_id=user.pk).first()
+            if teacher is None and user.role == Role.TEACHER:
+                teacher = teachers.filter(user__isnull=True, email=user.email).first()
+                if teacher is not None:
+                    Teacher.objects.filter(pk=teacher.pk, user__isnull=True).update(user_id=user.pk)
+                    teacher.user_id = user.pk
+        http_request._teacher_profile = teacher
+    if http_request._teacher_profile is None:
+        raise Teacher.DoesNotExist("Teacher profile not found")
+    return http_request._teacher_profile
+
+
+class QueryRecorder:
+    """execute_wrapper that counts queries, their time and repeated statements"""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.duplicates = 0
+        self._seen = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            # The same statement text again usually means a query in a loop
+            if sql in self._seen:
+                self.duplicates += 1
+            else:
+                self._seen.add(sql)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records query count, database time, repeated statements and wall time for
+    every request. The numbers are returned in a Server-Timing header and
+    added to the per-route histograms served by /api/_metrics/.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'REQUEST_METRICS_ENABLED', True)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match else 'unmatched'
+        record_request(
+            request.method, route, response.status_code,
+            duration, recorder.duration, recorder.count, recorder.duplicates
+        )
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+            f'dup;desc="{recorder.duplicates} repeated queries"',
+            f'total;dur={duration * 1000:.1f}',
+        ])
+        return response
+
+
 class APIErrorMiddleware:
     """
     Middleware to ensure API endpoints return JSON responses even during 500 errors
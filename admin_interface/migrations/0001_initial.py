@@ -0,0 +1,709 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:42
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('role', models.CharField(choices=[('superuser', 'Super User'), ('admin', 'Administrator'), ('teacher', 'Teacher'), ('parent', 'Parent'), ('student', 'Student')], default='parent', max_length=20)),
+            ],
+            options={
+                'verbose_name': 'user',
+                'verbose_name_plural': 'users',
+                'ordering': ['email'],
+                'swappable': 'AUTH_USER_MODEL',
+            },
+        ),
+        migrations.CreateModel(
+            name='AdminCredential',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'admin_credentials',
+            },
+        ),
+        migrations.CreateModel(
+            name='Attendance',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('present', 'Present'), ('absent', 'Absent'), ('late', 'Late'), ('excused', 'Excused')], max_length=20)),
+                ('reason', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Document',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('file', models.FileField(upload_to='documents/%Y/%m/')),
+                ('document_type', models.CharField(choices=[('report', 'Report Card'), ('assignment', 'Assignment'), ('syllabus', 'Syllabus'), ('other', 'Other')], max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExamPDF',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('exam_name', models.CharField(max_length=255)),
+                ('subject', models.CharField(max_length=255)),
+                ('class_assigned', models.CharField(max_length=255)),
+                ('exam_date', models.DateField()),
+                ('year', models.PositiveIntegerField(default=2026)),
+                ('file', models.FileField(upload_to='exam_pdfs/')),
+                ('remarks', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExamResult',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('exam_name', models.CharField(max_length=255)),
+                ('subject', models.CharField(max_length=100)),
+                ('marks', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('grade', models.CharField(max_length=2)),
+                ('term', models.CharField(max_length=20)),
+                ('year', models.PositiveIntegerField()),
+                ('remarks', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImageVariantJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('model_label', models.CharField(max_length=100)),
+                ('object_id', models.CharField(max_length=64)),
+                ('field', models.CharField(max_length=50)),
+                ('source', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaveApplication',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('leave_type', models.CharField(choices=[('sick', 'Sick Leave'), ('casual', 'Casual Leave'), ('emergency', 'Emergency Leave')], max_length=50)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('reason', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Message',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('message', models.CharField(max_length=500)),
+                ('target_group', models.CharField(choices=[('all', 'All'), ('teachers', 'Teachers'), ('students', 'Students'), ('parents', 'Parents')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('html_body', models.TextField(blank=True)),
+                ('from_email', models.CharField(max_length=255)),
+                ('to', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Parent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('phone_number', models.CharField(blank=True, max_length=15, null=True)),
+                ('password', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PasswordResetToken',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('token', models.UUIDField(default=uuid.uuid4, unique=True)),
+                ('reset_code', models.CharField(blank=True, help_text='6-digit code for teachers', max_length=6, null=True)),
+                ('expires_at', models.DateTimeField()),
+                ('used', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('image', models.ImageField(upload_to='products/')),
+                ('image_variants', models.JSONField(blank=True, default=dict)),
+                ('stock', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='School',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(default='Default School', max_length=255)),
+                ('address', models.TextField(default='Default Address')),
+                ('phone_number', models.CharField(default='0700000000', max_length=15)),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('website', models.URLField(blank=True, null=True)),
+                ('logo', models.ImageField(blank=True, null=True, upload_to='school_logos/')),
+                ('logo_variants', models.JSONField(blank=True, default=dict)),
+                ('registration_number', models.CharField(default='REG000001', max_length=50, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'school',
+                'verbose_name_plural': 'schools',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Student',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(db_index=True, max_length=255)),
+                ('contact', models.CharField(blank=True, max_length=255, null=True)),
+                ('grade', models.IntegerField()),
+                ('class_assigned', models.CharField(blank=True, max_length=50, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('parent', models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to=settings.AUTH_USER_MODEL)),
+                ('school', models.ForeignKey(default=1, on_delete=django.db.models.deletion.CASCADE, related_name='students', to='admin_interface.school')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Teacher',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(db_index=True, max_length=100)),
+                ('email', models.EmailField(db_index=True, max_length=254, unique=True)),
+                ('phone_number', models.CharField(blank=True, error_messages={'invalid': "Phone number must be in format '07XXXXXXXX'"}, max_length=15, null=True, validators=[django.core.validators.RegexValidator(message="Phone number must be in format '07XXXXXXXX'", regex='^07\\d{8}$')])),
+                ('profile_pic', models.ImageField(blank=True, null=True, upload_to='teacher_profile_pics/')),
+                ('profile_pic_variants', models.JSONField(blank=True, default=dict)),
+                ('class_assigned', models.CharField(blank=True, db_index=True, max_length=255, null=True)),
+                ('subjects', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('school', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='teachers', to='admin_interface.school')),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='teacher_profile', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'teacher',
+                'verbose_name_plural': 'teachers',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('counterpart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unread_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TimeTable',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('grade', models.PositiveIntegerField()),
+                ('day', models.CharField(max_length=10)),
+                ('period', models.PositiveIntegerField()),
+                ('subject', models.CharField(max_length=100)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('room', models.CharField(max_length=50)),
+                ('school', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='timetables', to='admin_interface.school')),
+                ('teacher', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='admin_interface.teacher')),
+            ],
+            options={
+                'ordering': ['day', 'period'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TeacherParentAssociation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('parent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='teacher_associations', to=settings.AUTH_USER_MODEL)),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parent_associations', to='admin_interface.teacher')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentRanking',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('year', models.PositiveIntegerField()),
+                ('term', models.CharField(max_length=20)),
+                ('class_assigned', models.CharField(blank=True, max_length=50, null=True)),
+                ('grade', models.IntegerField()),
+                ('subjects_count', models.PositiveIntegerField()),
+                ('total_marks', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('average_marks', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('class_position', models.PositiveIntegerField()),
+                ('class_dense_position', models.PositiveIntegerField()),
+                ('grade_position', models.PositiveIntegerField()),
+                ('grade_dense_position', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='admin_interface.school')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='admin_interface.student')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SchoolStatistics',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('scope', models.CharField(max_length=36, unique=True)),
+                ('teacher_count', models.IntegerField(default=0)),
+                ('student_count', models.IntegerField(default=0)),
+                ('students_per_grade', models.JSONField(blank=True, default=dict)),
+                ('parent_count', models.IntegerField(default=0)),
+                ('parent_user_count', models.IntegerField(default=0)),
+                ('admin_count', models.IntegerField(default=0)),
+                ('user_count', models.IntegerField(default=0)),
+                ('active_user_count', models.IntegerField(default=0)),
+                ('notification_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('school', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to='admin_interface.school')),
+            ],
+            options={
+                'verbose_name': 'school statistics',
+                'verbose_name_plural': 'school statistics',
+            },
+        ),
+        migrations.CreateModel(
+            name='SchoolFee',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('term', models.CharField(max_length=20)),
+                ('year', models.PositiveIntegerField()),
+                ('payment_date', models.DateField()),
+                ('payment_method', models.CharField(max_length=50)),
+                ('transaction_id', models.UUIDField(default=uuid.uuid4, unique=True)),
+                ('status', models.CharField(default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('school', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fees', to='admin_interface.school')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fee_records', to='admin_interface.student')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SchoolEvent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('start_date', models.DateTimeField()),
+                ('end_date', models.DateTimeField()),
+                ('event_type', models.CharField(choices=[('holiday', 'Holiday'), ('exam', 'Examination'), ('meeting', 'Meeting'), ('activity', 'Activity')], max_length=50)),
+                ('participants', models.CharField(choices=[('all', 'All'), ('teachers', 'Teachers'), ('students', 'Students'), ('parents', 'Parents')], max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('school', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='admin_interface.school')),
+            ],
+            options={
+                'ordering': ['start_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='school',
+            index=models.Index(fields=['name'], name='admin_inter_name_d35033_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='school',
+            index=models.Index(fields=['registration_number'], name='admin_inter_registr_9cd6cf_idx'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='products', to='admin_interface.school'),
+        ),
+        migrations.AddField(
+            model_name='passwordresettoken',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='password_reset_tokens', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='parent',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='parents', to='admin_interface.school'),
+        ),
+        migrations.AddIndex(
+            model_name='outboxemail',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='admin_inter_status_af9597_idx'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='admin_interface.order'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='admin_interface.product'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='parent',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='school',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='admin_interface.school'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='created_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='admin_interface.school'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='admin_interface.parent'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='receiver',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='received_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='admin_interface.school'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='sender',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sent_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='teacher',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='admin_interface.teacher'),
+        ),
+        migrations.AddField(
+            model_name='leaveapplication',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='leave_applications', to='admin_interface.school'),
+        ),
+        migrations.AddField(
+            model_name='leaveapplication',
+            name='teacher',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='admin_interface.teacher'),
+        ),
+        migrations.AddIndex(
+            model_name='imagevariantjob',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='image_job_due_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='imagevariantjob',
+            unique_together={('model_label', 'object_id', 'field')},
+        ),
+        migrations.AddField(
+            model_name='examresult',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='exam_results', to='admin_interface.school'),
+        ),
+        migrations.AddField(
+            model_name='examresult',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_results', to='admin_interface.student'),
+        ),
+        migrations.AddField(
+            model_name='exampdf',
+            name='school',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='exam_pdfs', to='admin_interface.school'),
+        ),
+        migrations.AddField(
+            model_name='exampdf',
+            name='teacher',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_pdfs', to='admin_interface.teacher'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='admin_interface.school'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='student',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='admin_interface.student'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='uploaded_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='recorded_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='admin_interface.teacher'),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_records', to='admin_interface.student'),
+        ),
+        migrations.AddField(
+            model_name='admincredential',
+            name='admin',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='groups',
+            field=models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='users', to='admin_interface.school'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='user_permissions',
+            field=models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='unreadcounter',
+            unique_together={('user', 'counterpart')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='timetable',
+            unique_together={('grade', 'day', 'period')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='teacherparentassociation',
+            unique_together={('teacher', 'parent')},
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['name'], name='admin_inter_name_643eb3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['email'], name='admin_inter_email_31bf17_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['class_assigned'], name='admin_inter_class_a_e99461_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentranking',
+            index=models.Index(fields=['school', 'year', 'term', 'class_assigned', 'class_position'], name='admin_inter_school__c1abe2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentranking',
+            index=models.Index(fields=['school', 'year', 'term', 'grade', 'grade_position'], name='admin_inter_school__2c991d_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='studentranking',
+            unique_together={('student', 'year', 'term')},
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['school', 'class_assigned'], name='student_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schoolfee',
+            index=models.Index(fields=['student', 'year', 'term'], name='admin_inter_student_ff61d6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schoolfee',
+            index=models.Index(fields=['transaction_id'], name='admin_inter_transac_e43d05_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schoolevent',
+            index=models.Index(fields=['start_date', 'end_date'], name='admin_inter_start_d_43c9ee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schoolevent',
+            index=models.Index(fields=['event_type'], name='admin_inter_event_t_006966_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schoolevent',
+            index=models.Index(fields=['school', 'end_date'], name='event_school_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresettoken',
+            index=models.Index(fields=['token'], name='admin_inter_token_4905db_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresettoken',
+            index=models.Index(fields=['reset_code'], name='admin_inter_reset_c_b490c6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresettoken',
+            index=models.Index(fields=['user'], name='admin_inter_user_id_2a199a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresettoken',
+            index=models.Index(fields=['expires_at'], name='admin_inter_expires_f8484c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['parent', 'status'], name='admin_inter_parent__edc561_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['school', 'status'], name='admin_inter_school__e61cde_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['school', 'target_group', '-created_at'], name='notification_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'receiver', 'school', 'created_at'], name='message_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['receiver', 'school', 'created_at'], name='message_receiver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['receiver', 'sender', 'school', 'created_at'], name='message_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examresult',
+            index=models.Index(fields=['student', 'year', 'term'], name='admin_inter_student_a46f37_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examresult',
+            index=models.Index(fields=['school', 'year', 'term'], name='exam_result_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exampdf',
+            index=models.Index(fields=['teacher', 'class_assigned', 'subject'], name='admin_inter_teacher_fef49f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exampdf',
+            index=models.Index(fields=['year'], name='admin_inter_year_9b0638_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['student', 'date'], name='admin_inter_student_f920c1_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='attendance',
+            unique_together={('student', 'date')},
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='admin_inter_email_7b3613_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role'], name='admin_inter_role_96ae69_idx'),
+        ),
+    ]
@@ -22,6 +22,8 @@ class School(models.Model):
     email = models.EmailField(unique=True)
     website = models.URLField(blank=True, null=True)
     logo = models.ImageField(upload_to='school_logos/', blank=True, null=True)
+    # Resized copies of the logo, written by the image variant worker
+    logo_variants = models.JSONField(default=dict, blank=True)
     registration_number = models.CharField(max_length=50, unique=True, default="REG000001")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -92,6 +94,10 @@ class Teacher(models.Model):
     name = models.CharField(max_length=100, db_index=True)
     email = models.EmailField(unique=True, db_index=True)
     school = models.ForeignKey(School, on_delete=models.SET_NULL, related_name='teachers', null=True, blank=True)
+    # Login account of the teacher, linked by signals.py on creation
+    user = models.OneToOneField(
+        'User', on_delete=models.SET_NULL, related_name='teacher_profile', null=True, blank=True
+    )
     phone_regex = RegexValidator(
         regex=r'^07\d{8}$',
         message="Phone number must be in format '07XXXXXXXX'"
@@ -106,6 +112,8 @@ class Teacher(models.Model):
         }
     )
     profile_pic = models.ImageField(upload_to='teacher_profile_pics/', null=True, blank=True)
+    # Resized copies of the profile picture, written by the image variant worker
+    profile_pic_variants = models.JSONField(default=dict, blank=True)
     class_assigned = models.CharField(max_length=255, blank=True, null=True, db_index=True)
     subjects = models.JSONField(default=list, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -178,6 +186,12 @@ class Student(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            # Class lists: students of one class in a school
+            models.Index(fields=['school', 'class_assigned'], name='student_class_idx'),
+        ]
+
 
 class Notification(models.Model):
     """Model for storing notifications sent to teachers or students."""
@@ -200,6 +214,10 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A school's feed, optionally for one audience, newest first
+            models.Index(fields=['school', 'target_group', '-created_at'], name='notification_feed_idx'),
+        ]
 
 
 class ExamResult(models.Model):
@@ -219,12 +237,47 @@ class ExamResult(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['student', 'year', 'term']),
+            # Term-wide reports, analytics and rankings of a school
+            models.Index(fields=['school', 'year', 'term'], name='exam_result_term_idx'),
         ]
 
     def __str__(self):
         return f"{self.student.name} - {self.subject} ({self.exam_name})"
 
 
+class StudentRanking(models.Model):
+    """
+    A student's class and grade position for one term, ranked by average
+    marks. Rows are recomputed per (school, year, term) by rankings.py
+    whenever a result in that term changes.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='rankings')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='rankings')
+    year = models.PositiveIntegerField()
+    term = models.CharField(max_length=20)
+    class_assigned = models.CharField(max_length=50, null=True, blank=True)
+    grade = models.IntegerField()
+    subjects_count = models.PositiveIntegerField()
+    total_marks = models.DecimalField(max_digits=8, decimal_places=2)
+    average_marks = models.DecimalField(max_digits=5, decimal_places=2)
+    class_position = models.PositiveIntegerField()
+    class_dense_position = models.PositiveIntegerField()
+    grade_position = models.PositiveIntegerField()
+    grade_dense_position = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['student', 'year', 'term']
+        indexes = [
+            models.Index(fields=['school', 'year', 'term', 'class_assigned', 'class_position']),
+            models.Index(fields=['school', 'year', 'term', 'grade', 'grade_position']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.name} - {self.term} {self.year}: {self.class_position} in class"
+
+
 class SchoolFee(models.Model):
     """Model for tracking school fee payments"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -360,6 +413,8 @@ class SchoolEvent(models.Model):
         indexes = [
             models.Index(fields=['start_date', 'end_date']),
             models.Index(fields=['event_type']),
+            # Upcoming and past events of a school
+            models.Index(fields=['school', 'end_date'], name='event_school_end_idx'),
         ]
 
     def __str__(self):
@@ -383,6 +438,33 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Conversation lookups page through (sender, receiver) by time
+            models.Index(fields=['sender', 'receiver', 'school', 'created_at'], name='message_thread_idx'),
+            # Messages received by a user, newest first
+            models.Index(fields=['receiver', 'school', 'created_at'], name='message_receiver_idx'),
+            # Conversations seen from the receiving side, for the inbox's
+            # latest message received from each sender
+            models.Index(fields=['receiver', 'sender', 'school', 'created_at'], name='message_inbox_idx'),
+        ]
+
+
+class UnreadCounter(models.Model):
+    """
+    Number of unread messages `user` has received from `counterpart`.
+    Maintained by unread.py whenever messages are created, read or deleted.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='unread_counters')
+    counterpart = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['user', 'counterpart']
+
+    def __str__(self):
+        return f"{self.user_id} has {self.count} unread from {self.counterpart_id}"
 
 
 class TeacherParentAssociation(models.Model):
@@ -459,6 +541,8 @@ class Product(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to='products/', null=False, blank=False)
+    # Resized copies of the image, written by the image variant worker
+    image_variants = models.JSONField(default=dict, blank=True)
     stock = models.PositiveIntegerField()
     school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='products', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -544,6 +628,71 @@ class PasswordResetToken(models.Model):
         ]
 
 
+class SchoolStatistics(models.Model):
+    """
+    Denormalized per-school counters read by the statistics dashboards.
+    Kept up to date by the signal handlers in signals.py and by the bulk
+    code paths; `manage.py rebuild_school_stats` reconciles them.
+    Users and teachers without a school are counted in the 'unassigned' row.
+    """
+    UNASSIGNED_SCOPE = 'unassigned'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    scope = models.CharField(max_length=36, unique=True)
+    school = models.OneToOneField(School, on_delete=models.CASCADE, related_name='statistics', null=True, blank=True)
+    teacher_count = models.IntegerField(default=0)
+    student_count = models.IntegerField(default=0)
+    students_per_grade = models.JSONField(default=dict, blank=True)
+    parent_count = models.IntegerField(default=0)
+    parent_user_count = models.IntegerField(default=0)
+    admin_count = models.IntegerField(default=0)
+    user_count = models.IntegerField(default=0)
+    active_user_count = models.IntegerField(default=0)
+    notification_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'school statistics'
+        verbose_name_plural = 'school statistics'
+
+    def __str__(self):
+        return f"Statistics for {self.school.name if self.school else self.scope}"
+
+
+class OutboxEmail(models.Model):
+    """
+    Email queued by a request and delivered later by `manage.py run_outbox`,
+    so slow SMTP servers never hold up a web worker.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
 class AdminCredential(models.Model):
     """Temporary storage for admin credentials"""
     admin = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -552,3 +701,39 @@ class AdminCredential(models.Model):
 
     class Meta:
         db_table = 'admin_credentials'
+
+
+class ImageVariantJob(models.Model):
+    """
+    Resized variants to generate for an uploaded image, processed later by
+    `manage.py run_image_variants` so uploads never wait for Pillow.
+    One row per image field; a new upload resets it to pending.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    model_label = models.CharField(max_length=100)
+    object_id = models.CharField(max_length=64)
+    field = models.CharField(max_length=50)
+    # Name of the uploaded file the variants are made from
+    source = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        unique_together = ['model_label', 'object_id', 'field']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='image_job_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label} {self.object_id} {self.field} ({self.status})"
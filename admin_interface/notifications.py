@@ -0,0 +1,79 @@
+import json
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from .models import Notification, Role
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+# Notification audiences each role receives; admins see their whole school
+ROLE_TARGETS = {
+    Role.ADMIN: ['all', 'teachers', 'students', 'parents'],
+    Role.TEACHER: ['all', 'teachers'],
+    Role.PARENT: ['all', 'parents'],
+    Role.STUDENT: ['all', 'students'],
+}
+
+
+def notification_group(school_id, target_group):
+    """Channel group of one audience of a school"""
+    return f"notifications_{school_id}_{target_group}"
+
+
+def targets_for(user):
+    """Audiences whose notifications `user` receives"""
+    if not user.school_id:
+        return []
+    return ROLE_TARGETS.get(user.role, ['all'])
+
+
+def notification_payload(notification):
+    """The JSON frame sent to clients for a notification"""
+    return json.dumps({
+        "type": "notification",
+        "notification": NotificationSerializer(notification).data,
+    }, cls=DjangoJSONEncoder)
+
+
+def notifications_since(user, since, limit):
+    """
+    Payloads of the notifications `user` receives created after `since`,
+    oldest first, and whether more than `limit` of them exist
+    """
+    notifications = list(
+        Notification.objects.filter(
+            school_id=user.school_id,
+            target_group__in=targets_for(user),
+            created_at__gt=since,
+        ).order_by('-created_at')[:limit + 1]
+    )
+    has_more = len(notifications) > limit
+    return [notification_payload(notification) for notification in reversed(notifications[:limit])], has_more
+
+
+def schedule_notification_push(notification):
+    """Publish a notification to its audience's group once the transaction commits"""
+    if not notification.school_id:
+        return
+    transaction.on_commit(lambda: publish_notification(notification))
+
+
+def publish_notification(notification):
+    """
+    Send a notification to its audience's group, serialized once for every
+    connected client
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            notification_group(notification.school_id, notification.target_group),
+            {"type": "notification_message", "payload": notification_payload(notification)}
+        )
+    except Exception:
+        # Stored already; clients catch up on their next connection
+        logger.exception("Could not publish notification %s", notification.pk)
@@ -0,0 +1,109 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# A claimed batch is retried by another worker if not finished within this time
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def enqueue_email(subject, body, to, html_body='', from_email=None):
+    """Queue an email for the outbox worker and return the row"""
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to)
+    )
+
+
+def retry_delay(attempts, base=30, maximum=3600):
+    """Exponential backoff: 30s, 60s, 120s, ... capped at an hour"""
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), maximum))
+
+
+def _claim_batch(batch_size):
+    """
+    Lock due rows (skipping rows other workers hold) and push their next
+    attempt past CLAIM_TIMEOUT, so the SMTP work happens outside a transaction.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True).filter(
+                status='pending',
+                next_attempt_at__lte=now
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        for email in batch:
+            email.next_attempt_at = now + CLAIM_TIMEOUT
+        OutboxEmail.objects.bulk_update(batch, ['next_attempt_at'])
+    return batch
+
+
+def deliver_pending(batch_size=50, max_attempts=5):
+    """
+    Send one batch of due emails over a single SMTP connection.
+    Failed sends are rescheduled with exponential backoff and marked failed
+    after max_attempts. Returns (sent, failed) counts for the batch.
+    """
+    batch = _claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Could not connect to the mail server: {e}")
+        connection = None
+        error = str(e)
+
+    for email in batch:
+        if connection is not None:
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.to,
+                connection=connection
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, "text/html")
+            try:
+                message.send()
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                sent += 1
+                continue
+            except Exception as e:
+                logger.error(f"Sending outbox email {email.id} failed: {e}")
+                error = str(e)
+
+        email.attempts += 1
+        email.last_error = error
+        if email.attempts >= max_attempts:
+            email.status = 'failed'
+        else:
+            email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+        failed += 1
+
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception as e:
+            logger.warning(f"Closing the mail connection failed: {e}")
+
+    OutboxEmail.objects.bulk_update(
+        batch,
+        ['status', 'sent_at', 'attempts', 'next_attempt_at', 'last_error']
+    )
+    return sent, failed
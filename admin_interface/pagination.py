@@ -0,0 +1,77 @@
+import base64
+import uuid
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+
+
+def encode_cursor(created_at, pk):
+    """Opaque cursor for a row's (created_at, id) position"""
+    raw = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor produced by encode_cursor"""
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({'cursor': 'Invalid cursor'})
+
+
+def parse_page_size(value, default, maximum):
+    """Page size from a query parameter, clamped to [1, maximum]"""
+    if value in (None, ''):
+        return default
+    try:
+        return max(1, min(int(value), maximum))
+    except (TypeError, ValueError):
+        raise ValidationError({'page_size': 'Must be an integer'})
+
+
+def keyset_paginate(queryset, page_size, before=None, after=None):
+    """
+    Seek-paginate a queryset on (created_at, id) without OFFSET.
+
+    With no cursor, or with `before`, returns the newest `page_size` rows older
+    than the cursor; with `after`, the oldest rows newer than it. Rows are
+    always returned oldest first. `has_more` tells whether further rows exist
+    in the direction being paged.
+    """
+    if before and after:
+        raise ValidationError({'cursor': 'Use either before or after, not both'})
+
+    if after:
+        created_at, pk = decode_cursor(after)
+        queryset = queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        ).order_by('created_at', 'id')
+    else:
+        if before:
+            created_at, pk = decode_cursor(before)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+        queryset = queryset.order_by('-created_at', '-id')
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not after:
+        rows.reverse()
+
+    return {
+        'rows': rows,
+        'has_more': has_more,
+        'previous_cursor': encode_cursor(rows[0].created_at, rows[0].pk) if rows else before,
+        'next_cursor': encode_cursor(rows[-1].created_at, rows[-1].pk) if rows else after,
+    }
+
+
+class LargeResultsSetPagination(PageNumberPagination):
+    """Page number pagination with a client-selectable page size"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
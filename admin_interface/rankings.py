@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import Avg, Count, F, Sum, Window
+from django.db.models.functions import DenseRank, Rank
+from .models import ExamResult, StudentRanking
+from .transactions import on_commit_once
+
+RANKING_FIELDS = [
+    'school', 'class_assigned', 'grade', 'subjects_count', 'total_marks', 'average_marks',
+    'class_position', 'class_dense_position', 'grade_position', 'grade_dense_position',
+]
+
+
+def ranked_results(school_id, year, term):
+    """
+    Per-student totals for one term with class and grade positions computed
+    by RANK()/DENSE_RANK() windows over the aggregated averages.
+    The rows are already limited to one (school, year, term), so the windows
+    only partition by class and grade.
+    """
+    class_partition = F('student__class_assigned')
+    grade_partition = F('student__grade')
+    order = F('average_marks').desc()
+
+    return ExamResult.objects.filter(
+        school_id=school_id, year=year, term=term
+    ).order_by().values(
+        'student_id', 'school_id', 'year', 'term', 'student__class_assigned', 'student__grade'
+    ).annotate(
+        subjects_count=Count('id'),
+        total_marks=Sum('marks'),
+        average_marks=Avg('marks'),
+    ).annotate(
+        class_position=Window(Rank(), partition_by=class_partition, order_by=order),
+        class_dense_position=Window(DenseRank(), partition_by=class_partition, order_by=order),
+        grade_position=Window(Rank(), partition_by=grade_partition, order_by=order),
+        grade_dense_position=Window(DenseRank(), partition_by=grade_partition, order_by=order),
+    )
+
+
+def refresh_rankings(school_id, year, term):
+    """Recompute and upsert the ranking rows of one (school, year, term)"""
+    rankings = [
+        StudentRanking(
+            student_id=row['student_id'],
+            school_id=row['school_id'],
+            year=row['year'],
+            term=row['term'],
+            class_assigned=row['student__class_assigned'],
+            grade=row['student__grade'],
+            subjects_count=row['subjects_count'],
+            total_marks=row['total_marks'],
+            average_marks=row['average_marks'],
+            class_position=row['class_position'],
+            class_dense_position=row['class_dense_position'],
+            grade_position=row['grade_position'],
+            grade_dense_position=row['grade_dense_position'],
+        )
+        for row in ranked_results(school_id, year, term)
+    ]
+
+    with transaction.atomic():
+        # Students whose last result in the term was removed drop out
+        StudentRanking.objects.filter(school_id=school_id, year=year, term=term).exclude(
+            student_id__in=[ranking.student_id for ranking in rankings]
+        ).delete()
+        StudentRanking.objects.bulk_create(
+            rankings,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['student', 'year', 'term'],
+            update_fields=RANKING_FIELDS + ['updated_at'],
+        )
+    return len(rankings)
+
+
+def schedule_ranking_refresh(school_id, year, term):
+    """
+    Refresh a term's rankings once the current transaction commits.
+    Several result changes to the same term in one transaction share a refresh.
+    """
+    if not school_id:
+        return
+    on_commit_once(('ranking-refresh', school_id, year, term), lambda: refresh_rankings(school_id, year, term))
+
+
+def schedule_student_ranking_refresh(students):
+    """
+    Refresh the rankings of every term `students` (a Student queryset or
+    ids) have results in, e.g. after they change class or grade.
+    The terms are read now, so call this before a queryset update moves them.
+    """
+    slices = ExamResult.objects.filter(student__in=students).order_by().values_list(
+        'school_id', 'year', 'term'
+    ).distinct()
+    for school_id, year, term in slices:
+        schedule_ranking_refresh(school_id, year, term)
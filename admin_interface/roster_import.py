@@ -0,0 +1,229 @@
+import csv
+import io
+import uuid
+from collections import defaultdict
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models.functions import Lower
+import pandas as pd
+from openpyxl import load_workbook
+from .models import User, Parent, Student, Role
+from .school_stats import rebuild_school_stats
+
+REQUIRED_COLUMNS = ['student_name', 'grade', 'parent_email']
+OPTIONAL_COLUMNS = ['class_assigned', 'contact', 'parent_name', 'parent_phone']
+COLUMNS = REQUIRED_COLUMNS + OPTIONAL_COLUMNS
+
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+# Longest value each column can store (User.first_name, Parent.phone_number, ...)
+MAX_LENGTHS = {
+    'student_name': 255,
+    'class_assigned': 50,
+    'contact': 255,
+    'parent_email': 254,
+    'parent_name': 150,
+    'parent_phone': 15,
+}
+
+
+class RosterImportError(Exception):
+    """The file as a whole cannot be imported (bad format or header)"""
+
+
+def _normalize_header(header):
+    return [str(cell or '').strip().lower().replace(' ', '_') for cell in header]
+
+
+def _check_header(header):
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise RosterImportError(f"Missing required column(s): {', '.join(missing)}")
+
+
+def read_roster(file, filename):
+    """
+    Stream (row number, row dict) pairs from an uploaded XLSX or CSV file.
+    XLSX files are read with openpyxl in read-only mode so the sheet is never
+    fully loaded in memory. Blank rows are skipped.
+    """
+    name = filename.lower()
+    if name.endswith('.xlsx'):
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = _normalize_header(next(rows, []))
+            _check_header(header)
+            for number, values in enumerate(rows, start=2):
+                if any(value not in (None, '') for value in values):
+                    yield number, dict(zip(header, values))
+        finally:
+            workbook.close()
+    elif name.endswith('.csv'):
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        reader = csv.reader(text)
+        header = _normalize_header(next(reader, []))
+        _check_header(header)
+        for number, values in enumerate(reader, start=2):
+            if any(value.strip() for value in values):
+                yield number, dict(zip(header, values))
+    else:
+        raise RosterImportError("Unsupported file type, upload a .xlsx or .csv file")
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _validate(frame):
+    """
+    Column-wise validation of one chunk.
+    Returns a dict of row number -> list of error messages.
+    """
+    errors = defaultdict(list)
+
+    def flag(mask, message):
+        for number in frame.index[mask.to_numpy()]:
+            errors[number].append(message)
+
+    flag(frame['student_name'] == '', "student_name is required")
+    for column, max_length in MAX_LENGTHS.items():
+        flag(frame[column].str.len() > max_length, f"{column} is longer than {max_length} characters")
+    flag(frame['grade'].isna() | (frame['grade'] % 1 != 0) | (frame['grade'] < 1),
+         "grade must be a positive whole number")
+    flag(~frame['parent_email'].str.match(EMAIL_PATTERN), "parent_email is not a valid email address")
+    flag((frame['contact'] != '') & frame['contact'].duplicated(keep='first'), "contact is repeated in the file")
+    return errors
+
+
+def _clean_frame(chunk):
+    frame = pd.DataFrame([row for _, row in chunk], columns=COLUMNS)
+    frame.index = [number for number, _ in chunk]
+    for column in COLUMNS:
+        frame[column] = frame[column].fillna('').astype(str).str.strip()
+    frame['parent_email'] = frame['parent_email'].str.lower()
+    frame['grade'] = pd.to_numeric(frame['grade'], errors='coerce')
+    return frame
+
+
+def import_roster(file, filename, school, chunk_size=2000, dry_run=False):
+    """
+    Import students (and any parents not yet registered) from a roster file.
+
+    Rows are processed in chunks: each chunk is validated column-wise with
+    pandas, parents are resolved with one case-insensitive email query, and
+    new parent Users, Parent rows and Students are written with bulk_create
+    inside one transaction per chunk. Invalid rows are skipped and reported.
+    New parents get an unusable password and set one through password reset.
+    """
+    report = {
+        'total_rows': 0,
+        'students_created': 0,
+        'parents_created': 0,
+        'errors': [],
+    }
+    seen_contacts = set()
+
+    for chunk in _chunks(read_roster(file, filename), chunk_size):
+        frame = _clean_frame(chunk)
+        errors = _validate(frame)
+        report['total_rows'] += len(frame)
+
+        # Contacts must stay unique across chunks and against existing students
+        contacts = set(frame.loc[frame['contact'] != '', 'contact'])
+        taken = seen_contacts | set(
+            Student.objects.filter(contact__in=contacts).values_list('contact', flat=True)
+        )
+        for number in frame.index[frame['contact'].isin(taken).to_numpy()]:
+            errors[number].append("contact already belongs to another student")
+        seen_contacts |= contacts
+
+        # Emails in the file are lowercased; match existing accounts whatever their case
+        emails = set(frame['parent_email']) - {''}
+        existing = {
+            user['email_lower']: user
+            for user in User.objects.annotate(email_lower=Lower('email')).filter(
+                email_lower__in=emails
+            ).values('id', 'email_lower', 'role', 'school_id')
+        }
+        for number, email in frame['parent_email'].items():
+            user = existing.get(email)
+            if user is None:
+                continue
+            if user['role'] != Role.PARENT:
+                errors[number].append("parent_email belongs to a non-parent account")
+            elif user['school_id'] != school.id:
+                errors[number].append("parent belongs to a different school")
+
+        for number in sorted(errors):
+            report['errors'].append({'row': number, 'errors': errors[number]})
+
+        valid = frame[~frame.index.isin(list(errors))]
+        if valid.empty or dry_run:
+            continue
+
+        parent_ids = {email: user['id'] for email, user in existing.items()}
+        # Legacy Parent rows may exist without a User, keep those
+        legacy_parents = set(
+            Parent.objects.annotate(email_lower=Lower('email')).filter(
+                email_lower__in=set(valid['parent_email']) - set(parent_ids)
+            ).values_list('email_lower', flat=True)
+        )
+        new_users = []
+        new_parents = []
+        for row in valid.drop_duplicates('parent_email').itertuples():
+            if row.parent_email in parent_ids:
+                continue
+            parent_id = uuid.uuid4()
+            parent_ids[row.parent_email] = parent_id
+            name = row.parent_name or row.parent_email.split('@')[0][:MAX_LENGTHS['parent_name']]
+            new_users.append(User(
+                id=parent_id,
+                email=row.parent_email,
+                first_name=name,
+                role=Role.PARENT,
+                school=school,
+                password=make_password(None)
+            ))
+            if row.parent_email in legacy_parents:
+                continue
+            new_parents.append(Parent(
+                id=parent_id,
+                name=name,
+                email=row.parent_email,
+                phone_number=row.parent_phone or None,
+                school=school
+            ))
+
+        students = [
+            Student(
+                name=row.student_name,
+                grade=int(row.grade),
+                class_assigned=row.class_assigned or None,
+                contact=row.contact or None,
+                parent_id=parent_ids[row.parent_email],
+                school=school
+            )
+            for row in valid.itertuples()
+        ]
+
+        with transaction.atomic():
+            User.objects.bulk_create(new_users, batch_size=chunk_size)
+            Parent.objects.bulk_create(new_parents, batch_size=chunk_size, ignore_conflicts=True)
+            Student.objects.bulk_create(students, batch_size=chunk_size)
+
+        report['parents_created'] += len(new_users)
+        report['students_created'] += len(students)
+
+    if report['students_created']:
+        # bulk_create skips the signals that maintain the statistics counters
+        rebuild_school_stats([school.id])
+
+    report['error_count'] = len(report['errors'])
+    return report
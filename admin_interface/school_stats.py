@@ -0,0 +1,147 @@
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from .models import School, SchoolStatistics, Teacher, Student, Parent, User, Notification, Role
+
+COUNTER_FIELDS = [
+    'teacher_count', 'student_count', 'parent_count', 'parent_user_count',
+    'admin_count', 'user_count', 'active_user_count', 'notification_count',
+]
+
+
+def stats_scope(school_id):
+    """Key of the statistics row counting records for the given school"""
+    return str(school_id) if school_id else SchoolStatistics.UNASSIGNED_SCOPE
+
+
+def adjust_school_stats(school_id, grades=None, **deltas):
+    """
+    Apply counter deltas (e.g. student_count=1, grades={7: 1}) to a school's
+    statistics row under a row lock. A missing row is left alone: it is
+    rebuilt from the source tables the next time it is read.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    grades = {str(grade): delta for grade, delta in (grades or {}).items() if delta}
+    if not deltas and not grades:
+        return
+
+    with transaction.atomic():
+        stats = SchoolStatistics.objects.select_for_update().filter(
+            scope=stats_scope(school_id)
+        ).first()
+        if stats is None:
+            return
+
+        for field, delta in deltas.items():
+            setattr(stats, field, getattr(stats, field) + delta)
+        for grade, delta in grades.items():
+            count = stats.students_per_grade.get(grade, 0) + delta
+            if count > 0:
+                stats.students_per_grade[grade] = count
+            else:
+                stats.students_per_grade.pop(grade, None)
+        stats.save(update_fields=list(deltas) + (['students_per_grade'] if grades else []) + ['updated_at'])
+
+
+def set_school_stats(school_id, **values):
+    """Overwrite counters whose new value the caller already knows"""
+    SchoolStatistics.objects.filter(scope=stats_scope(school_id)).update(**values)
+
+
+def rebuild_school_stats(school_ids=None):
+    """
+    Recount every counter from the source tables with one GROUP BY query per
+    model and upsert the statistics rows. Rebuilds all schools (and the
+    unassigned row) when school_ids is None.
+    Returns a dict of scope -> SchoolStatistics.
+    """
+    def scoped(queryset, field='school_id'):
+        if school_ids is None:
+            return queryset
+        return queryset.filter(**{f'{field}__in': school_ids})
+
+    if school_ids is None:
+        targets = [None] + list(School.objects.values_list('id', flat=True))
+    else:
+        targets = list(School.objects.filter(id__in=school_ids).values_list('id', flat=True))
+
+    counters = defaultdict(Counter)
+    grades = defaultdict(dict)
+    for model, field in ((Teacher, 'teacher_count'), (Parent, 'parent_count'), (Notification, 'notification_count')):
+        for row in scoped(model.objects.order_by()).values('school_id').annotate(total=Count('id')):
+            counters[row['school_id']][field] = row['total']
+
+    for row in scoped(Student.objects.order_by()).values('school_id', 'grade').annotate(total=Count('id')):
+        counters[row['school_id']]['student_count'] += row['total']
+        grades[row['school_id']][str(row['grade'])] = row['total']
+
+    user_rows = scoped(User.objects.order_by()).values('school_id').annotate(
+        user_count=Count('id'),
+        active_user_count=Count('id', filter=Q(is_active=True)),
+        parent_user_count=Count('id', filter=Q(role=Role.PARENT)),
+        admin_count=Count('id', filter=Q(role=Role.ADMIN)),
+    )
+    for row in user_rows:
+        school_id = row.pop('school_id')
+        counters[school_id].update(row)
+
+    rows = [
+        SchoolStatistics(
+            scope=stats_scope(school_id),
+            school_id=school_id,
+            students_per_grade=grades[school_id],
+            **{field: counters[school_id][field] for field in COUNTER_FIELDS}
+        )
+        for school_id in targets
+    ]
+    SchoolStatistics.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['scope'],
+        update_fields=COUNTER_FIELDS + ['students_per_grade', 'updated_at'],
+    )
+    return {row.scope: row for row in rows}
+
+
+def get_school_stats(school):
+    """Statistics row for a school, built on first access"""
+    stats = SchoolStatistics.objects.filter(scope=stats_scope(school.id)).first()
+    if stats is None:
+        stats = rebuild_school_stats([school.id])[stats_scope(school.id)]
+    return stats
+
+
+def students_per_grade(stats):
+    """Per-grade student counts in the shape the statistics endpoints return"""
+    return [
+        {'grade': int(grade), 'count': count}
+        for grade, count in sorted(stats.students_per_grade.items(), key=lambda item: int(item[0]))
+    ]
+
+
+def get_global_stats():
+    """
+    Totals across every school (plus records without a school) summed from
+    the statistics rows. Missing rows are rebuilt before summing.
+    """
+    school_count = School.objects.count()
+
+    def totals():
+        return SchoolStatistics.objects.aggregate(
+            rows=Count('id'),
+            users=Sum('user_count'),
+            teachers=Sum('teacher_count'),
+            students=Sum('student_count'),
+        )
+
+    result = totals()
+    if result['rows'] != school_count + 1:
+        rebuild_school_stats()
+        result = totals()
+
+    return {
+        'school_count': school_count,
+        'users_count': result['users'] or 0,
+        'teachers_count': result['teachers'] or 0,
+        'students_count': result['students'] or 0,
+    }
@@ -1,10 +1,29 @@
 from rest_framework import serializers
-from .models import User, Teacher, Student, Notification, Parent, ExamResult, Role, Document, Message, LeaveApplication, Product, ExamPDF, SchoolEvent, TeacherParentAssociation, School, TimeTable, Attendance, Order, OrderItem
+from .models import User, Teacher, Student, Notification, Parent, ExamResult, Role, Document, Message, LeaveApplication, Product, ExamPDF, SchoolEvent, TeacherParentAssociation, School, TimeTable, Attendance, Order, OrderItem, StudentRanking
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import make_password
+import heapq
 import uuid
+from collections import Counter
+from datetime import timedelta
+from django.db import transaction
 from django.utils import timezone
+from .aggregates import attendance_counts, attendance_percentage, empty_attendance_counts
+from .image_variants import variant_urls
+from .shop import adjust_stock, lock_products
+
+
+class ImageVariantsField(serializers.Field):
+    """URLs of the resized variants of an image field, {size: {format: url}}"""
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return variant_urls(instance, self.image_field, self.context.get('request'))
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User (Admins)"""
@@ -21,10 +40,12 @@ class UserSerializer(serializers.ModelSerializer):
 
 class SchoolSerializer(serializers.ModelSerializer):
     """Serializer for School model"""
+    logo_variants = ImageVariantsField('logo')
+
     class Meta:
         model = School
         fields = ['id', 'name', 'address', 'phone_number', 'email', 
-                 'website', 'logo', 'registration_number', 
+                 'website', 'logo', 'logo_variants', 'registration_number', 
                  'created_at', 'updated_at', 'is_active']
         read_only_fields = ['created_at', 'updated_at']
 
@@ -124,10 +145,12 @@ class TeacherSerializer(serializers.ModelSerializer):
     """Serializer for Teachers"""
     password = serializers.CharField(write_only=True, required=False)
     password_confirmation = serializers.CharField(write_only=True, required=False)
+    profile_pic_variants = ImageVariantsField('profile_pic')
     
     class Meta:
         model = Teacher
         fields = '__all__'
+        read_only_fields = ['user']
         extra_kwargs = {
             'password': {'write_only': True},
             'password_confirmation': {'write_only': True}
@@ -191,6 +214,7 @@ class TeacherSerializer(serializers.ModelSerializer):
         
         # Create Teacher with the same UUID
         validated_data['id'] = teacher_id
+        validated_data['user'] = user
         teacher = Teacher.objects.create(**validated_data)
         return teacher
 
@@ -490,6 +514,32 @@ class MessageSerializer(serializers.ModelSerializer):
         except User.DoesNotExist:
             return value
 
+class ConversationSerializer(serializers.ModelSerializer):
+    """A conversation in the inbox: its latest message and the unread count"""
+    counterpart_id = serializers.UUIDField(read_only=True)
+    counterpart_name = serializers.SerializerMethodField()
+    counterpart_role = serializers.SerializerMethodField()
+    last_message = serializers.CharField(source='content', read_only=True)
+    last_message_at = serializers.DateTimeField(source='created_at', read_only=True)
+    unread = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Message
+        fields = [
+            'counterpart_id', 'counterpart_name', 'counterpart_role',
+            'id', 'sender', 'last_message', 'last_message_at', 'is_read', 'unread'
+        ]
+
+    def _counterpart(self, obj):
+        return obj.sender if obj.sender_id == obj.counterpart_id else obj.receiver
+
+    def get_counterpart_name(self, obj):
+        return self._counterpart(obj).first_name
+
+    def get_counterpart_role(self, obj):
+        return self._counterpart(obj).role
+
+
 class TeacherParentAssociationSerializer(serializers.ModelSerializer):
     teacher_name = serializers.CharField(source='teacher.name', read_only=True)
     parent_name = serializers.CharField(source='parent.first_name', read_only=True)
@@ -532,6 +582,7 @@ class ProductSerializer(serializers.ModelSerializer):
     """Serializer for products in the school shop"""
     image = serializers.ImageField(required=True, allow_null=False)
     price = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField('image')
 
     class Meta:
         model = Product
@@ -604,84 +655,57 @@ class OrderCreateSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError("Quantity must be positive")
             except ValueError:
                 raise serializers.ValidationError("Quantity must be a number")
+            try:
+                item['product'] = str(uuid.UUID(item['product']))
+            except ValueError:
+                raise serializers.ValidationError(f"Product with ID '{item['product']}' not found")
         
         return items
 
     def create(self, validated_data):
-        try:
-            items_data = validated_data.pop('items')
-            total_amount = 0
+        """
+        Place the order in one transaction: lock every product in one
+        query, check stock against the locked rows, then write the order,
+        its items and the stock decrements. Two parents buying the last
+        item queue on the row lock and the second one sees it sold out.
+        """
+        items_data = validated_data.pop('items')
+        quantities = Counter()
+        for item_data in items_data:
+            quantities[item_data['product']] += int(item_data['quantity'])
+
+        with transaction.atomic():
+            products = lock_products(quantities)
+            for product_id, quantity in quantities.items():
+                product = products.get(product_id)
+                if product is None:
+                    raise serializers.ValidationError(f"Product with ID '{product_id}' not found")
+                if product.stock < quantity:
+                    raise serializers.ValidationError(f"Not enough stock for {product.name}. Available: {product.stock}, Requested: {quantity}")
 
             # Create order - parent, school, status are set by perform_create() in the view
-            try:
-                order = Order.objects.create(
-                    total_amount=total_amount,
-                    **validated_data
+            order_items = [
+                OrderItem(
+                    product=products[item_data['product']],
+                    quantity=int(item_data['quantity']),
+                    unit_price=products[item_data['product']].price,
+                    total_price=products[item_data['product']].price * int(item_data['quantity'])
                 )
-            except Exception as e:
-                raise serializers.ValidationError(f"Order creation failed: {str(e)}")
+                for item_data in items_data
+            ]
+            order = Order.objects.create(
+                total_amount=sum(order_item.total_price for order_item in order_items),
+                **validated_data
+            )
+            for order_item in order_items:
+                order_item.order = order
+            OrderItem.objects.bulk_create(order_items)
 
-            # Create order items
-            for i, item_data in enumerate(items_data):
-                try:
-                    product_id = item_data['product']
-
-                    try:
-                        product = Product.objects.get(id=product_id)
-
-                    except Product.DoesNotExist:
-                        order.delete()
-                        raise serializers.ValidationError(f"Product with ID '{product_id}' not found")
-                    except Exception as e:
-                        order.delete()
-                        raise serializers.ValidationError(f"Product lookup error: {type(e).__name__}: {str(e)}")
-                    
-                    quantity = int(item_data['quantity'])
-
-                    if product.stock < quantity:
-                        order.delete()
-                        raise serializers.ValidationError(f"Not enough stock for {product.name}. Available: {product.stock}, Requested: {quantity}")
-
-                    # Create order item
-                    try:
-                        order_item = OrderItem.objects.create(
-                            order=order,
-                            product=product,
-                            quantity=quantity,
-                            unit_price=product.price,
-                            total_price=product.price * quantity
-                        )
-                    except Exception as e:
-                        order.delete()
-                        raise serializers.ValidationError(f"OrderItem creation failed: {type(e).__name__}: {str(e)}")
-
-                    # Update product stock
-                    try:
-                        product.stock -= quantity
-                        product.save()
-                    except Exception as e:
-                        order.delete()
-                        raise serializers.ValidationError(f"Product stock update failed: {type(e).__name__}: {str(e)}")
-                    
-                    # Update total amount
-                    total_amount += product.price * quantity
-
-                except Exception as e:
-                    if 'order' in locals():
-                        order.delete()
-                    raise
-
-            # Update order total
-            try:
-                order.total_amount = total_amount
-                order.save()
-            except Exception as e:
-                order.delete()
-                raise serializers.ValidationError(f"Order total update failed: {type(e).__name__}: {str(e)}")
-            return order
-            
-        except Exception as e:
-            raise serializers.ValidationError(f"Order creation failed: {type(e).__name__}: {str(e)}")
+            adjust_stock(
+                {product_id: -quantity for product_id, quantity in quantities.items()},
+                {product.school_id for product in products.values()}
+            )
+        return order
 
 class ExamPDFSerializer(serializers.ModelSerializer):
     download_url = serializers.SerializerMethodField()
@@ -757,6 +781,35 @@ class AttendanceSerializer(serializers.ModelSerializer):
         fields = ['id', 'student', 'student_name', 'date', 'status', 'reason', 'recorded_by', 'recorded_by_name', 'created_at']
         read_only_fields = ['recorded_by', 'created_at']
 
+class AttendanceEntrySerializer(serializers.Serializer):
+    """A single student's row in a bulk attendance submission"""
+    student_id = serializers.UUIDField()
+    status = serializers.ChoiceField(choices=Attendance._meta.get_field('status').choices)
+    reason = serializers.CharField(required=False, allow_blank=True, default='')
+
+class ClassAttendanceSerializer(serializers.Serializer):
+    """Attendance rows for one class in a school-wide submission"""
+    class_name = serializers.CharField()
+    attendance = AttendanceEntrySerializer(many=True, allow_empty=False)
+
+class MarkAttendanceSerializer(serializers.Serializer):
+    """Payload of AttendanceViewSet.mark_class_attendance"""
+    date = serializers.DateField(required=False)
+    attendance = AttendanceEntrySerializer(many=True, required=False)
+    classes = ClassAttendanceSerializer(many=True, required=False)
+
+class StudentRankingSerializer(serializers.ModelSerializer):
+    student_name = serializers.CharField(source='student.name', read_only=True)
+
+    class Meta:
+        model = StudentRanking
+        fields = [
+            'id', 'student', 'student_name', 'year', 'term', 'class_assigned', 'grade',
+            'subjects_count', 'total_marks', 'average_marks',
+            'class_position', 'class_dense_position', 'grade_position', 'grade_dense_position',
+            'updated_at'
+        ]
+
 class ComprehensiveStudentSerializer(serializers.ModelSerializer):
     """Comprehensive Student serializer with all related data"""
     exam_results = ExamResultSerializer(many=True, read_only=True)
@@ -820,57 +873,47 @@ class ComprehensiveStudentSerializer(serializers.ModelSerializer):
             'class_assigned': teacher.class_assigned
         } for teacher in teachers]
 
+    def _related_rows(self, obj, related_name):
+        """Rows prefetched by the view, or None if the relation was not prefetched"""
+        return getattr(obj, '_prefetched_objects_cache', {}).get(related_name)
+
     def get_attendance_statistics(self, obj):
         """Calculate attendance statistics for the student"""
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        # Get attendance records for current academic year
-        current_year = timezone.now().year
-        
         # Get records for the last 90 days as a reasonable sample
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=90)
         
-        attendance_records = obj.attendance_records.filter(
-            date__gte=start_date,
-            date__lte=end_date
-        )
-        
-        total_days = attendance_records.count()
-        if total_days == 0:
-            return {
-                'total_days_recorded': 0,
-                'present_days': 0,
-                'absent_days': 0,
-                'late_days': 0,
-                'excused_days': 0,
-                'attendance_percentage': 0.0,
-                'period': f'{start_date} to {end_date}'
-            }
-        
-        present_days = attendance_records.filter(status='present').count()
-        absent_days = attendance_records.filter(status='absent').count()
-        late_days = attendance_records.filter(status='late').count()
-        excused_days = attendance_records.filter(status='excused').count()
-        
-        attendance_percentage = (present_days / total_days) * 100 if total_days > 0 else 0
+        prefetched = self._related_rows(obj, 'attendance_records')
+        if prefetched is not None:
+            # Count the prefetched rows in a single pass, no extra queries
+            counts = empty_attendance_counts()
+            for record in prefetched:
+                if start_date <= record.date <= end_date and record.status in counts:
+                    counts[record.status] += 1
+                    counts['total_records'] += 1
+        else:
+            counts = attendance_counts(
+                obj.attendance_records.filter(date__gte=start_date, date__lte=end_date)
+            ).get(obj.id, empty_attendance_counts())
         
         return {
-            'total_days_recorded': total_days,
-            'present_days': present_days,
-            'absent_days': absent_days,
-            'late_days': late_days,
-            'excused_days': excused_days,
-            'attendance_percentage': round(attendance_percentage, 2),
+            'total_days_recorded': counts['total_records'],
+            'present_days': counts['present'],
+            'absent_days': counts['absent'],
+            'late_days': counts['late'],
+            'excused_days': counts['excused'],
+            'attendance_percentage': float(attendance_percentage(counts)),
             'period': f'{start_date} to {end_date}'
         }
 
     def get_academic_summary(self, obj):
         """Calculate academic performance summary"""
-        exam_results = obj.exam_results.all()
+        # Reuse the prefetched rows when available, otherwise load them once
+        exam_results = self._related_rows(obj, 'exam_results')
+        if exam_results is None:
+            exam_results = list(obj.exam_results.all())
         
-        if not exam_results.exists():
+        if not exam_results:
             return {
                 'total_exams': 0,
                 'average_marks': 0.0,
@@ -881,25 +924,25 @@ class ComprehensiveStudentSerializer(serializers.ModelSerializer):
                 'recent_performance': []
             }
         
-        total_exams = exam_results.count()
-        total_marks = sum([float(result.marks) for result in exam_results])
-        average_marks = total_marks / total_exams if total_exams > 0 else 0
-        
-        marks_list = [float(result.marks) for result in exam_results]
-        highest_mark = max(marks_list) if marks_list else 0
-        lowest_mark = min(marks_list) if marks_list else 0
-        
-        # Count unique subjects
-        subjects_count = exam_results.values('subject').distinct().count()
-        
-        # Grade distribution
+        # Single pass over the results for totals, extremes, subjects and grades
+        total_marks = 0.0
+        highest_mark = None
+        lowest_mark = None
+        subjects = set()
         grade_distribution = {}
         for result in exam_results:
-            grade = result.grade
-            grade_distribution[grade] = grade_distribution.get(grade, 0) + 1
+            mark = float(result.marks)
+            total_marks += mark
+            highest_mark = mark if highest_mark is None else max(highest_mark, mark)
+            lowest_mark = mark if lowest_mark is None else min(lowest_mark, mark)
+            subjects.add(result.subject)
+            grade_distribution[result.grade] = grade_distribution.get(result.grade, 0) + 1
+        
+        total_exams = len(exam_results)
+        average_marks = total_marks / total_exams
         
         # Recent performance (last 5 exams)
-        recent_results = exam_results.order_by('-created_at')[:5]
+        recent_results = heapq.nlargest(5, exam_results, key=lambda result: result.created_at)
         recent_performance = [{
             'exam_name': result.exam_name,
             'subject': result.subject,
@@ -913,7 +956,7 @@ class ComprehensiveStudentSerializer(serializers.ModelSerializer):
             'average_marks': round(average_marks, 2),
             'highest_mark': highest_mark,
             'lowest_mark': lowest_mark,
-            'subjects_count': subjects_count,
+            'subjects_count': len(subjects),
             'grade_distribution': grade_distribution,
             'recent_performance': recent_performance
         }
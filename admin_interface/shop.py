@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Sum, When
+from django.utils import timezone
+from .conditional import bump_version
+from .models import Order, OrderItem, Product
+
+# Statuses an order may be in to move to each status
+ORDER_TRANSITIONS = {
+    'processing': ['pending'],
+    'completed': ['processing'],
+    'cancelled': ['pending', 'processing'],
+}
+
+
+def lock_products(product_ids):
+    """
+    Lock products for a stock change, in id order so concurrent checkouts
+    of overlapping baskets always queue instead of deadlocking.
+    Must run inside a transaction.
+    """
+    return {
+        str(product.id): product
+        for product in Product.objects.select_for_update().filter(id__in=product_ids).order_by('id')
+    }
+
+
+def adjust_stock(changes, school_ids):
+    """
+    Add `changes` ({product_id: delta}) to stock in one UPDATE.
+    F() expressions apply each delta to the value in the row, not the one
+    read earlier. A queryset update sends no signals, so the product
+    ETags of `school_ids` are bumped here; the cached catalog reads stock
+    fresh and needs no rebuild.
+    """
+    changes = {product_id: delta for product_id, delta in changes.items() if delta}
+    if not changes:
+        return
+    Product.objects.filter(id__in=changes).update(
+        stock=Case(
+            *[When(id=product_id, then=F('stock') + delta) for product_id, delta in changes.items()],
+            default=F('stock'),
+            output_field=PositiveIntegerField()
+        )
+    )
+    for school_id in school_ids:
+        bump_version('products', school_id)
+
+
+def transition_orders(orders, new_status):
+    """
+    Move the orders in `orders` that may enter `new_status` there in one
+    conditional UPDATE and return how many moved. The status is checked
+    by the database, so an order a concurrent request already moved is
+    left alone.
+    """
+    return orders.filter(status__in=ORDER_TRANSITIONS[new_status]).update(
+        status=new_status,
+        updated_at=timezone.now()
+    )
+
+
+def cancel_orders(orders):
+    """
+    Cancel the cancellable orders in `orders` and put their items back in
+    stock, in one transaction: the orders are locked and moved with one
+    UPDATE, then the stock of every product is returned with one more.
+    An order cancelled twice at once returns its stock only once.
+    Returns the ids of the cancelled orders.
+    """
+    with transaction.atomic():
+        order_ids = list(
+            orders.filter(status__in=ORDER_TRANSITIONS['cancelled']).select_for_update().values_list('id', flat=True)
+        )
+        if not order_ids:
+            return []
+        Order.objects.filter(id__in=order_ids).update(status='cancelled', updated_at=timezone.now())
+
+        returned = OrderItem.objects.filter(order_id__in=order_ids).values('product_id').annotate(
+            quantity=Sum('quantity')
+        ).order_by()
+        returned = {str(row['product_id']): row['quantity'] for row in returned}
+        products = lock_products(returned)
+        adjust_stock(returned, {product.school_id for product in products.values()})
+    return order_ids
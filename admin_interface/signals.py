@@ -0,0 +1,330 @@
+from collections import Counter, defaultdict
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .analytics import invalidate_exam_analytics
+from .catalog import CATALOG_FIELDS, catalog_snapshot, invalidate_catalog
+from .conditional import bump_version
+from .image_variants import IMAGE_FIELDS, enqueue_image_variants, image_name
+from .models import (
+    School, SchoolStatistics, Teacher, Student, Parent, User, Notification, ExamResult, Message, Role,
+    SchoolEvent, Product
+)
+from .middleware import user_cache
+from .notifications import schedule_notification_push
+from .rankings import schedule_ranking_refresh, schedule_student_ranking_refresh
+from .school_stats import adjust_school_stats, rebuild_school_stats, stats_scope
+from .unread import adjust_unread
+
+# Fields whose values decide which school counters a record contributes to
+TRACKED_FIELDS = {
+    Teacher: ('school_id',),
+    Parent: ('school_id',),
+    Notification: ('school_id',),
+    Student: ('school_id', 'grade'),
+    User: ('school_id', 'role', 'is_active'),
+}
+
+
+def _snapshot(instance):
+    """Tracked field values read without touching deferred fields"""
+    values = instance.__dict__
+    fields = TRACKED_FIELDS[type(instance)]
+    if any(field not in values for field in fields):
+        return None
+    return tuple(values[field] for field in fields)
+
+
+def _contribution(model, snapshot):
+    """Counters (and per-grade counts) a single record adds to its school"""
+    values = dict(zip(TRACKED_FIELDS[model], snapshot))
+    grades = {}
+    if model is Teacher:
+        counters = {'teacher_count': 1}
+    elif model is Parent:
+        counters = {'parent_count': 1}
+    elif model is Notification:
+        counters = {'notification_count': 1}
+    elif model is Student:
+        counters = {'student_count': 1}
+        grades = {values['grade']: 1}
+    else:
+        counters = {
+            'user_count': 1,
+            'active_user_count': int(bool(values['is_active'])),
+            'parent_user_count': int(values['role'] == Role.PARENT),
+            'admin_count': int(values['role'] == Role.ADMIN),
+        }
+    return values['school_id'], counters, grades
+
+
+def _apply(model, changes):
+    """Apply a list of (snapshot, sign) changes, one locked update per school"""
+    counters = defaultdict(Counter)
+    grades = defaultdict(Counter)
+    for snapshot, sign in changes:
+        school_id, record_counters, record_grades = _contribution(model, snapshot)
+        for field, value in record_counters.items():
+            counters[school_id][field] += sign * value
+        for grade, value in record_grades.items():
+            grades[school_id][grade] += sign * value
+
+    for school_id in set(counters) | set(grades):
+        adjust_school_stats(school_id, grades=grades[school_id], **counters[school_id])
+
+
+def _remember(sender, instance, **kwargs):
+    instance._stats_snapshot = _snapshot(instance)
+
+
+def _record_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stats_snapshot', None)
+    current = _snapshot(instance)
+    instance._stats_snapshot = current
+    if current is None:
+        return
+
+    if created:
+        _apply(sender, [(current, 1)])
+    elif previous is None:
+        # The old values were never loaded, recount the affected school
+        if instance.school_id:
+            rebuild_school_stats([instance.school_id])
+    elif previous != current:
+        _apply(sender, [(previous, -1), (current, 1)])
+
+
+def _record_deleted(sender, instance, **kwargs):
+    snapshot = getattr(instance, '_stats_snapshot', None) or _snapshot(instance)
+    if snapshot is not None:
+        _apply(sender, [(snapshot, -1)])
+
+
+for model in TRACKED_FIELDS:
+    post_init.connect(_remember, sender=model, dispatch_uid=f'school_stats_init_{model.__name__}')
+    post_save.connect(_record_saved, sender=model, dispatch_uid=f'school_stats_save_{model.__name__}')
+    post_delete.connect(_record_deleted, sender=model, dispatch_uid=f'school_stats_delete_{model.__name__}')
+
+
+@receiver(post_save, sender=School, dispatch_uid='school_stats_school_created')
+def create_school_statistics(sender, instance, created, raw=False, **kwargs):
+    """A new school starts with an empty statistics row"""
+    if created and not raw:
+        SchoolStatistics.objects.get_or_create(
+            scope=stats_scope(instance.id),
+            defaults={'school': instance}
+        )
+
+
+@receiver(post_save, sender=User, dispatch_uid='websocket_user_cache_save')
+@receiver(post_delete, sender=User, dispatch_uid='websocket_user_cache_delete')
+def invalidate_websocket_user(sender, instance, **kwargs):
+    """Drop the cached user so the next WebSocket handshake reloads it"""
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Teacher, dispatch_uid='teacher_link_user')
+def link_teacher_to_user(sender, instance, raw=False, **kwargs):
+    """Attach a teacher profile saved without a login account to the teacher User with its email"""
+    if raw or instance.__dict__.get('user_id', False) is not None:
+        return
+    user_id = User.objects.filter(
+        email=instance.email, role=Role.TEACHER, teacher_profile__isnull=True
+    ).values_list('id', flat=True).first()
+    if user_id is not None:
+        Teacher.objects.filter(pk=instance.pk).update(user_id=user_id)
+        instance.user_id = user_id
+
+
+@receiver(post_save, sender=User, dispatch_uid='user_link_teacher')
+def link_user_to_teacher(sender, instance, created, raw=False, **kwargs):
+    """A teacher account created after its profile takes over the profile"""
+    if created and not raw and instance.role == Role.TEACHER:
+        Teacher.objects.filter(email=instance.email, user__isnull=True).update(user=instance)
+
+
+def _analytics_slice(instance):
+    values = instance.__dict__
+    if any(field not in values for field in ('school_id', 'year', 'term')):
+        return None
+    return values['school_id'], values['year'], values['term']
+
+
+@receiver(post_init, sender=ExamResult, dispatch_uid='exam_analytics_init')
+def remember_analytics_slice(sender, instance, **kwargs):
+    instance._analytics_slice = _analytics_slice(instance)
+
+
+@receiver(post_save, sender=ExamResult, dispatch_uid='exam_analytics_save')
+@receiver(post_delete, sender=ExamResult, dispatch_uid='exam_analytics_delete')
+def exam_result_changed(sender, instance, **kwargs):
+    """
+    Drop cached analytics and refresh rankings for the term the result was
+    in and the one it is in now
+    """
+    slices = {getattr(instance, '_analytics_slice', None), _analytics_slice(instance)}
+    for analytics_slice in slices - {None}:
+        invalidate_exam_analytics(*analytics_slice)
+        schedule_ranking_refresh(*analytics_slice)
+    instance._analytics_slice = _analytics_slice(instance)
+
+
+def _ranking_placement(instance):
+    values = instance.__dict__
+    if any(field not in values for field in ('class_assigned', 'grade')):
+        return None
+    return values['class_assigned'], values['grade']
+
+
+@receiver(post_init, sender=Student, dispatch_uid='student_ranking_init')
+def remember_ranking_placement(sender, instance, **kwargs):
+    instance._ranking_placement = _ranking_placement(instance)
+
+
+@receiver(post_save, sender=Student, dispatch_uid='student_ranking_save')
+def student_placement_changed(sender, instance, created, raw=False, **kwargs):
+    """Re-rank the terms of a student who moved to another class or grade"""
+    if raw:
+        return
+    previous = getattr(instance, '_ranking_placement', None)
+    current = _ranking_placement(instance)
+    instance._ranking_placement = current
+    if not created and previous != current:
+        schedule_student_ranking_refresh([instance.pk])
+
+
+def _unread_key(instance):
+    values = instance.__dict__
+    if any(field not in values for field in ('receiver_id', 'sender_id', 'is_read')):
+        return None
+    if values['is_read'] or values['receiver_id'] is None:
+        return None
+    return values['receiver_id'], values['sender_id']
+
+
+@receiver(post_init, sender=Message, dispatch_uid='unread_message_init')
+def remember_unread(sender, instance, **kwargs):
+    instance._unread_key = _unread_key(instance)
+
+
+@receiver(post_save, sender=Message, dispatch_uid='unread_message_save')
+def message_saved(sender, instance, created, raw=False, **kwargs):
+    """Count a new unread message, or uncount one that was read or moved"""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_unread_key', None)
+    current = _unread_key(instance)
+    if previous != current:
+        pairs = Counter()
+        if previous:
+            pairs[previous] -= 1
+        if current:
+            pairs[current] += 1
+        adjust_unread(pairs)
+    instance._unread_key = current
+
+
+@receiver(post_delete, sender=Message, dispatch_uid='unread_message_delete')
+def message_deleted(sender, instance, **kwargs):
+    key = getattr(instance, '_unread_key', None)
+    if key:
+        adjust_unread({key: -1})
+
+
+@receiver(post_save, sender=Notification, dispatch_uid='notification_publish')
+def notification_created(sender, instance, created, raw=False, **kwargs):
+    """Push a new notification to the connected clients of its audience"""
+    if created and not raw:
+        schedule_notification_push(instance)
+
+
+# Cached resources whose per-school version changes with each model
+VERSIONED_RESOURCES = {
+    Notification: ['notifications'],
+    SchoolEvent: ['events'],
+    Product: ['products'],
+    Student: ['parent-profile'],
+    Parent: ['parent-profile'],
+    User: ['parent-profile'],
+    School: ['parent-profile'],
+}
+
+
+@receiver(post_init, sender=Student, dispatch_uid='resource_version_student_init')
+def remember_parent(sender, instance, **kwargs):
+    instance._versioned_parent_id = instance.__dict__.get('parent_id')
+
+
+def _version_schools(sender, instance):
+    """Schools whose cached resources show the record"""
+    if sender is School:
+        return {instance.pk}
+    if sender is Student:
+        # Children are listed on the profile of their parent, which is
+        # versioned under the parent's school; a new parent drops them from the old one
+        parent_ids = {instance.__dict__.get('parent_id'), getattr(instance, '_versioned_parent_id', None)} - {None}
+        instance._versioned_parent_id = instance.__dict__.get('parent_id')
+        if Student.parent.is_cached(instance) and instance.parent and parent_ids == {instance.parent.pk}:
+            return {instance.parent.school_id}
+        return set(User.objects.filter(pk__in=parent_ids).values_list('school_id', flat=True))
+    return {instance.__dict__.get('school_id')}
+
+
+def _bump_versions(sender, instance, raw=False, update_fields=None, **kwargs):
+    """New ETags for the schools of a record that was written or deleted"""
+    if raw or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    for school_id in _version_schools(sender, instance):
+        for resource in VERSIONED_RESOURCES[sender]:
+            bump_version(resource, school_id)
+
+
+for model in VERSIONED_RESOURCES:
+    post_save.connect(_bump_versions, sender=model, dispatch_uid=f'resource_version_save_{model.__name__}')
+    post_delete.connect(_bump_versions, sender=model, dispatch_uid=f'resource_version_delete_{model.__name__}')
+
+
+@receiver(post_init, sender=Product, dispatch_uid='product_catalog_init')
+def remember_catalog_fields(sender, instance, **kwargs):
+    instance._catalog_snapshot = catalog_snapshot(instance)
+
+
+@receiver(post_save, sender=Product, dispatch_uid='product_catalog_save')
+def product_saved(sender, instance, created, raw=False, **kwargs):
+    """Rebuild the cached catalog unless only the stock changed"""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_catalog_snapshot', None)
+    current = catalog_snapshot(instance)
+    if previous is None or previous != current:
+        school_ids = {instance.school_id}
+        if previous is not None:
+            school_ids.add(dict(zip(CATALOG_FIELDS, previous))['school_id'])
+        for school_id in school_ids:
+            invalidate_catalog(school_id)
+    instance._catalog_snapshot = current
+
+
+@receiver(post_delete, sender=Product, dispatch_uid='product_catalog_delete')
+def product_deleted(sender, instance, **kwargs):
+    invalidate_catalog(instance.__dict__.get('school_id'))
+
+
+def _remember_image(sender, instance, **kwargs):
+    instance._image_name = image_name(instance, IMAGE_FIELDS[sender])
+
+
+def _image_saved(sender, instance, created, raw=False, **kwargs):
+    """Queue variants for a newly uploaded image"""
+    if raw:
+        return
+    current = image_name(instance, IMAGE_FIELDS[sender])
+    if current and (created or current != getattr(instance, '_image_name', current)):
+        enqueue_image_variants(instance, IMAGE_FIELDS[sender])
+    instance._image_name = current
+
+
+for model in IMAGE_FIELDS:
+    post_init.connect(_remember_image, sender=model, dispatch_uid=f'image_variants_init_{model.__name__}')
+    post_save.connect(_image_saved, sender=model, dispatch_uid=f'image_variants_save_{model.__name__}')
@@ -0,0 +1,2144 @@
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework import status
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from admin_interface.analytics import analytics_cache_key
+from admin_interface.image_variants import VARIANT_SIZES
+from admin_interface.message_buffer import message_buffer
+from admin_interface.rankings import refresh_rankings, schedule_ranking_refresh
+from admin_interface.metrics import reset_metrics
+from admin_interface.middleware import QueryRecorder, WebSocketJWTAuthMiddleware, user_cache
+from admin_interface.models import (
+    School, User, Parent, Student, Teacher, Attendance, ExamResult, Message, Notification, Role,
+    StudentRanking, SchoolStatistics, UnreadCounter, SchoolEvent, Product, ImageVariantJob,
+    Order, OrderItem
+)
+from admin_interface.routing import websocket_urlpatterns
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from openpyxl import Workbook
+from PIL import Image
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+
+# Benchmark timings, shown with a DEBUG level logging configuration
+logger = logging.getLogger(__name__)
+
+# Versioned caching is turned off on per-process caches; a file cache is
+# shared by every process, as Redis is in production
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'school_admin_test_cache'),
+    }
+}
+
+
+class ParentListQueryCountTest(APITestCase):
+    """Query-count benchmark for the parent list at realistic school size"""
+    PARENT_COUNT = 5000
+    STUDENT_COUNT = 12000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-001"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+
+        password = make_password('password123')
+        parent_ids = [uuid.uuid4() for _ in range(cls.PARENT_COUNT)]
+        Parent.objects.bulk_create([
+            Parent(
+                id=parent_id,
+                name=f"Parent {i}",
+                email=f"parent{i}@example.com",
+                school=cls.school,
+                password=password
+            )
+            for i, parent_id in enumerate(parent_ids)
+        ], batch_size=1000)
+        User.objects.bulk_create([
+            User(
+                id=parent_id,
+                email=f"parent{i}@example.com",
+                first_name=f"Parent {i}",
+                role=Role.PARENT,
+                school=cls.school,
+                password=password
+            )
+            for i, parent_id in enumerate(parent_ids)
+        ], batch_size=1000)
+        Student.objects.bulk_create([
+            Student(
+                name=f"Student {i}",
+                grade=(i % 8) + 1,
+                class_assigned=f"{(i % 8) + 1}A",
+                parent_id=parent_ids[i % cls.PARENT_COUNT],
+                school=cls.school
+            )
+            for i in range(cls.STUDENT_COUNT)
+        ], batch_size=1000)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_parent_list_uses_fixed_number_of_queries(self):
+        url = reverse('parent-list')
+        started = time.perf_counter()
+        # One query for the parents, one JOIN for all of their children
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), self.PARENT_COUNT)
+        children_total = sum(len(parent['children']) for parent in response.data)
+        self.assertEqual(children_total, self.STUDENT_COUNT)
+        logger.debug(f"Parent list ({self.PARENT_COUNT} parents, {self.STUDENT_COUNT} students): {elapsed:.2f}s")
+
+
+class ParentAttendanceSummaryQueryCountTest(APITestCase):
+    """The parent attendance screen must not scale queries with children"""
+    CHILD_COUNT = 4
+    DAYS = 60
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-002"
+        )
+        cls.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='password123',
+            role=Role.PARENT,
+            school=cls.school
+        )
+        cls.children = Student.objects.bulk_create([
+            Student(
+                name=f"Child {i}",
+                grade=i + 1,
+                class_assigned=f"{i + 1}A",
+                parent=cls.parent_user,
+                school=cls.school
+            )
+            for i in range(cls.CHILD_COUNT)
+        ])
+        statuses = ['present', 'present', 'present', 'absent', 'late', 'excused']
+        today = timezone.now().date()
+        Attendance.objects.bulk_create([
+            Attendance(
+                student=child,
+                date=today - timedelta(days=day),
+                status=statuses[day % len(statuses)]
+            )
+            for child in cls.children
+            for day in range(cls.DAYS)
+        ])
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.parent_user)
+
+    def test_attendance_summary_query_count(self):
+        url = reverse('parent-attendance-summary')
+        # Children, one conditional-count GROUP BY, one window query for recent records
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'days': 30})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['overall_stats']['total_children'], self.CHILD_COUNT)
+        for child in self.children:
+            summary = response.data['attendance_by_child'][str(child.id)]
+            statistics = summary['statistics']
+            self.assertEqual(statistics['total_records'], 31)
+            self.assertEqual(
+                statistics['total_records'],
+                statistics['present'] + statistics['absent'] + statistics['late'] + statistics['excused']
+            )
+            self.assertEqual(len(summary['recent_records']), 10)
+            recent_dates = [record['date'] for record in summary['recent_records']]
+            self.assertEqual(recent_dates, sorted(recent_dates, reverse=True))
+
+
+class ComprehensiveStudentDetailBenchmarkTest(APITestCase):
+    """Student detail statistics must come from the rows the view prefetches"""
+    EXAM_RESULT_COUNT = 600
+    ATTENDANCE_COUNT = 900
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-003"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        cls.teacher = Teacher.objects.create(
+            name="Class Teacher",
+            email="teacher@example.com",
+            class_assigned="7A",
+            school=cls.school
+        )
+        cls.student = Student.objects.bulk_create([
+            Student(name="Jane Doe", grade=7, class_assigned="7A", school=cls.school)
+        ])[0]
+
+        subjects = ['Mathematics', 'English', 'Science', 'History', 'Geography', 'Kiswahili']
+        grades = ['A', 'B', 'C', 'D']
+        ExamResult.objects.bulk_create([
+            ExamResult(
+                student=cls.student,
+                exam_name=f"Exam {i}",
+                subject=subjects[i % len(subjects)],
+                marks=40 + (i % 60),
+                grade=grades[i % len(grades)],
+                term=f"Term {(i % 3) + 1}",
+                year=2020 + (i % 5),
+                school=cls.school
+            )
+            for i in range(cls.EXAM_RESULT_COUNT)
+        ])
+
+        statuses = ['present', 'present', 'present', 'absent', 'late', 'excused']
+        today = timezone.now().date()
+        Attendance.objects.bulk_create([
+            Attendance(
+                student=cls.student,
+                date=today - timedelta(days=day),
+                status=statuses[day % len(statuses)],
+                recorded_by=cls.teacher
+            )
+            for day in range(cls.ATTENDANCE_COUNT)
+        ])
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_student_detail_query_count(self):
+        url = reverse('comprehensive-student-detail', kwargs={'student_id': self.student.id})
+        started = time.perf_counter()
+        # Student, exam results, attendance, recorded_by teachers and class teachers
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        student = response.data['student']
+        self.assertEqual(len(student['exam_results']), self.EXAM_RESULT_COUNT)
+        self.assertEqual(len(student['attendance_records']), self.ATTENDANCE_COUNT)
+
+        summary = student['academic_summary']
+        self.assertEqual(summary['total_exams'], self.EXAM_RESULT_COUNT)
+        self.assertEqual(summary['subjects_count'], 6)
+        self.assertEqual(summary['highest_mark'], 99.0)
+        self.assertEqual(summary['lowest_mark'], 40.0)
+        self.assertEqual(sum(summary['grade_distribution'].values()), self.EXAM_RESULT_COUNT)
+        self.assertEqual(len(summary['recent_performance']), 5)
+
+        # Only the last 90 days (inclusive) are counted
+        statistics = student['attendance_statistics']
+        self.assertEqual(statistics['total_days_recorded'], 91)
+        self.assertEqual(
+            statistics['total_days_recorded'],
+            statistics['present_days'] + statistics['absent_days']
+            + statistics['late_days'] + statistics['excused_days']
+        )
+        logger.debug(f"Student detail ({self.EXAM_RESULT_COUNT} results, {self.ATTENDANCE_COUNT} attendance): {elapsed:.2f}s")
+
+
+class SchoolStatisticsSnapshotTest(APITestCase):
+    """Statistics endpoints read the counters row instead of counting tables"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-004"
+        )
+        cls.superuser = User.objects.create_user(
+            email='superuser@example.com',
+            password='super123',
+            role=Role.SUPERUSER
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        cls.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='parent123',
+            role=Role.PARENT,
+            school=cls.school
+        )
+        Parent.objects.create(name="Parent", email='parent@example.com', school=cls.school)
+        for i in range(3):
+            Teacher.objects.create(name=f"Teacher {i}", email=f"teacher{i}@example.com", school=cls.school)
+        cls.students = [
+            Student.objects.create(name=f"Student {i}", grade=(i % 2) + 6, school=cls.school)
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_school_statistics_query_count(self):
+        # Counters row plus the five latest notifications
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('school-statistics'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_teachers'], 3)
+        self.assertEqual(response.data['total_students'], 5)
+        self.assertEqual(response.data['total_parents'], 1)
+        self.assertEqual(response.data['students_per_grade'], [
+            {'grade': 6, 'count': 3},
+            {'grade': 7, 'count': 2},
+        ])
+
+    def test_counters_follow_updates_and_deletes(self):
+        student = self.students[0]
+        student.grade = 7
+        student.save()
+        self.students[1].delete()
+
+        response = self.client.get(reverse('school-statistics'))
+        self.assertEqual(response.data['total_students'], 4)
+        self.assertEqual(response.data['students_per_grade'], [
+            {'grade': 6, 'count': 2},
+            {'grade': 7, 'count': 2},
+        ])
+
+    def test_bulk_promotion_moves_grade_counters(self):
+        self.client.post(reverse('admin-bulk-promote-students'), {'from_grade': 6, 'to_grade': 7}, format='json')
+
+        response = self.client.get(reverse('school-statistics'))
+        self.assertEqual(response.data['students_per_grade'], [{'grade': 7, 'count': 5}])
+
+    def test_bulk_promotion_to_the_same_grade_is_rejected(self):
+        url = reverse('admin-bulk-promote-students')
+        response = self.client.post(url, {'from_grade': '6', 'to_grade': 6}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'from_grade': 'six', 'to_grade': 7}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('school-statistics'))
+        self.assertEqual(response.data['students_per_grade'], [
+            {'grade': 6, 'count': 3},
+            {'grade': 7, 'count': 2},
+        ])
+
+    def test_superuser_views_match_source_tables(self):
+        self.client.force_authenticate(user=self.superuser)
+
+        response = self.client.get(reverse('superuser-school-statistics', kwargs={'pk': self.school.id}))
+        self.assertEqual(response.data['admin_count'], 1)
+        self.assertEqual(response.data['teacher_count'], 3)
+        self.assertEqual(response.data['student_count'], 5)
+        self.assertEqual(response.data['parent_count'], 1)
+
+        response = self.client.get(reverse('superuser-dashboard'))
+        self.assertEqual(response.data, {
+            'school_count': School.objects.count(),
+            'users_count': User.objects.count(),
+            'teachers_count': Teacher.objects.count(),
+            'students_count': Student.objects.count(),
+        })
+
+
+class MarkClassAttendanceQueryCountTest(APITestCase):
+    """Roll-call for a full class is a single upsert"""
+    CLASS_SIZE = 45
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-005"
+        )
+        cls.teacher_user = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            role=Role.TEACHER,
+            school=cls.school
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        cls.teacher = Teacher.objects.create(
+            name="Class Teacher",
+            email="teacher@example.com",
+            class_assigned="7A",
+            school=cls.school
+        )
+        cls.students = Student.objects.bulk_create([
+            Student(name=f"Student {i}", grade=7, class_assigned="7A", school=cls.school)
+            for i in range(cls.CLASS_SIZE)
+        ])
+        cls.other_class = Student.objects.bulk_create([
+            Student(name=f"Other {i}", grade=8, class_assigned="8B", school=cls.school)
+            for i in range(5)
+        ])
+
+    def test_teacher_roll_call_query_count(self):
+        self.client.force_authenticate(user=self.teacher_user)
+        url = reverse('attendance-mark-class-attendance')
+        payload = {
+            'date': '2024-03-01',
+            'attendance': [
+                {'student_id': str(student.id), 'status': 'present'}
+                for student in self.students
+            ] + [{'student_id': str(self.other_class[0].id), 'status': 'present'}]
+        }
+
+        # Teacher, students, one INSERT ... ON CONFLICT, re-read of the stored rows
+        with self.assertNumQueries(4):
+            response = self.client.post(url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['attendance']), self.CLASS_SIZE)
+        self.assertEqual(response.data['skipped'], [str(self.other_class[0].id)])
+
+        # Re-submitting updates the existing rows instead of duplicating them
+        payload['attendance'][0]['status'] = 'late'
+        with self.assertNumQueries(4):
+            response = self.client.post(url, payload, format='json')
+        self.assertEqual(Attendance.objects.filter(date='2024-03-01').count(), self.CLASS_SIZE)
+        self.assertEqual(Attendance.objects.get(student=self.students[0], date='2024-03-01').status, 'late')
+
+    def test_invalid_status_rejects_batch(self):
+        self.client.force_authenticate(user=self.teacher_user)
+        response = self.client.post(reverse('attendance-mark-class-attendance'), {
+            'attendance': [{'student_id': str(self.students[0].id), 'status': 'asleep'}]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_admin_marks_several_classes(self):
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.post(reverse('attendance-mark-class-attendance'), {
+            'date': '2024-03-01',
+            'classes': [
+                {
+                    'class_name': '7A',
+                    'attendance': [{'student_id': str(s.id), 'status': 'present'} for s in self.students]
+                },
+                {
+                    'class_name': '8B',
+                    'attendance': [{'student_id': str(s.id), 'status': 'absent'} for s in self.other_class]
+                },
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Attendance.objects.filter(status='present').count(), self.CLASS_SIZE)
+        self.assertEqual(Attendance.objects.filter(status='absent').count(), 5)
+        self.assertTrue(all(record['recorded_by'] is None for record in response.data['attendance']))
+
+
+class ChatHistoryKeysetPaginationTest(APITestCase):
+    """Chat history is served in fixed-size pages walked with cursors"""
+    MESSAGE_COUNT = 120
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-006"
+        )
+        cls.teacher_user = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            role=Role.TEACHER,
+            school=cls.school
+        )
+        cls.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='parent123',
+            role=Role.PARENT,
+            school=cls.school
+        )
+        # Rows created in one bulk_create can share a created_at, paging
+        # relies on the id tie-breaker
+        Message.objects.bulk_create([
+            Message(
+                sender=cls.teacher_user if i % 2 else cls.parent_user,
+                receiver=cls.parent_user if i % 2 else cls.teacher_user,
+                content=f"Message {i}",
+                school=cls.school
+            )
+            for i in range(cls.MESSAGE_COUNT)
+        ])
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.teacher_user)
+        self.url = reverse('chat-history', kwargs={'user_id': self.parent_user.id})
+
+    def test_walks_history_backwards_without_gaps(self):
+        seen = []
+        params = {'page_size': 50}
+        while True:
+            # Other user plus one page of messages
+            with self.assertNumQueries(2):
+                response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 50)
+            seen = [message['id'] for message in response.data['results']] + seen
+            if not response.data['has_more']:
+                break
+            params['before'] = response.data['previous_cursor']
+
+        self.assertEqual(len(seen), self.MESSAGE_COUNT)
+        self.assertEqual(len(set(seen)), self.MESSAGE_COUNT)
+
+    def test_after_cursor_returns_newer_messages(self):
+        response = self.client.get(self.url, {'page_size': 10})
+        latest = response.data['next_cursor']
+        self.assertTrue(response.data['has_more'])
+
+        new_message = Message.objects.create(
+            sender=self.parent_user,
+            receiver=self.teacher_user,
+            content="Newest",
+            school=self.school
+        )
+        response = self.client.get(self.url, {'after': latest})
+        self.assertEqual([message['id'] for message in response.data['results']], [str(new_message.id)])
+        self.assertFalse(response.data['has_more'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'before': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class WebSocketReconnectStormTest(TransactionTestCase):
+    """
+    Reconnecting clients are authenticated from the token and the user cache.
+    database_sync_to_async drops connections left outside autocommit, so the
+    consumers run outside a test transaction.
+    """
+    USER_COUNT = 20
+    RECONNECTS = 10
+
+    def setUp(self):
+        self.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-007"
+        )
+        self.users = User.objects.bulk_create([
+            User(
+                email=f"parent{i}@example.com",
+                role=Role.PARENT,
+                school=self.school,
+                password=make_password(None)
+            )
+            for i in range(self.USER_COUNT)
+        ])
+        self.tokens = [str(AccessToken.for_user(user)) for user in self.users]
+        user_cache.clear()
+        self.application = WebSocketJWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    async def _connect(self, token):
+        communicator = WebsocketCommunicator(self.application, f"/ws/chat/{uuid.uuid4()}/?token={token}")
+        connected, _ = await communicator.connect()
+        await communicator.disconnect()
+        return connected
+
+    async def _storm(self):
+        results = []
+        for _ in range(self.RECONNECTS):
+            for token in self.tokens:
+                results.append(await self._connect(token))
+        return results
+
+    def test_reconnect_storm_hits_database_once_per_user(self):
+        started = time.perf_counter()
+        # Only the first handshake of each user loads it from the database
+        with self.assertNumQueries(self.USER_COUNT):
+            results = async_to_sync(self._storm)()
+        elapsed = time.perf_counter() - started
+
+        self.assertTrue(all(results))
+        handshakes = self.USER_COUNT * self.RECONNECTS
+        logger.debug(f"WebSocket reconnect storm ({handshakes} handshakes): {elapsed:.2f}s")
+
+    def test_invalid_or_missing_token_is_rejected(self):
+        async def attempts():
+            return [await self._connect('not-a-token'), await self._connect('')]
+
+        with self.assertNumQueries(0):
+            self.assertEqual(async_to_sync(attempts)(), [False, False])
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    CHAT_BUFFER_MAX_MESSAGES=50,
+    CHAT_BUFFER_MAX_DELAY_MS=60000
+)
+class ChatConsumerThroughputTest(TransactionTestCase):
+    """Chat messages are delivered immediately and persisted in batches"""
+    MESSAGE_COUNT = 500
+
+    def setUp(self):
+        self.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-008"
+        )
+        self.teacher_user = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            role=Role.TEACHER,
+            school=self.school
+        )
+        self.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='parent123',
+            role=Role.PARENT,
+            school=self.school
+        )
+        user_cache.clear()
+        self.application = WebSocketJWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    async def _chat(self, token):
+        communicator = WebsocketCommunicator(
+            self.application,
+            f"/ws/chat/{self.parent_user.id}/?token={token}"
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        for i in range(self.MESSAGE_COUNT):
+            await communicator.send_json_to({
+                'message': f"Message {i}",
+                'receiver_id': str(self.parent_user.id)
+            })
+        # The disconnect is queued behind every message and flushes the buffer
+        await communicator.disconnect()
+
+    def test_messages_per_second(self):
+        token = str(AccessToken.for_user(self.teacher_user))
+        started = time.perf_counter()
+        batches = self.MESSAGE_COUNT // 50
+        # User lookup, one receiver verdict, then per batch of 50 one transaction
+        # (BEGIN, INSERT, unread counter UPDATE, COMMIT) and the counter read of
+        # the push after it; the first batch also creates the counter row in a
+        # savepoint
+        with self.assertNumQueries(2 + batches * 5 + 3):
+            async_to_sync(self._chat)(token)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(message_buffer), 0)
+        messages = Message.objects.filter(sender=self.teacher_user, receiver=self.parent_user)
+        self.assertEqual(messages.count(), self.MESSAGE_COUNT)
+        self.assertEqual(messages.filter(school=self.school).count(), self.MESSAGE_COUNT)
+        self.assertEqual(
+            UnreadCounter.objects.get(user=self.parent_user, counterpart=self.teacher_user).count,
+            self.MESSAGE_COUNT
+        )
+        logger.debug(f"Chat consumer: {self.MESSAGE_COUNT / elapsed:.0f} messages/sec per worker")
+
+
+class RosterImportBenchmarkTest(APITestCase):
+    """A 10,000 row roster imports in bulk with a per-row error report"""
+    ROW_COUNT = 10000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-010"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        cls.existing_parent = User.objects.create_user(
+            email='existing.parent@example.com',
+            password='parent123',
+            role=Role.PARENT,
+            school=cls.school
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+    def _roster(self):
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(['Student Name', 'Grade', 'Class Assigned', 'Parent Email', 'Parent Name'])
+        for i in range(self.ROW_COUNT):
+            # Two children per family, the first family is already registered
+            family = i // 2
+            email = 'existing.parent@example.com' if family == 0 else f"family{family}@example.com"
+            sheet.append([f"Student {i}", (i % 8) + 1, f"{(i % 8) + 1}A", email, f"Family {family}"])
+        # Rejected rows: missing name, bad grade, bad email
+        sheet.append(['', 3, '3A', 'family1@example.com', 'Family 1'])
+        sheet.append(['Bad Grade', 'three', '3A', 'family1@example.com', 'Family 1'])
+        sheet.append(['Bad Email', 3, '3A', 'not-an-email', 'Nobody'])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        return SimpleUploadedFile('roster.xlsx', buffer.getvalue())
+
+    def test_import_ten_thousand_rows(self):
+        roster = self._roster()
+        started = time.perf_counter()
+        response = self.client.post(reverse('student-import-roster'), {'file': roster}, format='multipart')
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_rows'], self.ROW_COUNT + 3)
+        self.assertEqual(response.data['students_created'], self.ROW_COUNT)
+        self.assertEqual(response.data['parents_created'], self.ROW_COUNT // 2 - 1)
+        self.assertEqual(
+            [error['row'] for error in response.data['errors']],
+            [self.ROW_COUNT + 2, self.ROW_COUNT + 3, self.ROW_COUNT + 4]
+        )
+
+        self.assertEqual(Student.objects.filter(school=self.school).count(), self.ROW_COUNT)
+        self.assertEqual(Student.objects.filter(parent=self.existing_parent).count(), 2)
+        self.assertEqual(Parent.objects.filter(school=self.school).count(), self.ROW_COUNT // 2 - 1)
+        self.assertLess(elapsed, 60)
+        logger.debug(f"Roster import ({self.ROW_COUNT} rows): {elapsed:.2f}s")
+
+
+class ExamResultExportBenchmarkTest(APITestCase):
+    """Exam result exports stream rows instead of serializing a list"""
+    RESULT_COUNT = 3000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-011"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        students = Student.objects.bulk_create([
+            Student(name="Seven A", grade=7, class_assigned="7A", school=cls.school),
+            Student(name="Seven B", grade=7, class_assigned="7B", school=cls.school),
+        ])
+        ExamResult.objects.bulk_create([
+            ExamResult(
+                student=students[i % 2],
+                exam_name=f"Exam {i}",
+                subject="Mathematics",
+                marks=50 + (i % 50),
+                grade='B',
+                term="Term 1",
+                year=2024,
+                school=cls.school
+            )
+            for i in range(cls.RESULT_COUNT)
+        ])
+
+    def test_csv_export_streams_all_rows(self):
+        self.client.force_authenticate(user=self.admin_user)
+        started = time.perf_counter()
+        response = self.client.get(reverse('exam-results'), {'format': 'csv', 'year': 2024})
+        content = b''.join(response.streaming_content).decode()
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][:3], ['id', 'student', 'student_name'])
+        self.assertEqual(len(rows), self.RESULT_COUNT + 1)
+        logger.debug(f"Exam result CSV export ({self.RESULT_COUNT} rows): {elapsed:.2f}s")
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class ExamAnalyticsTest(APITestCase):
+    """Term analytics come from one query and are served from cache afterwards"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-012"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        cls.class_a, cls.class_b = Student.objects.bulk_create([
+            Student(name="Seven A", grade=7, class_assigned="7A", school=cls.school),
+            Student(name="Seven B", grade=7, class_assigned="7B", school=cls.school),
+        ])
+        marks = [
+            (cls.class_a, 'Mathematics', 40), (cls.class_a, 'Mathematics', 60), (cls.class_a, 'Mathematics', 80),
+            (cls.class_a, 'English', 90),
+            (cls.class_b, 'Mathematics', 50), (cls.class_b, 'Mathematics', 70),
+        ]
+        ExamResult.objects.bulk_create([
+            ExamResult(
+                student=student, exam_name="End term", subject=subject, marks=value,
+                grade='B', term="Term 1", year=2024, school=cls.school
+            )
+            for student, subject, value in marks
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.admin_user)
+        self.url = reverse('exam-analytics')
+
+    def test_statistics_per_class_and_subject(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'year': 2024, 'term': 'Term 1'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['result_count'], 6)
+        class_a = next(c for c in response.data['classes'] if c['class_name'] == '7A')
+        maths = next(s for s in class_a['subjects'] if s['subject'] == 'Mathematics')
+        self.assertEqual(maths['count'], 3)
+        self.assertEqual(maths['mean'], 60.0)
+        self.assertEqual(maths['median'], 60.0)
+        self.assertEqual(maths['std'], 16.33)
+        self.assertEqual(maths['percentiles']['p25'], 50.0)
+        self.assertEqual(sum(maths['histogram']['counts']), 3)
+        self.assertEqual(class_a['overall']['count'], 4)
+
+        school_maths = next(s for s in response.data['subjects'] if s['subject'] == 'Mathematics')
+        self.assertEqual(school_maths['count'], 5)
+        self.assertEqual(school_maths['mean'], 60.0)
+
+        # Served from cache on the next request
+        with self.assertNumQueries(0):
+            self.client.get(self.url, {'year': 2024, 'term': 'Term 1'})
+
+    def test_changing_a_result_invalidates_the_slice(self):
+        self.client.get(self.url, {'year': 2024, 'term': 'Term 1'})
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ExamResult.objects.create(
+                student=self.class_b, exam_name="Resit", subject='Mathematics', marks=90,
+                grade='A', term="Term 1", year=2024, school=self.school
+            )
+            ExamResult.objects.create(
+                student=self.class_b, exam_name="Resit", subject='English', marks=70,
+                grade='B', term="Term 1", year=2024, school=self.school
+            )
+            # Until the commit the cached analytics stay in place
+            self.assertTrue(cache.get(analytics_cache_key(self.school.id, 2024, 'Term 1')))
+        # One delete for both results, alongside the ranking refresh
+        self.assertEqual(len(callbacks), 2)
+
+        response = self.client.get(self.url, {'year': 2024, 'term': 'Term 1'})
+        self.assertEqual(response.data['result_count'], 8)
+
+    def test_per_process_cache_is_not_used(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.client.get(self.url, {'year': 2024, 'term': 'Term 1'})
+            with self.assertNumQueries(1):
+                response = self.client.get(self.url, {'year': 2024, 'term': 'Term 1'})
+        self.assertEqual(response.data['result_count'], 6)
+
+
+class StudentRankingTest(APITestCase):
+    """Positions are computed by window functions and kept up to date on result changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-013"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        cls.students = Student.objects.bulk_create([
+            Student(name=f"Student {i}", grade=7, class_assigned="7A" if i < 3 else "7B", school=cls.school)
+            for i in range(5)
+        ])
+        # 7A: 80, 80 (tie), 60   7B: 90, 50
+        averages = [80, 80, 60, 90, 50]
+        ExamResult.objects.bulk_create([
+            ExamResult(
+                student=student, exam_name="End term", subject=subject, marks=average,
+                grade='B', term="Term 1", year=2024, school=cls.school
+            )
+            for student, average in zip(cls.students, averages)
+            for subject in ('Mathematics', 'English')
+        ])
+        refresh_rankings(cls.school.id, 2024, "Term 1")
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin_user)
+        self.url = reverse('ranking-list')
+
+    def positions(self, **params):
+        response = self.client.get(self.url, {'year': 2024, 'term': 'Term 1', **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_rank_and_dense_rank_with_ties(self):
+        rankings = {
+            ranking.student_id: ranking
+            for ranking in StudentRanking.objects.filter(school=self.school)
+        }
+        self.assertEqual(len(rankings), 5)
+        third = rankings[self.students[2].id]
+        self.assertEqual(third.subjects_count, 2)
+        self.assertEqual(third.class_position, 3)
+        self.assertEqual(third.class_dense_position, 2)
+        self.assertEqual(rankings[self.students[0].id].class_position, 1)
+        self.assertEqual(rankings[self.students[1].id].class_position, 1)
+        self.assertEqual(rankings[self.students[3].id].class_position, 1)
+        self.assertEqual(rankings[self.students[3].id].grade_position, 1)
+        self.assertEqual(rankings[self.students[0].id].grade_position, 2)
+        self.assertEqual(rankings[self.students[4].id].grade_position, 5)
+        self.assertEqual(rankings[self.students[4].id].grade_dense_position, 4)
+
+    def test_paginated_listing_in_one_query_per_page(self):
+        with self.assertNumQueries(2):
+            data = self.positions(class_name='7A', page_size=2)
+        self.assertEqual(data['count'], 3)
+        self.assertEqual([row['class_position'] for row in data['results']], [1, 1])
+
+        data = self.positions(order='grade')
+        self.assertEqual([row['grade_position'] for row in data['results']], [1, 2, 2, 4, 5])
+
+    def test_result_changes_refresh_the_term(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ExamResult.objects.create(
+                student=self.students[2], exam_name="Resit", subject='Science', marks=100,
+                grade='A', term="Term 1", year=2024, school=self.school
+            )
+            ExamResult.objects.create(
+                student=self.students[2], exam_name="Resit", subject='History', marks=100,
+                grade='A', term="Term 1", year=2024, school=self.school
+            )
+        # Both saves share one refresh (and one analytics cache delete)
+        self.assertEqual(len(callbacks), 2)
+
+        ranking = StudentRanking.objects.get(student=self.students[2], year=2024, term="Term 1")
+        self.assertEqual(ranking.subjects_count, 4)
+        # Average rises from 60 to 80, level with the top of 7A
+        self.assertEqual(ranking.class_position, 1)
+        self.assertEqual(ranking.grade_position, 2)
+
+    def test_student_moving_class_refreshes_the_term(self):
+        student = Student.objects.get(pk=self.students[3].pk)
+        student.class_assigned = "7A"
+        with self.captureOnCommitCallbacks(execute=True):
+            student.save()
+
+        ranking = StudentRanking.objects.get(student=student, year=2024, term="Term 1")
+        self.assertEqual(ranking.class_assigned, "7A")
+        self.assertEqual(ranking.class_position, 1)
+        self.assertEqual(
+            StudentRanking.objects.get(student=self.students[0], year=2024, term="Term 1").class_position, 2
+        )
+
+    def test_promotion_refreshes_rankings(self):
+        self.client.force_authenticate(user=self.admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('admin-bulk-promote-students'), {'from_grade': 7, 'to_grade': 8}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['grade'] for row in self.positions(grade=8)['results']], [8] * 5)
+        self.assertEqual(self.positions(grade=7)['count'], 0)
+
+    def test_non_numeric_filters_are_rejected(self):
+        for params in ({'year': 'abc'}, {'grade': 'seven'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), response.data)
+
+    def test_rolled_back_refresh_does_not_hold_back_the_next(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                schedule_ranking_refresh(self.school.id, 2024, "Term 1")
+                transaction.set_rollback(True)
+            schedule_ranking_refresh(self.school.id, 2024, "Term 1")
+            schedule_ranking_refresh(self.school.id, 2024, "Term 1")
+        self.assertEqual(len(callbacks), 1)
+
+
+class RequestMetricsTest(APITestCase):
+    """Requests report their query count and timings and feed the per-route histograms"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-014"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        cls.superuser = User.objects.create_user(
+            email='root@example.com',
+            password='root123',
+            role=Role.SUPERUSER
+        )
+
+    def setUp(self):
+        reset_metrics()
+
+    def test_server_timing_header(self):
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(reverse('school-statistics'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('dup;desc="0 repeated queries"', timing)
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+
+    def test_repeated_statements_are_counted(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for student_id in (uuid.uuid4(), uuid.uuid4(), uuid.uuid4()):
+                Student.objects.filter(id=student_id).exists()
+            School.objects.count()
+
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(recorder.duplicates, 2)
+
+    def test_metrics_endpoint(self):
+        self.client.force_authenticate(user=self.admin_user)
+        self.client.get(reverse('school-statistics'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.superuser)
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        labels = 'method="GET",route="api/school/statistics/",status="200"'
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1', body)
+        self.assertIn(f'http_request_db_queries_count{{{labels}}} 1', body)
+        self.assertIn('# TYPE http_request_db_duplicate_queries histogram', body)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class SyntheticDatasetBenchmarkTest(TestCase):
+    """populate_db builds a consistent dataset in bulk and benchmark_endpoints reports on it"""
+
+    def test_populate_and_benchmark(self):
+        call_command(
+            'populate_db', '--schools=2', '--students-per-school=30', '--years=2',
+            '--attendance-days=3', '--batch-size=25', '--seed=1', stdout=io.StringIO()
+        )
+
+        self.assertEqual(School.objects.count(), 2)
+        self.assertEqual(Student.objects.count(), 60)
+        self.assertFalse(Student.objects.filter(parent__isnull=True).exists())
+        self.assertFalse(Student.objects.exclude(school=F('parent__school')).exists())
+        # 2 years x 3 terms x 5 subjects, and 3 registers per term
+        self.assertEqual(ExamResult.objects.count(), 60 * 2 * 3 * 5)
+        self.assertEqual(Attendance.objects.count(), 60 * 2 * 3 * 3)
+        # One password hash shared by every generated account
+        self.assertEqual(User.objects.values('password').distinct().count(), 1)
+        self.assertEqual(Parent.objects.count(), User.objects.filter(role=Role.PARENT).count())
+        self.assertEqual(
+            sum(SchoolStatistics.objects.exclude(school=None).values_list('student_count', flat=True)), 60
+        )
+        self.assertEqual(StudentRanking.objects.count(), 60 * 2 * 3)
+
+        school = School.objects.first()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.json')
+            call_command(
+                'benchmark_endpoints', f'--school={school.id}', '--iterations=2', '--warmup=0',
+                f'--output={path}', stdout=io.StringIO()
+            )
+            with open(path) as report_file:
+                report = json.load(report_file)
+
+        self.assertEqual(report['school']['students'], 30)
+        results = {result['name']: result for result in report['results']}
+        self.assertEqual(results['school-statistics']['status'], 200)
+        self.assertEqual(results['exam-analytics']['status'], 200)
+        self.assertEqual(results['parent-children']['status'], 200)
+        for result in results.values():
+            self.assertNotIn('skipped', result)
+            self.assertGreater(result['queries'], 0)
+            self.assertLessEqual(result['p50_ms'], result['max_ms'])
+        # Revalidating only authenticates the token's user
+        not_modified = results['notification-list']['not_modified']
+        self.assertEqual(not_modified['status'], 304)
+        self.assertEqual(not_modified['queries'], 1)
+
+
+class TeacherProfileResolutionTest(APITestCase):
+    """The requesting teacher's profile is found through the User link, once per request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-016"
+        )
+        cls.teacher_user = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            role=Role.TEACHER,
+            school=cls.school
+        )
+        cls.teacher = Teacher.objects.create(
+            name="Class Teacher",
+            email="teacher@example.com",
+            class_assigned="7A",
+            school=cls.school
+        )
+        cls.student = Student.objects.create(name="Student", grade=7, class_assigned="7A", school=cls.school)
+        ExamResult.objects.create(
+            student=cls.student, exam_name="End term", subject="Mathematics", marks=70,
+            grade='B', term="Term 1", year=2024, school=cls.school
+        )
+
+    def teacher_queries(self, queries):
+        return [query for query in queries.captured_queries if 'FROM "admin_interface_teacher"' in query['sql']]
+
+    def test_profile_is_linked_whichever_is_created_first(self):
+        self.teacher.refresh_from_db()
+        self.assertEqual(self.teacher.user_id, self.teacher_user.id)
+
+        profile = Teacher.objects.create(name="New Teacher", email="new@example.com", school=self.school)
+        account = User.objects.create_user(
+            email='new@example.com', password='new123', role=Role.TEACHER, school=self.school
+        )
+        profile.refresh_from_db()
+        self.assertEqual(profile.user_id, account.id)
+
+    def test_exam_results_for_a_student_resolve_the_teacher_once(self):
+        self.client.force_authenticate(user=self.teacher_user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('exam-results'), {'student_id': str(self.student.id)})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        teacher_queries = self.teacher_queries(queries)
+        self.assertEqual(len(teacher_queries), 1)
+        self.assertIn('"admin_interface_teacher"."user_id"', teacher_queries[0]['sql'])
+        self.assertNotIn('"admin_interface_teacher"."email" =', teacher_queries[0]['sql'])
+
+    def test_user_without_profile_gets_not_found(self):
+        other = User.objects.create_user(
+            email='other@example.com', password='other123', role=Role.TEACHER, school=self.school
+        )
+        self.client.force_authenticate(user=other)
+        response = self.client.get(reverse('teacher-my-profile'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(reverse('attendance-mark-class-attendance'), {
+            'attendance': [{'student_id': str(self.student.id), 'status': 'present'}]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_profile_is_not_linked_to_other_roles(self):
+        parent = User.objects.create_user(
+            email='shared@example.com', password='shared123', role=Role.PARENT, school=self.school
+        )
+        profile = Teacher.objects.create(name="Shared Email", email="shared@example.com", school=self.school)
+        call_command('link_teacher_users', stdout=io.StringIO())
+
+        profile.refresh_from_db()
+        self.assertIsNone(profile.user_id)
+        self.client.force_authenticate(user=parent)
+        response = self.client.get(reverse('teacher-my-profile'))
+        self.assertNotEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_unlinked_profile_is_found_by_email_and_linked(self):
+        Teacher.objects.filter(pk=self.teacher.pk).update(user=None)
+        self.client.force_authenticate(user=self.teacher_user)
+        response = self.client.get(reverse('teacher-my-profile'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.teacher.refresh_from_db()
+        self.assertEqual(self.teacher.user_id, self.teacher_user.id)
+
+    def test_backfill_links_existing_profiles(self):
+        Teacher.objects.filter(pk=self.teacher.pk).update(user=None)
+        call_command('link_teacher_users', stdout=io.StringIO())
+
+        self.teacher.refresh_from_db()
+        self.assertEqual(self.teacher.user_id, self.teacher_user.id)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class UnreadCounterQueryCountTest(APITestCase):
+    """Unread counts are kept per conversation and a conversation is read in one UPDATE"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-018"
+        )
+        cls.teacher_user = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            role=Role.TEACHER,
+            school=cls.school
+        )
+        cls.other_teacher = User.objects.create_user(
+            email='other@example.com',
+            password='other123',
+            role=Role.TEACHER,
+            school=cls.school
+        )
+        cls.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='parent123',
+            role=Role.PARENT,
+            school=cls.school
+        )
+
+    def send(self, sender, count):
+        for i in range(count):
+            Message.objects.create(
+                sender=sender, receiver=self.parent_user, content=f"Message {i}", school=self.school
+            )
+
+    def test_counts_per_conversation(self):
+        self.send(self.teacher_user, 3)
+        self.send(self.other_teacher, 2)
+        self.client.force_authenticate(user=self.parent_user)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('message-unread'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 5)
+        unread = {row['counterpart_id']: row['unread'] for row in response.data['conversations']}
+        self.assertEqual(unread, {str(self.teacher_user.id): 3, str(self.other_teacher.id): 2})
+
+    def test_mark_conversation_read(self):
+        self.send(self.teacher_user, 30)
+        self.send(self.other_teacher, 2)
+        self.client.force_authenticate(user=self.parent_user)
+
+        # One UPDATE of the messages and one of the counter, in a savepoint
+        with self.assertNumQueries(4):
+            response = self.client.post(
+                reverse('message-mark-read'), {'user_id': str(self.teacher_user.id)}, format='json'
+            )
+
+        self.assertEqual(response.data['marked_read'], 30)
+        self.assertFalse(Message.objects.filter(sender=self.teacher_user, is_read=False).exists())
+        counters = dict(UnreadCounter.objects.values_list('counterpart_id', 'count'))
+        self.assertEqual(counters, {self.teacher_user.id: 0, self.other_teacher.id: 2})
+
+        # Reading a single message through the API also counts down
+        message = Message.objects.filter(sender=self.other_teacher).first()
+        message.is_read = True
+        message.save()
+        self.assertEqual(UnreadCounter.objects.get(counterpart=self.other_teacher).count, 1)
+
+
+class InboxQueryCountTest(APITestCase):
+    """The inbox lists one row per conversation, newest first, in a single query"""
+    THREAD_COUNT = 300
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-019"
+        )
+        cls.teacher_user = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            role=Role.TEACHER,
+            school=cls.school
+        )
+        cls.parents = User.objects.bulk_create([
+            User(
+                email=f"parent{i}@example.com",
+                first_name=f"Parent {i}",
+                role=Role.PARENT,
+                school=cls.school,
+                password=make_password(None)
+            )
+            for i in range(cls.THREAD_COUNT)
+        ])
+
+        # Three messages per thread, the last one from the parent; thread i
+        # was last active i minutes after the start
+        start = timezone.now() - timedelta(days=1)
+        messages = []
+        for i, parent in enumerate(cls.parents):
+            for j, (sender, receiver) in enumerate([
+                (parent, cls.teacher_user), (cls.teacher_user, parent), (parent, cls.teacher_user)
+            ]):
+                messages.append(Message(
+                    sender=sender, receiver=receiver, content=f"Thread {i} message {j}", school=cls.school
+                ))
+        Message.objects.bulk_create(messages)
+        for index, message in enumerate(messages):
+            thread, position = divmod(index, 3)
+            message.created_at = start + timedelta(minutes=thread, seconds=position)
+        Message.objects.bulk_update(messages, ['created_at'])
+
+        UnreadCounter.objects.bulk_create([
+            UnreadCounter(user=cls.teacher_user, counterpart=parent, count=i % 3)
+            for i, parent in enumerate(cls.parents)
+        ])
+        cls.url = reverse('message-inbox')
+
+    def test_three_hundred_threads_in_one_query(self):
+        self.client.force_authenticate(user=self.teacher_user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'page_size': self.THREAD_COUNT})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(len(results), self.THREAD_COUNT)
+        self.assertFalse(response.data['has_more'])
+        self.assertEqual(
+            [row['counterpart_id'] for row in results],
+            [str(parent.id) for parent in reversed(self.parents)]
+        )
+        latest = results[0]
+        self.assertEqual(latest['counterpart_name'], f"Parent {self.THREAD_COUNT - 1}")
+        self.assertEqual(latest['counterpart_role'], Role.PARENT)
+        self.assertEqual(latest['last_message'], f"Thread {self.THREAD_COUNT - 1} message 2")
+        self.assertEqual(latest['unread'], (self.THREAD_COUNT - 1) % 3)
+
+    def test_parent_sees_their_thread(self):
+        parent = self.parents[5]
+        self.client.force_authenticate(user=parent)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(len(response.data['results']), 1)
+        row = response.data['results'][0]
+        self.assertEqual(row['counterpart_id'], str(self.teacher_user.id))
+        self.assertEqual(row['last_message'], "Thread 5 message 2")
+        self.assertEqual(row['unread'], 0)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationFanOutTest(TransactionTestCase):
+    """New notifications are pushed to their audience and missed ones replayed on connect"""
+
+    def setUp(self):
+        self.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-020"
+        )
+        self.other_school = School.objects.create(
+            name="Other School",
+            email="other@example.com",
+            registration_number="REG-BENCH-021"
+        )
+        self.users = {
+            name: User.objects.create_user(
+                email=f"{name}@example.com", password='password123', role=role, school=school
+            )
+            for name, role, school in [
+                ('admin', Role.ADMIN, self.school),
+                ('teacher', Role.TEACHER, self.school),
+                ('parent', Role.PARENT, self.school),
+                ('other_parent', Role.PARENT, self.other_school),
+            ]
+        }
+        self.superuser = User.objects.create_user(
+            email='superuser@example.com', password='password123', role=Role.SUPERUSER
+        )
+        self.tokens = {name: str(AccessToken.for_user(user)) for name, user in self.users.items()}
+        user_cache.clear()
+        self.application = WebSocketJWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    async def _connect(self, name, **params):
+        query = urlencode({'token': self.tokens[name], **params})
+        communicator = WebsocketCommunicator(self.application, f"/ws/notifications/?{query}")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def _drain(self, communicator):
+        frames = []
+        while not await communicator.receive_nothing(timeout=0.1):
+            frames.append(await communicator.receive_json_from())
+        await communicator.disconnect()
+        return frames
+
+    async def _deliveries(self, action):
+        """Frames each connected user receives while `action` runs"""
+        clients = {name: await self._connect(name) for name in self.users}
+        await database_sync_to_async(action)()
+        return {name: await self._drain(client) for name, client in clients.items()}
+
+    def _post_notification(self, target_group):
+        client = APIClient()
+        client.force_authenticate(user=self.users['admin'])
+        response = client.post(
+            reverse('notification-list'), {'message': 'Sports day', 'target_group': target_group}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_new_notification_reaches_its_audience_once(self):
+        received = async_to_sync(self._deliveries)(lambda: self._post_notification('teachers'))
+
+        for name in ('admin', 'teacher'):
+            self.assertEqual(len(received[name]), 1)
+            self.assertEqual(received[name][0]['type'], 'notification')
+            self.assertEqual(received[name][0]['notification']['message'], 'Sports day')
+            self.assertEqual(received[name][0]['notification']['target_group'], 'teachers')
+        self.assertEqual(received['parent'], [])
+        self.assertEqual(received['other_parent'], [])
+
+    def test_school_status_change_notifies_the_whole_school(self):
+        def toggle():
+            client = APIClient()
+            client.force_authenticate(user=self.superuser)
+            response = client.post(reverse('school-toggle-status', kwargs={'pk': self.school.id}))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        received = async_to_sync(self._deliveries)(toggle)
+
+        for name in ('admin', 'teacher', 'parent'):
+            self.assertEqual(len(received[name]), 1)
+            self.assertEqual(received[name][0]['notification']['target_group'], 'all')
+        self.assertEqual(received['other_parent'], [])
+
+    def test_catch_up_sends_everything_since_last_seen(self):
+        start = timezone.now() - timedelta(hours=1)
+        notifications = Notification.objects.bulk_create([
+            Notification(message=f"Notice {i}", target_group=target, school=self.school)
+            for i, target in enumerate(['parents', 'all', 'teachers', 'parents', 'all'])
+        ])
+        for i, notification in enumerate(notifications):
+            notification.created_at = start + timedelta(minutes=i)
+        Notification.objects.bulk_update(notifications, ['created_at'])
+
+        async def reconnect(**params):
+            return await self._drain(await self._connect('parent', **params))
+
+        frames = async_to_sync(reconnect)(since=(start + timedelta(seconds=30)).isoformat())
+        self.assertEqual(
+            [frame['notification']['message'] for frame in frames[:-1]],
+            ['Notice 1', 'Notice 3', 'Notice 4']
+        )
+        self.assertEqual(frames[-1], {'type': 'catch_up', 'count': 3, 'has_more': False})
+
+        with self.settings(NOTIFICATION_CATCH_UP_LIMIT=2):
+            frames = async_to_sync(reconnect)(since=start.isoformat())
+        self.assertEqual(
+            [frame['notification']['message'] for frame in frames[:-1]],
+            ['Notice 3', 'Notice 4']
+        )
+        self.assertEqual(frames[-1], {'type': 'catch_up', 'count': 2, 'has_more': True})
+
+        frames = async_to_sync(reconnect)(since='yesterday')
+        self.assertIn('error', frames[0])
+
+    def test_users_without_a_school_are_rejected(self):
+        async def connect():
+            token = str(AccessToken.for_user(self.superuser))
+            communicator = WebsocketCommunicator(self.application, f"/ws/notifications/?token={token}")
+            connected, _ = await communicator.connect()
+            return connected
+
+        self.assertFalse(async_to_sync(connect)())
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    CACHES=SHARED_CACHES
+)
+class ConditionalGetTest(APITestCase):
+    """Polled lists answer a matching If-None-Match with 304 without querying"""
+    NOTIFICATION_COUNT = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-022"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        cls.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='parent123',
+            role=Role.PARENT,
+            school=cls.school
+        )
+        Student.objects.create(
+            name="Child", grade=4, class_assigned="4A", contact="0712345678",
+            parent=cls.parent_user, school=cls.school
+        )
+        Notification.objects.bulk_create([
+            Notification(
+                message=f"Notice {i}", target_group='all', created_by=cls.admin_user, school=cls.school
+            )
+            for i in range(cls.NOTIFICATION_COUNT)
+        ])
+        now = timezone.now()
+        SchoolEvent.objects.create(
+            title="Sports day", description="Inter-house games", event_type='activity', participants='all',
+            start_date=now + timedelta(days=1), end_date=now + timedelta(days=2),
+            created_by=cls.admin_user, school=cls.school
+        )
+        Product.objects.create(
+            name="Sweater", description="School sweater", price=1500, stock=10,
+            image='products/sweater.jpg', school=cls.school
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertRevalidates(self, user, url):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        return etag
+
+    def test_polled_endpoints_revalidate(self):
+        self.assertRevalidates(self.admin_user, reverse('notification-list'))
+        self.assertRevalidates(self.admin_user, reverse('school-event-list'))
+        self.assertRevalidates(self.parent_user, reverse('product-list'))
+        self.assertRevalidates(self.parent_user, reverse('parent-me'))
+
+    def test_writes_change_the_tag(self):
+        url = reverse('notification-list')
+        etag = self.assertRevalidates(self.admin_user, url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'message': 'Closing early', 'target_group': 'all'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['count'], self.NOTIFICATION_COUNT + 1)
+
+    def test_each_committed_write_changes_the_tag(self):
+        url = reverse('notification-list')
+        etags = [self.assertRevalidates(self.admin_user, url)]
+        for message in ("Closing early", "Closing at noon"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(url, {'message': message, 'target_group': 'all'}, format='json')
+            etags.append(self.client.get(url, HTTP_IF_NONE_MATCH=etags[-1])['ETag'])
+        self.assertEqual(len(set(etags)), 3)
+
+    def test_children_and_parent_records_change_the_profile_tag(self):
+        # A school of its own, so no bump from setUpTestData is still pending
+        with self.captureOnCommitCallbacks(execute=True):
+            school = School.objects.create(
+                name="Other School", email="other@example.com", registration_number="REG-BENCH-022-B"
+            )
+            parent_user = User.objects.create_user(
+                email='other.parent@example.com', password='parent123', role=Role.PARENT, school=school
+            )
+            parent = Parent.objects.create(
+                name="Other Parent", email='other.parent@example.com', phone_number='0712345670', school=school
+            )
+        url = reverse('parent-me')
+        etag = self.assertRevalidates(parent_user, url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.create(
+                name="Second Child", grade=5, class_assigned="5A", contact="0712345679",
+                parent=parent_user, school=school
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['children_count'], 1)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            parent.name = "Renamed Parent"
+            parent.save()
+        self.assertNotEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag)['ETag'], etag)
+
+    def test_tags_differ_per_user_and_query(self):
+        url = reverse('notification-list')
+        etag = self.assertRevalidates(self.admin_user, url)
+
+        response = self.client.get(url, {'target_group': 'parents'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=self.parent_user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_users_without_a_school_are_served_in_full(self):
+        # They see the rows of every school, which no single version covers
+        admin = User.objects.create_user(email='global@example.com', password='global123', role=Role.ADMIN)
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(reverse('notification-list'), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', response)
+
+    def test_per_process_cache_disables_revalidation(self):
+        self.client.force_authenticate(user=self.admin_user)
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            response = self.client.get(reverse('notification-list'), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', response)
+
+    def test_not_modified_is_faster_than_a_full_render(self):
+        url = reverse('notification-list')
+        self.client.force_authenticate(user=self.admin_user)
+        etag = self.client.get(url)['ETag']
+
+        def timed(**headers):
+            started = time.perf_counter()
+            for _ in range(20):
+                response = self.client.get(url, **headers)
+            return (time.perf_counter() - started) / 20 * 1000, response
+
+        full_ms, response = timed()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        not_modified_ms, response = timed(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.assertLess(not_modified_ms, full_ms)
+        logger.debug(
+            f"Notification list (first page of {self.NOTIFICATION_COUNT}): full render {full_ms:.2f} ms, "
+            f"304 {not_modified_ms:.2f} ms"
+        )
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class ProductCatalogCacheTest(APITestCase):
+    """The serialized catalog is cached per school and only stock is read per request"""
+    PRODUCT_COUNT = 120
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-023"
+        )
+        cls.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='parent123',
+            role=Role.PARENT,
+            school=cls.school
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        Product.objects.bulk_create([
+            Product(
+                name=f"Item {i}", description="School supplies", price=100 + i, stock=50,
+                image=f'products/item{i}.jpg', school=cls.school
+            )
+            for i in range(cls.PRODUCT_COUNT)
+        ])
+        cls.url = reverse('product-list')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.parent_user)
+
+    def first_item(self):
+        return self.client.get(self.url).data['results'][0]
+
+    def test_cached_catalog_reads_only_stock(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], self.PRODUCT_COUNT)
+
+        started = time.perf_counter()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'page': 2})
+        elapsed = (time.perf_counter() - started) * 1000
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], self.PRODUCT_COUNT)
+        self.assertEqual(response.data['results'][0]['name'], "Item 10")
+        self.assertEqual(response.data['results'][0]['price'], 110.0)
+        logger.debug(f"Cached product catalog page ({self.PRODUCT_COUNT} products): {elapsed:.2f} ms")
+
+    def test_purchase_updates_stock_without_rebuilding(self):
+        self.first_item()
+        product = Product.objects.get(name="Item 0")
+        with self.captureOnCommitCallbacks(execute=True):
+            product.stock -= 3
+            product.save()
+
+        with self.assertNumQueries(1):
+            item = self.first_item()
+        self.assertEqual(item['stock'], 47)
+
+    def test_catalog_changes_rebuild_it(self):
+        self.first_item()
+        product = Product.objects.get(name="Item 0")
+        with self.captureOnCommitCallbacks(execute=True):
+            product.price = 95
+            product.save()
+
+        item = self.first_item()
+        self.assertEqual(item['price'], 95.0)
+
+    def test_deleted_products_leave_the_catalog(self):
+        self.first_item()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(name="Item 0").delete()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], self.PRODUCT_COUNT - 1)
+        self.assertEqual(response.data['results'][0]['name'], "Item 1")
+
+    def test_per_process_cache_reads_the_database(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.first_item()
+            Product.objects.filter(name="Item 0").update(price=95)
+            item = self.first_item()
+        self.assertEqual(item['price'], 95.0)
+
+    def test_search_reads_the_database(self):
+        self.first_item()
+        response = self.client.get(self.url, {'search': 'Item 11'})
+        # Item 11 and Item 110 to Item 119
+        self.assertEqual(response.data['count'], 11)
+
+
+class ImageVariantTest(APITestCase):
+    """Uploads are resized into EXIF-free WebP/JPEG variants by the worker"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-024"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        cls.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='parent123',
+            role=Role.PARENT,
+            school=cls.school
+        )
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def camera_photo(self, name='photo.jpg'):
+        """A 3000x2000 JPEG shot in portrait, with the orientation and camera details in EXIF"""
+        image = Image.effect_noise((3000, 2000), 64).convert('RGB')
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        exif[0x010F] = 'Camera Maker'
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=95, exif=exif)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def upload_product(self):
+        return Product.objects.create(
+            name='Uniform', description='School uniform', price=1500, stock=10,
+            image=self.camera_photo(), school=self.school
+        )
+
+    def run_worker(self):
+        started = time.perf_counter()
+        call_command('run_image_variants', stdout=io.StringIO())
+        return (time.perf_counter() - started) * 1000
+
+    def test_upload_is_resized_after_the_request(self):
+        product = self.upload_product()
+        self.assertEqual(product.image_variants, {})
+        self.assertEqual(ImageVariantJob.objects.get(object_id=str(product.pk)).status, 'pending')
+
+        elapsed = self.run_worker()
+        product.refresh_from_db()
+        self.assertEqual(ImageVariantJob.objects.get(object_id=str(product.pk)).status, 'done')
+        self.assertEqual(product.image_variants['source'], product.image.name)
+
+        sizes = {}
+        for size, edge in VARIANT_SIZES.items():
+            for image_format, name in product.image_variants['sizes'][size].items():
+                with product.image.storage.open(name) as variant_file:
+                    variant = Image.open(variant_file)
+                    variant.load()
+                self.assertEqual(variant.format, image_format.upper())
+                # Rotated upright from the EXIF orientation, then shrunk
+                self.assertEqual(variant.size, (round(edge * 2 / 3), edge))
+                self.assertEqual(len(variant.getexif()), 0)
+                sizes[f'{size}.{image_format}'] = product.image.storage.size(name)
+        self.assertLess(sizes['thumb.webp'], 30 * 1024)
+        self.assertLess(sizes['thumb.webp'], product.image.size / 10)
+        logger.debug(f"Image variants for a 3000x2000 upload: {elapsed:.2f} ms, "
+                     f"original {product.image.size // 1024} KB, " +
+                     ", ".join(f"{name} {size / 1024:.1f} KB" for name, size in sizes.items()))
+
+        self.client.force_authenticate(user=self.parent_user)
+        item = self.client.get(reverse('product-list')).data['results'][0]
+        self.assertTrue(item['image_variants']['thumb']['webp'].startswith('http://testserver/'))
+        self.assertTrue(item['image_variants']['thumb']['webp'].endswith('.webp'))
+
+    def test_replaced_image_gets_new_variants(self):
+        product = self.upload_product()
+        self.run_worker()
+        product.refresh_from_db()
+        old_thumb = product.image_variants['sizes']['thumb']['jpeg']
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.put(reverse('product-detail', args=[product.pk]), {
+            'name': 'Uniform', 'description': 'School uniform', 'stock': 10, 'image': self.camera_photo('new.jpg'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The old variants are not served for the new image
+        self.assertEqual(response.data['image_variants'], {})
+
+        self.run_worker()
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants['source'], product.image.name)
+        self.assertFalse(product.image.storage.exists(old_thumb))
+        self.assertTrue(product.image.storage.exists(product.image_variants['sizes']['thumb']['jpeg']))
+
+    def test_variants_are_recorded_without_validating_the_record(self):
+        teacher = Teacher.objects.create(
+            name="Class Teacher", email="teacher@example.com", profile_pic=self.camera_photo(), school=self.school
+        )
+        # A phone number stored before validation was added fails full_clean()
+        Teacher.objects.filter(pk=teacher.pk).update(phone_number='+254700000000')
+
+        self.run_worker()
+        teacher.refresh_from_db()
+        self.assertEqual(ImageVariantJob.objects.get(object_id=str(teacher.pk)).status, 'done')
+        self.assertEqual(teacher.profile_pic_variants['source'], teacher.profile_pic.name)
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_cached_catalog_shows_new_variants(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload_product()
+        self.client.force_authenticate(user=self.parent_user)
+        self.assertEqual(self.client.get(reverse('product-list')).data['results'][0]['image_variants'], {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_worker()
+        item = self.client.get(reverse('product-list')).data['results'][0]
+        self.assertTrue(item['image_variants']['thumb']['webp'].endswith('.webp'))
+
+
+class OrderPlacementTest(APITestCase):
+    """An order is placed with a fixed number of queries whatever its size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-025"
+        )
+        cls.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='parent123',
+            role=Role.PARENT,
+            school=cls.school
+        )
+        cls.products = Product.objects.bulk_create([
+            Product(
+                name=f"Item {i}", description="School supplies", price=100 + i, stock=10,
+                image=f'products/item{i}.jpg', school=cls.school
+            )
+            for i in range(30)
+        ])
+        cls.url = reverse('order-list')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.parent_user)
+
+    def place_order(self, items):
+        return self.client.post(self.url, {
+            'items': [{'product': str(product.id), 'quantity': quantity} for product, quantity in items]
+        }, format='json')
+
+    def test_order_size_does_not_change_query_count(self):
+        # SAVEPOINT, SELECT ... FOR UPDATE, INSERT order, INSERT items, UPDATE stock, RELEASE
+        with self.assertNumQueries(6):
+            response = self.place_order([(product, 2) for product in self.products])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        order = Order.objects.get()
+        self.assertEqual(order.items.count(), 30)
+        self.assertEqual(order.total_amount, sum((100 + i) * 2 for i in range(30)))
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {8})
+
+    def test_insufficient_stock_writes_nothing(self):
+        response = self.place_order([(self.products[0], 1), (self.products[1], 11)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Not enough stock for Item 1", str(response.data))
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock, 10)
+
+    def test_repeated_product_lines_share_its_stock(self):
+        response = self.place_order([(self.products[0], 6), (self.products[0], 6)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.place_order([(self.products[0], 4), (self.products[0], 6)])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock, 0)
+
+    def test_unknown_product_is_rejected(self):
+        response = self.client.post(self.url, {'items': [{'product': 'not-a-uuid', 'quantity': 1}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {'items': [{'product': str(uuid.uuid4()), 'quantity': 1}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+
+class ConcurrentCheckoutTest(TransactionTestCase):
+    """
+    Parents checking out at the same moment never oversell a product.
+    Each request runs in its own thread and database connection, so the
+    test runs outside a test transaction.
+    """
+    PARENT_COUNT = 24
+
+    def setUp(self):
+        self.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-026"
+        )
+        self.parents = User.objects.bulk_create([
+            User(
+                email=f"parent{i}@example.com",
+                role=Role.PARENT,
+                school=self.school,
+                password=make_password(None)
+            )
+            for i in range(self.PARENT_COUNT)
+        ])
+
+    def create_product(self, name, stock):
+        return Product.objects.create(
+            name=name, description="School supplies", price=500, stock=stock,
+            image='products/item.jpg', school=self.school
+        )
+
+    def checkout_storm(self, baskets):
+        """POST one basket per parent, all released at once; returns the status codes"""
+        start = threading.Barrier(len(baskets))
+
+        def checkout(parent, basket):
+            client = APIClient()
+            client.force_authenticate(user=parent)
+            try:
+                start.wait()
+                return client.post(reverse('order-list'), {
+                    'items': [{'product': str(product.id), 'quantity': quantity} for product, quantity in basket]
+                }, format='json').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(baskets)) as executor:
+            return list(executor.map(checkout, self.parents, baskets))
+
+    def test_last_items_are_sold_once(self):
+        product = self.create_product("Calculator", stock=5)
+
+        started = time.perf_counter()
+        codes = self.checkout_storm([[(product, 1)]] * self.PARENT_COUNT)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 5)
+        self.assertEqual(codes.count(status.HTTP_400_BAD_REQUEST), self.PARENT_COUNT - 5)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(sum(OrderItem.objects.values_list('quantity', flat=True)), 5)
+        self.assertEqual(Order.objects.count(), 5)
+        logger.debug(f"Concurrent checkout ({self.PARENT_COUNT} parents, 5 in stock): {elapsed:.2f} ms")
+
+    def test_overlapping_baskets_do_not_deadlock(self):
+        pens = self.create_product("Pens", stock=10)
+        books = self.create_product("Books", stock=10)
+        # Half the baskets list the products in the opposite order
+        baskets = [[(pens, 1), (books, 1)] if i % 2 else [(books, 1), (pens, 1)] for i in range(self.PARENT_COUNT)]
+
+        codes = self.checkout_storm(baskets)
+
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 10)
+        self.assertEqual(codes.count(status.HTTP_400_BAD_REQUEST), self.PARENT_COUNT - 10)
+        self.assertEqual(Product.objects.filter(stock=0).count(), 2)
+        self.assertEqual(OrderItem.objects.count(), 20)
+
+    def test_concurrent_cancels_return_stock_once(self):
+        product = self.create_product("Calculator", stock=5)
+        order = Order.objects.create(parent=self.parents[0], school=self.school, total_amount=1500)
+        OrderItem.objects.create(order=order, product=product, quantity=3, unit_price=500)
+        Product.objects.filter(pk=product.pk).update(stock=F('stock') - 3)
+        start = threading.Barrier(10)
+
+        def cancel(_):
+            client = APIClient()
+            client.force_authenticate(user=self.parents[0])
+            try:
+                start.wait()
+                return client.post(reverse('order-cancel', args=[order.pk])).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            codes = list(executor.map(cancel, range(10)))
+
+        self.assertEqual(codes.count(status.HTTP_200_OK), 1)
+        self.assertEqual(codes.count(status.HTTP_400_BAD_REQUEST), 9)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 5)
+
+
+class OrderBulkTransitionQueryCountTest(APITestCase):
+    """Bulk order transitions run a fixed number of statements whatever the order count"""
+    ORDER_COUNT = 40
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Benchmark School",
+            email="benchmark@example.com",
+            registration_number="REG-BENCH-027"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        cls.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='parent123',
+            role=Role.PARENT,
+            school=cls.school
+        )
+        cls.products = Product.objects.bulk_create([
+            Product(
+                name=f"Item {i}", description="School supplies", price=100, stock=0,
+                image=f'products/item{i}.jpg', school=cls.school
+            )
+            for i in range(5)
+        ])
+        cls.orders = Order.objects.bulk_create([
+            Order(parent=cls.parent_user, school=cls.school, total_amount=500, status='pending')
+            for _ in range(cls.ORDER_COUNT)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, unit_price=100, total_price=100)
+            for order in cls.orders
+            for product in cls.products
+        ])
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+    def post(self, name, order=None, data=None):
+        url = reverse(name, args=[order.pk]) if order else reverse(name)
+        return self.client.post(url, data or {}, format='json')
+
+    def test_bulk_cancel_of_a_day_uses_fixed_queries(self):
+        today = timezone.localdate().isoformat()
+        # SAVEPOINT, SELECT orders FOR UPDATE, UPDATE orders, SELECT returned stock,
+        # SELECT products FOR UPDATE, UPDATE products, RELEASE
+        with self.assertNumQueries(7):
+            response = self.post('order-bulk-cancel', data={'date': today})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['cancelled'], self.ORDER_COUNT)
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {self.ORDER_COUNT})
+        self.assertEqual(self.post('order-bulk-cancel', data={'date': today}).data['cancelled'], 0)
+
+    def test_bulk_complete_skips_orders_not_processing(self):
+        processing = self.orders[:10]
+        Order.objects.filter(pk__in=[order.pk for order in processing]).update(status='processing')
+
+        with self.assertNumQueries(1):
+            response = self.post('order-bulk-complete', data={'ids': [str(order.pk) for order in self.orders]})
+        self.assertEqual(response.data['completed'], 10)
+        self.assertEqual(Order.objects.filter(status='completed').count(), 10)
+        self.assertEqual(Order.objects.filter(status='pending').count(), self.ORDER_COUNT - 10)
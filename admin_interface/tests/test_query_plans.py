@@ -0,0 +1,151 @@
+import io
+import json
+import unittest
+from datetime import timedelta
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from admin_interface.models import (
+    School, User, Student, Notification, ExamResult, Attendance, Message, SchoolEvent, Role
+)
+
+# Tables that grow with the number of students; a sequential scan on any of
+# them means the endpoint's query has no usable index
+LARGE_TABLES = {
+    Student._meta.db_table,
+    Notification._meta.db_table,
+    ExamResult._meta.db_table,
+    Attendance._meta.db_table,
+    Message._meta.db_table,
+    SchoolEvent._meta.db_table,
+}
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def query_plan(sql):
+    """EXPLAIN plan of a captured statement, whose parameters are already inlined"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def large_table_scans(plan):
+    """(node type, table) of every read of a large table in a plan"""
+    return [
+        (node['Node Type'], node['Relation Name'])
+        for node in plan_nodes(plan)
+        if node.get('Relation Name') in LARGE_TABLES
+    ]
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'EXPLAIN plans are checked on PostgreSQL')
+class QueryPlanTest(APITestCase):
+    """
+    The queries behind the hot endpoints are served by indexes.
+    Each endpoint is requested and every statement it ran is explained.
+    The planner is run with enable_seqscan off, so a Seq Scan in a plan means
+    no index can answer the query at all, whatever the size of the seed.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'populate_db', '--students-per-school=400', '--years=1', '--attendance-days=2',
+            '--seed=17', stdout=io.StringIO()
+        )
+        cls.school = School.objects.get()
+        cls.admin = User.objects.get(school=cls.school, role=Role.ADMIN)
+        cls.parent = User.objects.filter(school=cls.school, role=Role.PARENT).first()
+        cls.teacher = User.objects.filter(school=cls.school, role=Role.TEACHER).first()
+        cls.class_name = Student.objects.filter(school=cls.school).values_list('class_assigned', flat=True).first()
+        cls.result = ExamResult.objects.filter(school=cls.school).first()
+
+        now = timezone.now()
+        Message.objects.bulk_create([
+            Message(
+                sender=cls.teacher if i % 2 else cls.parent,
+                receiver=cls.parent if i % 2 else cls.teacher,
+                content=f"Message {i}",
+                school=cls.school,
+            )
+            for i in range(200)
+        ])
+        SchoolEvent.objects.bulk_create([
+            SchoolEvent(
+                title=f"Event {i}", description="", event_type='activity', participants='all',
+                start_date=now + timedelta(days=i - 50), end_date=now + timedelta(days=i - 49),
+                school=cls.school,
+            )
+            for i in range(100)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertIndexed(self, user, url, params=None):
+        """Every statement the request runs against a large table reads it through an index"""
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        checked = 0
+        for query in queries.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            plan = query_plan(query['sql'])
+            scans = large_table_scans(plan)
+            if not scans:
+                continue
+            checked += 1
+            sequential = sorted({table for node_type, table in scans if node_type == 'Seq Scan'})
+            self.assertEqual(sequential, [], f"{query['sql']}\n{json.dumps(plan, indent=2)}")
+        self.assertGreater(checked, 0, "The request read none of the large tables")
+
+    def test_chat_history(self):
+        self.assertIndexed(self.teacher, reverse('chat-history', args=[self.parent.id]))
+
+    def test_inbox(self):
+        self.assertIndexed(self.teacher, reverse('message-inbox'))
+
+    def test_message_list(self):
+        self.assertIndexed(self.parent, reverse('message-list'))
+
+    def test_class_students(self):
+        self.assertIndexed(self.admin, reverse('teacher-my-class-students'), {'class_name': self.class_name})
+
+    def test_notification_feed(self):
+        self.assertIndexed(self.admin, reverse('notification-list'), {'ordering': '-created_at'})
+        self.assertIndexed(
+            self.admin, reverse('notification-list'), {'target_group': 'parents', 'ordering': '-created_at'}
+        )
+
+    def test_upcoming_events(self):
+        self.assertIndexed(self.admin, reverse('school-event-list'))
+
+    def test_term_exam_results(self):
+        self.assertIndexed(self.admin, reverse('exam-results'), {'year': self.result.year, 'term': self.result.term})
+
+    def test_class_attendance_for_a_day(self):
+        self.assertIndexed(self.admin, reverse('attendance-class-attendance-summary'), {
+            'class_name': self.class_name,
+            'date': Attendance.objects.values_list('date', flat=True).first(),
+        })
+
+    def test_parent_children(self):
+        self.assertIndexed(self.parent, reverse('parent-children'))
@@ -1,14 +1,30 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
+from admin_interface.exports import EXPORT_CHUNK_SIZE
 from admin_interface.models import (
     Teacher, Student, Parent, User, ExamResult, 
-    SchoolFee, Notification, TimeTable, Role, Document
+    SchoolFee, Notification, TimeTable, Role, Document, OutboxEmail,
+    School, Message, Product, Order, OrderItem
 )
 from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from io import BytesIO, StringIO
+from openpyxl import load_workbook
+import base64
+import csv
+import math
 import uuid
-from datetime import datetime
-from rest_framework_simplejwt.tokens import RefreshToken
+from datetime import datetime, timedelta
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
 class AuthenticationTest(APITestCase):
     def setUp(self):
@@ -353,4 +369,362 @@ class NotificationViewTest(APITestCase):
         url = reverse('notification-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data['results']), 2) 
\ No newline at end of file
+        self.assertEqual(len(response.data['results']), 2) 
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """Mail server that rejects every message"""
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP server unavailable")
+
+
+class PasswordResetOutboxTest(APITestCase):
+    def setUp(self):
+        self.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='parent123',
+            role=Role.PARENT
+        )
+        self.url = reverse('password-reset-request')
+
+    def test_reset_request_queues_email(self):
+        response = self.client.post(self.url, {'email': 'parent@example.com'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboxEmail.objects.get()
+        self.assertEqual(queued.to, ['parent@example.com'])
+        self.assertEqual(queued.status, 'pending')
+
+        call_command('run_outbox', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['parent@example.com'])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'sent')
+
+    @override_settings(EMAIL_BACKEND='admin_interface.tests.test_views.FailingEmailBackend')
+    def test_failed_delivery_is_retried_with_backoff(self):
+        self.client.post(self.url, {'email': 'parent@example.com'}, format='json')
+
+        call_command('run_outbox', '--max-attempts=2', stdout=StringIO())
+        queued = OutboxEmail.objects.get()
+        self.assertEqual(queued.status, 'pending')
+        self.assertEqual(queued.attempts, 1)
+        self.assertGreater(queued.next_attempt_at, timezone.now())
+        self.assertIn('SMTP server unavailable', queued.last_error)
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        call_command('run_outbox', '--max-attempts=2', stdout=StringIO())
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'failed')
+        self.assertEqual(queued.attempts, 2)
+
+
+class RosterImportTest(APITestCase):
+    """Roster rows that cannot be stored are reported per row"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Roster School",
+            email="roster@example.com",
+            registration_number="REG-VIEWS-010"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_values_too_long_to_store_are_row_errors(self):
+        mixed_case = User.objects.create_user(
+            email='Mixed.Case@Example.com', password='parent123', role=Role.PARENT, school=self.school
+        )
+        roster = SimpleUploadedFile('roster.csv', (
+            "student_name,grade,parent_email,parent_name,parent_phone\n"
+            "Long Phone,3,phone@example.com,Phone Family,+254 712 345 678\n"
+            f"Long Name,3,name@example.com,{'N' * 151},0712345678\n"
+            "Known Parent,3,mixed.case@example.com,Case Family,0712345678\n"
+        ).encode())
+        response = self.client.post(reverse('student-import-roster'), {'file': roster}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['errors'], [
+            {'row': 2, 'errors': ["parent_phone is longer than 15 characters"]},
+            {'row': 3, 'errors': ["parent_name is longer than 150 characters"]},
+        ])
+        self.assertEqual(response.data['students_created'], 1)
+        self.assertEqual(response.data['parents_created'], 0)
+        self.assertEqual(Student.objects.get().parent_id, mixed_case.id)
+
+    def test_dry_run_writes_nothing(self):
+        roster = SimpleUploadedFile('roster.csv', (
+            "student_name,grade,class_assigned,parent_email,parent_name\n"
+            "First Child,3,3A,family@example.com,Family\n"
+            "Second Child,5,5A,family@example.com,Family\n"
+            ",3,3A,family@example.com,Family\n"
+            "Bad Grade,three,3A,family@example.com,Family\n"
+            "Bad Email,3,3A,not-an-email,Nobody\n"
+        ).encode())
+        response = self.client.post(
+            reverse('student-import-roster'), {'file': roster, 'dry_run': 'true'}, format='multipart'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['error_count'], 3)
+        self.assertEqual(response.data['students_created'], 0)
+        self.assertFalse(Student.objects.exists())
+        self.assertFalse(Parent.objects.exists())
+
+
+class ExamResultExportTest(APITestCase):
+    """Exam results export as CSV or XLSX downloads sent chunk by chunk"""
+    RESULT_COUNT = EXPORT_CHUNK_SIZE * 2 + 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Export School",
+            email="export@example.com",
+            registration_number="REG-VIEWS-011"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        cls.teacher_user = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            role=Role.TEACHER,
+            school=cls.school
+        )
+        Teacher.objects.create(name="Class Teacher", email='teacher@example.com', class_assigned="7A", school=cls.school)
+        students = Student.objects.bulk_create([
+            Student(name="Seven A", grade=7, class_assigned="7A", school=cls.school),
+            Student(name="Seven B", grade=7, class_assigned="7B", school=cls.school),
+        ])
+        ExamResult.objects.bulk_create([
+            ExamResult(
+                student=students[i % 2], exam_name=f"Exam {i}", subject="Mathematics", marks=50 + (i % 50),
+                grade='B', term="Term 1", year=2024, school=cls.school
+            )
+            for i in range(cls.RESULT_COUNT)
+        ])
+
+    def test_xlsx_export_keeps_teacher_filtering(self):
+        self.client.force_authenticate(user=self.teacher_user)
+        response = self.client.get(reverse('exam-results'), {'format': 'xlsx'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(len(rows), self.RESULT_COUNT // 2 + 1)
+        self.assertTrue(all(row[2] == "Seven A" for row in rows[1:]))
+
+    async def test_asgi_export_is_sent_chunk_by_chunk(self):
+        token = AccessToken.for_user(self.admin_user)
+        response = await self.async_client.get(
+            reverse('exam-results'), {'format': 'csv', 'year': 2024}, headers={'Authorization': f'Bearer {token}'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        # An async iterator is what lets the ASGI handler send each chunk as it comes
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        # The header, then one chunk per EXPORT_CHUNK_SIZE rows
+        self.assertEqual(len(chunks), 1 + math.ceil(self.RESULT_COUNT / EXPORT_CHUNK_SIZE))
+        rows = list(csv.reader(StringIO(b''.join(chunks).decode())))
+        self.assertEqual(len(rows), self.RESULT_COUNT + 1)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class UnreadPushTest(APITestCase):
+    """Unread count changes are pushed to the receiver's group"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Messaging School",
+            email="messaging@example.com",
+            registration_number="REG-VIEWS-018"
+        )
+        cls.teacher_user = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            role=Role.TEACHER,
+            school=cls.school
+        )
+        cls.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='parent123',
+            role=Role.PARENT,
+            school=cls.school
+        )
+
+    def test_changes_are_pushed_to_the_user_group(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f"user_{self.parent_user.id}", channel)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                for i in range(2):
+                    Message.objects.create(
+                        sender=self.teacher_user, receiver=self.parent_user, content=f"Message {i}", school=self.school
+                    )
+        # Both messages share one push
+        self.assertEqual(len(callbacks), 1)
+
+        event = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(event['type'], 'unread_update')
+        self.assertEqual(event['total_unread'], 2)
+        self.assertEqual(event['conversations'], {str(self.teacher_user.id): 2})
+
+
+class InboxTest(APITestCase):
+    """The inbox pages through conversations, newest first, with cursors"""
+    THREAD_COUNT = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Messaging School",
+            email="messaging@example.com",
+            registration_number="REG-VIEWS-019"
+        )
+        cls.teacher_user = User.objects.create_user(
+            email='teacher@example.com',
+            password='teacher123',
+            role=Role.TEACHER,
+            school=cls.school
+        )
+        cls.parents = User.objects.bulk_create([
+            User(
+                email=f"parent{i}@example.com",
+                first_name=f"Parent {i}",
+                role=Role.PARENT,
+                school=cls.school,
+                password=make_password(None)
+            )
+            for i in range(cls.THREAD_COUNT)
+        ])
+        # One message per thread; thread i was last active i minutes after the start
+        start = timezone.now() - timedelta(days=1)
+        messages = Message.objects.bulk_create([
+            Message(sender=parent, receiver=cls.teacher_user, content=f"Thread {i}", school=cls.school)
+            for i, parent in enumerate(cls.parents)
+        ])
+        for i, message in enumerate(messages):
+            message.created_at = start + timedelta(minutes=i)
+        Message.objects.bulk_update(messages, ['created_at'])
+        cls.url = reverse('message-inbox')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.teacher_user)
+
+    def test_pages_through_older_conversations(self):
+        seen = []
+        params = {'page_size': 10}
+        while True:
+            response = self.client.get(self.url, params)
+            seen.extend(row['counterpart_id'] for row in response.data['results'])
+            if not response.data['has_more']:
+                break
+            params = {'page_size': 10, 'before': response.data['previous_cursor']}
+
+        self.assertEqual(seen, [str(parent.id) for parent in reversed(self.parents)])
+
+    def test_new_message_moves_conversation_to_the_top(self):
+        response = self.client.get(self.url, {'page_size': 10})
+        oldest = self.parents[0]
+
+        Message.objects.create(sender=self.teacher_user, receiver=oldest, content="Hello", school=self.school)
+        response = self.client.get(self.url, {'after': response.data['next_cursor']})
+        self.assertEqual([row['counterpart_id'] for row in response.data['results']], [str(oldest.id)])
+        self.assertEqual(response.data['results'][0]['last_message'], "Hello")
+        self.assertEqual(response.data['results'][0]['unread'], 0)
+
+    def test_tampered_cursor_is_rejected(self):
+        cursor = base64.urlsafe_b64encode(f"{timezone.now().isoformat()}|not-a-uuid".encode()).decode()
+        response = self.client.get(self.url, {'before': cursor})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OrderTransitionTest(APITestCase):
+    """Orders only move between the statuses their workflow allows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(
+            name="Shop School",
+            email="shop@example.com",
+            registration_number="REG-VIEWS-025"
+        )
+        cls.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='admin123',
+            role=Role.ADMIN,
+            school=cls.school
+        )
+        cls.parent_user = User.objects.create_user(
+            email='parent@example.com',
+            password='parent123',
+            role=Role.PARENT,
+            school=cls.school
+        )
+        cls.products = Product.objects.bulk_create([
+            Product(
+                name=f"Item {i}", description="School supplies", price=100, stock=0,
+                image=f'products/item{i}.jpg', school=cls.school
+            )
+            for i in range(3)
+        ])
+        cls.order = Order.objects.create(parent=cls.parent_user, school=cls.school, total_amount=300, status='pending')
+        OrderItem.objects.bulk_create([
+            OrderItem(order=cls.order, product=product, quantity=1, unit_price=100, total_price=100)
+            for product in cls.products
+        ])
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin_user)
+
+    def post(self, name, order=None, data=None):
+        url = reverse(name, args=[order.pk]) if order else reverse(name)
+        return self.client.post(url, data or {}, format='json')
+
+    def test_transitions_only_apply_from_the_expected_status(self):
+        self.assertEqual(self.post('order-complete', self.order).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.post('order-process', self.order)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'processing')
+        self.assertEqual(self.post('order-process', self.order).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post('order-complete', self.order).data['status'], 'completed')
+        self.assertEqual(self.post('order-cancel', self.order).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {0})
+
+    def test_cancel_returns_stock_once(self):
+        response = self.post('order-cancel', self.order)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'cancelled')
+        self.assertEqual(self.post('order-cancel', self.order).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {1})
+
+    def test_bulk_selection_is_validated(self):
+        self.assertEqual(self.post('order-bulk-complete').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.post('order-bulk-complete', data={'ids': ['not-a-uuid']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.post('order-bulk-cancel', data={'date': '17/10/2026'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.parent_user)
+        response = self.post('order-bulk-cancel', data={'date': timezone.localdate().isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,30 @@
+import weakref
+from django.db import transaction
+
+
+def on_commit_once(key, func):
+    """
+    Run `func` once the current transaction commits, unless a callback for
+    `key` is already waiting on this connection; returns the function that
+    will run, so callers can add to its work.
+
+    Pending callbacks are tracked in a per-connection weak mapping. A
+    callback leaves it when it runs, and when a rollback discards it Django
+    drops the last reference to it, so the key is free again.
+    """
+    connection = transaction.get_connection()
+    pending = getattr(connection, 'pending_on_commit', None)
+    if pending is None:
+        pending = connection.pending_on_commit = weakref.WeakValueDictionary()
+
+    callback = pending.get(key)
+    if callback is not None:
+        return callback.func
+
+    def callback():
+        pending.pop(key, None)
+        func()
+    callback.func = func
+    pending[key] = callback
+    transaction.on_commit(callback)
+    return func
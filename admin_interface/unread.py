@@ -0,0 +1,105 @@
+import logging
+from collections import Counter
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Message, UnreadCounter
+from .transactions import on_commit_once
+
+logger = logging.getLogger(__name__)
+
+
+def unread_pairs(messages):
+    """Counter of (receiver id, sender id) over the unread messages given"""
+    return Counter(
+        (message.receiver_id, message.sender_id)
+        for message in messages
+        if message.receiver_id and not message.is_read
+    )
+
+
+def adjust_unread(pairs):
+    """
+    Apply a Counter of (user id, counterpart id) -> delta to the unread
+    counters with F() updates, creating missing rows, and push the new
+    counts once the transaction commits.
+    """
+    for (user_id, counterpart_id), delta in pairs.items():
+        if not delta:
+            continue
+        counters = UnreadCounter.objects.filter(user_id=user_id, counterpart_id=counterpart_id)
+        updated = counters.update(count=Greatest(F('count') + delta, 0), updated_at=timezone.now())
+        if not updated and delta > 0:
+            try:
+                with transaction.atomic():
+                    UnreadCounter.objects.create(user_id=user_id, counterpart_id=counterpart_id, count=delta)
+            except IntegrityError:
+                # Created by a concurrent writer since the UPDATE
+                counters.update(count=F('count') + delta, updated_at=timezone.now())
+        schedule_unread_push(user_id, counterpart_id)
+
+
+def mark_conversation_read(user, counterpart_id):
+    """
+    Mark every message `user` received from `counterpart_id` as read with one
+    UPDATE and take the same number off their unread counter.
+    Returns the number of messages marked.
+    """
+    with transaction.atomic():
+        marked = Message.objects.filter(
+            receiver=user, sender_id=counterpart_id, is_read=False
+        ).update(is_read=True)
+        if marked:
+            adjust_unread(Counter({(user.id, counterpart_id): -marked}))
+    return marked
+
+
+def unread_counts(user_id):
+    """Unread message counts of a user, per counterpart and in total"""
+    counters = UnreadCounter.objects.filter(user_id=user_id, count__gt=0)
+    return {
+        'total': counters.aggregate(total=Sum('count'))['total'] or 0,
+        'conversations': [
+            {'counterpart_id': str(counterpart_id), 'unread': count}
+            for counterpart_id, count in counters.order_by('-updated_at').values_list('counterpart_id', 'count')
+        ],
+    }
+
+
+def schedule_unread_push(user_id, counterpart_id):
+    """
+    Push a user's counter for a conversation to their `user_<id>` channel
+    group after commit. Changes to the same counters within one transaction
+    share a single push per user.
+    """
+    user_id, counterpart_id = str(user_id), str(counterpart_id)
+
+    def push():
+        push_unread_counts(user_id, push.counterparts)
+    push.counterparts = {counterpart_id}
+    on_commit_once(('unread-push', user_id), push).counterparts.add(counterpart_id)
+
+
+def push_unread_counts(user_id, counterpart_ids):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    counts = {
+        str(counterpart_id): count
+        for counterpart_id, count in UnreadCounter.objects.filter(user_id=user_id).values_list('counterpart_id', 'count')
+    }
+    try:
+        async_to_sync(channel_layer.group_send)(f"user_{user_id}", {
+            "type": "unread_update",
+            "total_unread": sum(counts.values()),
+            "conversations": {
+                counterpart_id: counts.get(counterpart_id, 0)
+                for counterpart_id in sorted(counterpart_ids)
+            },
+        })
+    except Exception:
+        # Counters are already stored; clients catch up from the REST endpoint
+        logger.exception("Could not push unread counts to user %s", user_id)
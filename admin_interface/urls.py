@@ -3,7 +3,7 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.routers import DefaultRouter
 from .views import (
     TeacherViewSet, StudentViewSet, DocumentUploadView,
-    ExamResultView, NotificationView,
+    ExamResultView, ExamAnalyticsView, NotificationView,
     RegisterView, LoginView, LogoutView,
     ParentChildrenView, StudentExamResultsView,
     TeachersBySubjectView,
@@ -14,7 +14,8 @@ from .views import (
     PasswordResetConfirmView, TeacherPasswordResetConfirmView, TeacherParentAssociationViewSet,
     SchoolViewSet, ParentViewSet, SchoolEventViewSet, SuperUserViewSet,
     CurrentSchoolView, DirectMessagingView, AttendanceViewSet,
-    OrderViewSet, ComprehensiveStudentDetailView
+    OrderViewSet, ComprehensiveStudentDetailView, StudentRankingViewSet,
+    MetricsView
 )
 
 router = DefaultRouter()
@@ -32,6 +33,7 @@ router.register(r'school-events', SchoolEventViewSet, basename='school-event')
 router.register(r'products', ProductViewSet, basename='product')
 router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'attendance', AttendanceViewSet, basename='attendance')
+router.register(r'rankings', StudentRankingViewSet, basename='ranking')
 
 urlpatterns = [
     # Authentication
@@ -54,6 +56,7 @@ urlpatterns = [
     # Exam Results
     path('exams/record/', ExamResultView.as_view(), name='record-exam-result'),
     path('exam-results/', ExamResultView.as_view(), name='exam-results'),
+    path('exam-results/analytics/', ExamAnalyticsView.as_view(), name='exam-analytics'),
 
     # Parents
     path('parents/me/', ParentViewSet.as_view({'get': 'me'}), name='parent-me'),
@@ -93,6 +96,18 @@ urlpatterns = [
         'get': 'get_chat_history'
     }), name='chat-history-query'),
     
+    path('messages/inbox/', MessageViewSet.as_view({
+        'get': 'inbox'
+    }), name='message-inbox'),
+
+    path('messages/unread/', MessageViewSet.as_view({
+        'get': 'unread'
+    }), name='message-unread'),
+
+    path('messages/mark_read/', MessageViewSet.as_view({
+        'post': 'mark_read'
+    }), name='message-mark-read'),
+
     path('messages/direct_message/', MessageViewSet.as_view({
         'post': 'direct_message'
     }), name='direct-message'),
@@ -135,6 +150,9 @@ urlpatterns = [
         'delete': 'destroy'
     }), name='product-detail'),
 
+    # Instrumentation
+    path('_metrics/', MetricsView.as_view(), name='metrics'),
+
     # Include the router URLs
     path('', include(router.urls)),
 ] 
\ No newline at end of file
@@ -6,7 +6,7 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.utils import timezone
 from django.contrib.auth.hashers import make_password, check_password
 import time
-from .models import User, Teacher, Student, Notification, Parent, ExamResult, Document, Role, Message, LeaveApplication, TimeTable, Product, ExamPDF, SchoolEvent, PasswordResetToken, TeacherParentAssociation, School, AdminCredential, Attendance, Order, OrderItem
+from .models import User, Teacher, Student, Notification, Parent, ExamResult, Document, Role, Message, LeaveApplication, TimeTable, Product, ExamPDF, SchoolEvent, PasswordResetToken, TeacherParentAssociation, School, AdminCredential, Attendance, Order, OrderItem, StudentRanking
 from .serializers import (
     TeacherSerializer, StudentSerializer, NotificationSerializer,
     ParentSerializer, ParentRegistrationSerializer,
@@ -15,16 +15,35 @@ from .serializers import (
     UserSerializer, DocumentSerializer, MessageSerializer, LeaveApplicationSerializer, ProductSerializer,
     ExamPDFSerializer, SchoolEventSerializer, PasswordResetRequestSerializer, PasswordResetConfirmSerializer,
     TeacherParentAssociationSerializer, SchoolSerializer, TimeTableSerializer, AttendanceSerializer,
-    OrderSerializer, OrderCreateSerializer
+    OrderSerializer, OrderCreateSerializer, MarkAttendanceSerializer, StudentRankingSerializer,
+    ConversationSerializer
 )
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.views import APIView
+from rest_framework.renderers import JSONRenderer
 from django.contrib.auth import authenticate
 from django.db import transaction
 from django.db import models
 from .permissions import IsAdmin, IsTeacher, IsParent, IsAdminOrTeacherOrParent, IsAdminOrTeacher
+from .analytics import get_exam_analytics
+from .catalog import get_catalog, with_current_stock
+from .conditional import conditional_get
+from .aggregates import attendance_counts, attendance_percentage, empty_attendance_counts, recent_attendance
+from .exports import EXAM_RESULT_COLUMNS, EXPORT_FORMATS, stream_csv, stream_xlsx
+from .image_variants import variant_urls
+from .inbox import conversation_heads
+from .metrics import render_metrics
+from .middleware import get_request_teacher
+from .outbox import enqueue_email
+from .pagination import LargeResultsSetPagination, keyset_paginate, parse_page_size
+from .roster_import import RosterImportError, import_roster
+from .rankings import schedule_student_ranking_refresh
+from .school_stats import adjust_school_stats, set_school_stats, get_school_stats, get_global_stats, students_per_grade
+from .shop import cancel_orders, transition_orders
+from .unread import mark_conversation_read, unread_counts
 from django.http import HttpResponse
 import uuid
+from collections import Counter, defaultdict
 from rest_framework import serializers
 from django.shortcuts import get_object_or_404
 from django.urls import path
@@ -32,11 +51,12 @@ from django.core.mail import send_mail
 from django.conf import settings
 from rest_framework.exceptions import PermissionDenied
 from django.db import IntegrityError
-from django.db.models import Q
+from django.db.models import Q, F
 from django.db import connection
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from django.http import FileResponse
+from django.utils.dateparse import parse_date
 
 class RegisterView(APIView):
     """Handles user registration."""
@@ -155,12 +175,33 @@ class AdminViewSet(viewsets.ViewSet):
     def bulk_promote_students(self, request):
         """Promote students to next grade"""
         try:
-            from_grade = request.data.get('from_grade')
-            to_grade = request.data.get('to_grade')
-            
+            try:
+                from_grade = int(request.data.get('from_grade'))
+                to_grade = int(request.data.get('to_grade'))
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': 'from_grade and to_grade must be whole numbers'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if from_grade == to_grade:
+                return Response(
+                    {'error': 'from_grade and to_grade must be different'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
             students = Student.objects.filter(grade=from_grade)
-            count = students.count()
-            students.update(grade=to_grade)
+            with transaction.atomic():
+                # Rankings store each student's grade, refresh the terms they have results in
+                schedule_student_ranking_refresh(students)
+                # .update() bypasses signals, so move the per-grade counters by hand
+                moved = list(students.order_by().values('school_id').annotate(total=models.Count('id')))
+                count = sum(row['total'] for row in moved)
+                students.update(grade=to_grade)
+                for row in moved:
+                    grades = Counter()
+                    grades[from_grade] -= row['total']
+                    grades[to_grade] += row['total']
+                    adjust_school_stats(row['school_id'], grades=grades)
             
             return Response({
                 'message': f'Promoted {count} students from grade {from_grade} to {to_grade}'
@@ -221,6 +262,7 @@ class SchoolViewSet(viewsets.ModelViewSet):
         if school.is_active:
             # School was activated - restore login credentials
             User.objects.filter(school=school).update(is_active=True)
+            set_school_stats(school.id, active_user_count=F('user_count'))
             
             # Create notification for all users in this school
             Notification.objects.create(
@@ -238,6 +280,7 @@ class SchoolViewSet(viewsets.ModelViewSet):
         else:
             # School was deactivated - invalidate login credentials
             User.objects.filter(school=school).update(is_active=False)
+            set_school_stats(school.id, active_user_count=0)
             
             # Create notification for all users in this school
             Notification.objects.create(
@@ -257,11 +300,12 @@ class SchoolViewSet(viewsets.ModelViewSet):
     def statistics(self, request, pk=None):
         """Get school statistics"""
         school = self.get_object()
+        school_stats = get_school_stats(school)
         stats = {
-            'total_teachers': Teacher.objects.filter(school=school).count(),
-            'total_students': Student.objects.filter(school=school).count(),
-            'total_parents': User.objects.filter(school=school, role=Role.PARENT).count(),
-            'active_users': User.objects.filter(school=school, is_active=True).count()
+            'total_teachers': school_stats.teacher_count,
+            'total_students': school_stats.student_count,
+            'total_parents': school_stats.parent_user_count,
+            'active_users': school_stats.active_user_count
         }
         return Response(stats)
 
@@ -370,7 +414,7 @@ class TeacherViewSet(viewsets.ModelViewSet):
     def available_parents(self, request):
         """Get list of available parents for assigning to students"""
         try:
-            teacher = Teacher.objects.get(email=request.user.email)
+            teacher = get_request_teacher(request)
             
             if not teacher.class_assigned:
                 return Response(
@@ -543,7 +587,7 @@ class TeacherViewSet(viewsets.ModelViewSet):
                 })
             
             # For teachers, use existing logic
-            teacher = Teacher.objects.get(email=user.email)
+            teacher = get_request_teacher(request)
             
             if not teacher.class_assigned:
                 return Response(
@@ -581,7 +625,7 @@ class TeacherViewSet(viewsets.ModelViewSet):
     def my_profile(self, request):
         """Get the current authenticated teacher's profile information"""
         try:
-            teacher = Teacher.objects.get(email=request.user.email)
+            teacher = get_request_teacher(request)
             serializer = TeacherSerializer(teacher)
             
             # Add additional information that might be useful
@@ -611,7 +655,7 @@ class TeacherViewSet(viewsets.ModelViewSet):
     def update_my_profile(self, request):
         """Update the current authenticated teacher's profile information"""
         try:
-            teacher = Teacher.objects.get(email=request.user.email)
+            teacher = get_request_teacher(request)
             
             # Allow updating specific fields only
             allowed_fields = ['name', 'phone_number', 'subjects']
@@ -702,7 +746,7 @@ class TeacherViewSet(viewsets.ModelViewSet):
                 )
             
             # Verify teacher has permission (same school)
-            teacher = Teacher.objects.get(email=request.user.email)
+            teacher = get_request_teacher(request)
             if exam_result.school != teacher.school:
                 return Response(
                     {
@@ -886,6 +930,33 @@ class StudentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdmin],
+            parser_classes=[MultiPartParser, FormParser])
+    def import_roster(self, request):
+        """
+        Bulk import students and their parents from an XLSX or CSV roster.
+        Columns: student_name, grade, parent_email and optionally
+        class_assigned, contact, parent_name, parent_phone.
+        Pass dry_run=true to only validate the file.
+        """
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'A roster file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not request.user.school:
+            return Response({'error': 'No school associated with this user'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            report = import_roster(
+                upload,
+                upload.name,
+                request.user.school,
+                dry_run=str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+            )
+        except RosterImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(report)
+
     @action(detail=True, methods=['get'])
     def exam_results(self, request, pk=None):
         student = self.get_object()
@@ -945,22 +1016,31 @@ class ParentViewSet(viewsets.ModelViewSet):
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        # Get all parents in the queryset
         parents = self.get_queryset()
-        # Get the corresponding User IDs for these parents
-        parent_users = User.objects.filter(email__in=[parent.email for parent in parents], role=Role.PARENT)
-        # Get students for these parent users
-        students = Student.objects.filter(parent_id__in=parent_users.values_list('id', flat=True))
-        # Create a mapping of parent email to their children
-        parent_children = {}
-        for student in students:
-            parent_user = User.objects.get(id=student.parent_id)
-            if parent_user.email not in parent_children:
-                parent_children[parent_user.email] = []
-            parent_children[parent_user.email].append(student)
-        context['parent_children'] = parent_children
+        # Detail routes only need the children of the requested parent
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            parents = parents.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        context['parent_children'] = self._get_parent_children(parents)
         return context
 
+    def _get_parent_children(self, parents):
+        """
+        Map parent email -> list of children for the given Parent queryset.
+        Parent and User records are linked by email, so the students are
+        fetched in a single JOIN (parents are embedded as a subquery) and
+        grouped in one pass instead of resolving each student's parent.
+        """
+        students = Student.objects.filter(
+            parent__role=Role.PARENT,
+            parent__email__in=parents.values('email')
+        ).annotate(parent_email=F('parent__email'))
+
+        parent_children = defaultdict(list)
+        for student in students:
+            parent_children[student.parent_email].append(student)
+        return parent_children
+
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             permission_classes = [IsAdminOrTeacher]
@@ -1138,6 +1218,7 @@ class ParentViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=['get'], permission_classes=[IsParent])
+    @conditional_get('parent-profile')
     def me(self, request):
         """Get current parent's profile information including children and date joined"""
         try:
@@ -1378,9 +1459,9 @@ class ParentViewSet(viewsets.ModelViewSet):
                 )
 
             # Get all children for the parent
-            children = Student.objects.filter(parent=parent)
+            children = list(Student.objects.filter(parent=parent))
             
-            if not children.exists():
+            if not children:
                 return Response({
                     'message': 'No children found for this parent',
                     'attendance_summary': []
@@ -1409,55 +1490,44 @@ class ParentViewSet(viewsets.ModelViewSet):
 
             # Get attendance records for all children
             attendance_queryset = Attendance.objects.filter(
-                student__in=children
-            ).select_related('student', 'recorded_by')
+                student__in=[child.id for child in children]
+            )
 
             if start_date:
                 attendance_queryset = attendance_queryset.filter(date__gte=start_date)
             if end_date:
                 attendance_queryset = attendance_queryset.filter(date__lte=end_date)
 
-            # Group by child and calculate statistics
+            # One GROUP BY for every child's totals, one window query for recent records
+            counts_by_child = attendance_counts(attendance_queryset)
+            recent_by_child = recent_attendance(attendance_queryset, limit=10)
+
             attendance_by_child = {}
             overall_stats = {
-                'total_children': children.count(),
+                'total_children': len(children),
                 'date_range': {
                     'start_date': start_date.isoformat() if start_date else None,
                     'end_date': end_date.isoformat() if end_date else None
                 },
-                'total_records': attendance_queryset.count()
+                'total_records': sum(counts['total_records'] for counts in counts_by_child.values())
             }
 
             for child in children:
-                child_attendance = attendance_queryset.filter(student=child)
-                
-                # Calculate statistics
-                total_records = child_attendance.count()
-                present_count = child_attendance.filter(status='present').count()
-                absent_count = child_attendance.filter(status='absent').count()
-                late_count = child_attendance.filter(status='late').count()
-                excused_count = child_attendance.filter(status='excused').count()
-                
-                # Calculate attendance percentage
-                attendance_percentage = (present_count / total_records * 100) if total_records > 0 else 0
-
-                # Get recent attendance records (last 10)
-                recent_records = child_attendance.order_by('-date')[:10]
-                from .serializers import AttendanceSerializer
+                counts = counts_by_child.get(child.id, empty_attendance_counts())
                 
                 attendance_by_child[str(child.id)] = {
                     'child_name': child.name,
                     'child_grade': child.grade,
                     'child_class': child.class_assigned,
                     'statistics': {
-                        'total_records': total_records,
-                        'present': present_count,
-                        'absent': absent_count,
-                        'late': late_count,
-                        'excused': excused_count,
-                        'attendance_percentage': round(attendance_percentage, 2)
+                        'total_records': counts['total_records'],
+                        'present': counts['present'],
+                        'absent': counts['absent'],
+                        'late': counts['late'],
+                        'excused': counts['excused'],
+                        'attendance_percentage': attendance_percentage(counts)
                     },
-                    'recent_records': AttendanceSerializer(recent_records, many=True).data
+                    'recent_records': AttendanceSerializer(recent_by_child.get(child.id, []), many=True).data
                 }
 
             return Response({
@@ -1521,8 +1591,18 @@ class ParentViewSet(viewsets.ModelViewSet):
 class ExamResultView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def perform_content_negotiation(self, request, force=False):
+        # ?format=csv|xlsx selects a streamed export rather than a DRF renderer,
+        # so errors on those requests are still rendered as JSON
+        if request.query_params.get('format') in EXPORT_FORMATS:
+            return (JSONRenderer(), JSONRenderer.media_type)
+        return super().perform_content_negotiation(request, force)
+
     def get(self, request):
-        """Retrieve exam results with proper role-based filtering"""
+        """
+        Retrieve exam results with proper role-based filtering.
+        ?format=csv or ?format=xlsx streams the same results as a download.
+        """
         user = request.user
         queryset = ExamResult.objects.all()
         
@@ -1530,7 +1610,7 @@ class ExamResultView(APIView):
         if user.role == Role.TEACHER:
             # Teachers can only see exam results for students in their assigned class
             try:
-                teacher = Teacher.objects.get(email=user.email)
+                teacher = get_request_teacher(request)
                 if not teacher.class_assigned:
                     return Response({
                         "error": "Teacher must be assigned to a class to view exam results"
@@ -1577,7 +1657,7 @@ class ExamResultView(APIView):
             # Additional security check: ensure teacher can access this student
             if user.role == Role.TEACHER:
                 try:
-                    teacher = Teacher.objects.get(email=user.email)
+                    teacher = get_request_teacher(request)
                     student = Student.objects.get(id=student_id)
                     if student.class_assigned != teacher.class_assigned:
                         return Response({
@@ -1593,6 +1673,12 @@ class ExamResultView(APIView):
             
         # Order by most recent first
         queryset = queryset.order_by('-created_at')
+
+        export_format = request.query_params.get('format')
+        if export_format == 'csv':
+            return stream_csv(request, queryset, EXAM_RESULT_COLUMNS, 'exam_results')
+        if export_format == 'xlsx':
+            return stream_xlsx(request, queryset, EXAM_RESULT_COLUMNS, 'exam_results')
             
         serializer = ExamResultSerializer(queryset, many=True)
         
@@ -1611,6 +1697,71 @@ class ExamResultView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ExamAnalyticsView(APIView):
+    """Class and subject grade statistics for one school term"""
+    permission_classes = [IsAdminOrTeacher]
+
+    def get(self, request):
+        school = request.user.school
+        if not school:
+            return Response(
+                {"error": "No school associated with this user"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        year = request.query_params.get('year')
+        term = request.query_params.get('term')
+        if not year or not term:
+            return Response(
+                {"error": "year and term query parameters are required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            year = int(year)
+        except ValueError:
+            return Response({"error": "year must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(get_exam_analytics(school.id, year, term))
+
+
+class StudentRankingViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Class and grade positions per term.
+    Filter with year, term, class_name and grade; order=grade lists by
+    position in grade instead of position in class.
+    """
+    serializer_class = StudentRankingSerializer
+    permission_classes = [IsAdminOrTeacherOrParent]
+    pagination_class = LargeResultsSetPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = StudentRanking.objects.select_related('student')
+
+        if user.role == Role.PARENT:
+            queryset = queryset.filter(student__parent=user)
+        elif user.school:
+            queryset = queryset.filter(school=user.school)
+        else:
+            return StudentRanking.objects.none()
+
+        params = self.request.query_params
+        for field in ('year', 'grade'):
+            if params.get(field):
+                try:
+                    queryset = queryset.filter(**{field: int(params[field])})
+                except ValueError:
+                    raise ValidationError({field: 'Must be a whole number'})
+        if params.get('term'):
+            queryset = queryset.filter(term=params['term'])
+        if params.get('class_name'):
+            queryset = queryset.filter(class_assigned=params['class_name'])
+
+        if params.get('order') == 'grade':
+            return queryset.order_by('-year', 'term', 'grade', 'grade_position', 'student__name')
+        return queryset.order_by('-year', 'term', 'class_assigned', 'class_position', 'student__name')
+
+
 class NotificationView(viewsets.ModelViewSet):
     """ViewSet for managing notifications"""
     queryset = Notification.objects.all()
@@ -1635,6 +1786,10 @@ class NotificationView(viewsets.ModelViewSet):
             
         return queryset
 
+    @conditional_get('notifications')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """Set the created_by and school fields for notification"""
         user = self.request.user
@@ -1944,26 +2099,15 @@ class SchoolStatisticsView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
                 
-            # Get teacher count for this school
-            total_teachers = Teacher.objects.filter(school=school).count()
-            
-            # Get student count for this school
-            total_students = Student.objects.filter(school=school).count()
-            
-            # Get parent count for this school
-            parent_count = Parent.objects.filter(school=school).count()
+            # Counters are maintained incrementally, see school_stats.py
+            school_stats = get_school_stats(school)
+            total_teachers = school_stats.teacher_count
+            total_students = school_stats.student_count
+            parent_count = school_stats.parent_count
             
             # Calculate active users
             active_users = total_teachers + total_students + parent_count
             
-            # Get students per grade
-            students_per_grade = []
-            grades = Student.objects.filter(school=school).values('grade').distinct()
-            for grade_dict in grades:
-                grade = grade_dict['grade']
-                count = Student.objects.filter(school=school, grade=grade).count()
-                students_per_grade.append({'grade': grade, 'count': count})
-            
             # Get recent notifications
             recent_notifications = Notification.objects.filter(school=school).order_by('-created_at')[:5]
             notification_list = []
@@ -1980,7 +2124,8 @@ class SchoolStatisticsView(APIView):
                 'total_students': total_students,
                 'total_parents': parent_count,
                 'active_users': active_users,
-                'students_per_grade': students_per_grade,
+                'students_per_grade': students_per_grade(school_stats),
+                'total_notifications': school_stats.notification_count,
                 'recent_notifications': notification_list,
                 'school_name': school.name
             })
@@ -2332,9 +2477,17 @@ class MessageViewSet(viewsets.ModelViewSet):
                 "error": f"Failed to create message: {str(e)}"
             })
 
+    CHAT_PAGE_SIZE = 50
+    CHAT_MAX_PAGE_SIZE = 200
+
     @action(detail=False, methods=['get'])
     def get_chat_history(self, request, user_id=None):
-        """Get chat history with a specific user"""
+        """
+        Get chat history with a specific user, one page at a time.
+        Returns the latest `page_size` messages by default; pass
+        `before=<previous_cursor>` to load older messages and
+        `after=<next_cursor>` to load newer ones.
+        """
         try:
             if not user_id:
                 user_id = request.query_params.get('user_id')
@@ -2355,7 +2508,7 @@ class MessageViewSet(viewsets.ModelViewSet):
                 )
             
             # Check school permissions
-            if request.user.school and other_user.school and request.user.school.id != other_user.school.id:
+            if request.user.school_id and other_user.school_id and request.user.school_id != other_user.school_id:
                 return Response(
                     {"error": "You can only view chat history with users in your school"},
                     status=status.HTTP_403_FORBIDDEN
@@ -2367,21 +2520,83 @@ class MessageViewSet(viewsets.ModelViewSet):
                     (Q(sender=request.user) & Q(receiver=other_user)) |
                     (Q(sender=other_user) & Q(receiver=request.user))
                 )
-            ).order_by('created_at')
+            ).select_related('sender', 'receiver')
             
             # Filter by school
             if request.user.school:
                 messages = messages.filter(school=request.user.school)
             
-            serializer = self.get_serializer(messages, many=True)
-            return Response(serializer.data)
+            page = keyset_paginate(
+                messages,
+                page_size=parse_page_size(
+                    request.query_params.get('page_size'),
+                    self.CHAT_PAGE_SIZE,
+                    self.CHAT_MAX_PAGE_SIZE
+                ),
+                before=request.query_params.get('before'),
+                after=request.query_params.get('after')
+            )
+            serializer = self.get_serializer(page['rows'], many=True)
+            return Response({
+                'results': serializer.data,
+                'has_more': page['has_more'],
+                'previous_cursor': page['previous_cursor'],
+                'next_cursor': page['next_cursor']
+            })
             
+        except ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    INBOX_PAGE_SIZE = 50
+    INBOX_MAX_PAGE_SIZE = 500
+
+    @action(detail=False, methods=['get'])
+    def inbox(self, request):
+        """
+        The current user's conversations, most recently active first: one row
+        per counterpart with the latest message and the unread count.
+        Pass `before=<previous_cursor>` to load older conversations and
+        `after=<next_cursor>` to load ones that became active since.
+        """
+        page = keyset_paginate(
+            conversation_heads(request.user),
+            page_size=parse_page_size(
+                request.query_params.get('page_size'),
+                self.INBOX_PAGE_SIZE,
+                self.INBOX_MAX_PAGE_SIZE
+            ),
+            before=request.query_params.get('before'),
+            after=request.query_params.get('after')
+        )
+        serializer = ConversationSerializer(reversed(page['rows']), many=True)
+        return Response({
+            'results': serializer.data,
+            'has_more': page['has_more'],
+            'previous_cursor': page['previous_cursor'],
+            'next_cursor': page['next_cursor']
+        })
+
+    @action(detail=False, methods=['get'])
+    def unread(self, request):
+        """Unread message counts of the current user, per conversation and in total"""
+        return Response(unread_counts(request.user.id))
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """Mark the whole conversation with `user_id` as read"""
+        try:
+            counterpart_id = uuid.UUID(str(request.data.get('user_id')))
+        except ValueError:
+            return Response({"error": "A valid user_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        marked = mark_conversation_read(request.user, counterpart_id)
+        return Response({'user_id': str(counterpart_id), 'marked_read': marked})
+
     @action(detail=False, methods=['post'])
     def direct_message(self, request):
         """Direct message creation endpoint"""
@@ -2450,7 +2665,7 @@ class MessageViewSet(viewsets.ModelViewSet):
             if user.role == Role.TEACHER:
                 # Teacher sees parents of students in their assigned class
                 try:
-                    teacher = Teacher.objects.get(email=user.email)
+                    teacher = get_request_teacher(request)
                     
                     if not teacher.class_assigned:
                         return Response(
@@ -2678,7 +2893,7 @@ class LeaveApplicationViewSet(viewsets.ModelViewSet):
         if user.role == Role.TEACHER:
             # Teachers can only see their own applications
             try:
-                teacher = Teacher.objects.get(email=user.email)
+                teacher = get_request_teacher(self.request)
                 return LeaveApplication.objects.filter(teacher=teacher)
             except Teacher.DoesNotExist:
                 return LeaveApplication.objects.none()
@@ -2693,7 +2908,7 @@ class LeaveApplicationViewSet(viewsets.ModelViewSet):
         
         if user.role == Role.TEACHER:
             try:
-                teacher = Teacher.objects.get(email=user.email)
+                teacher = get_request_teacher(self.request)
                 # Add the school field to the leave application
                 if user.school:
                     serializer.save(teacher=teacher, school=user.school)
@@ -2728,7 +2943,7 @@ class LeaveApplicationViewSet(viewsets.ModelViewSet):
         if request.user.role == Role.TEACHER:
             # Teachers can only update their own applications
             try:
-                teacher = Teacher.objects.get(email=request.user.email)
+                teacher = get_request_teacher(request)
                 if instance.teacher.id != teacher.id:
                     return Response(
                         {"detail": "You do not have permission to update this leave application."},
@@ -2808,10 +3023,11 @@ class TeacherProfilePicView(APIView):
             if request.user.role != Role.TEACHER:
                 return Response({"error": "Only teachers can access this endpoint"}, status=status.HTTP_403_FORBIDDEN)
                 
-            teacher = Teacher.objects.get(email=request.user.email)
+            teacher = get_request_teacher(request)
             if teacher.profile_pic:
                 return Response({
-                    "profile_pic": request.build_absolute_uri(teacher.profile_pic.url)
+                    "profile_pic": request.build_absolute_uri(teacher.profile_pic.url),
+                    "profile_pic_variants": variant_urls(teacher, 'profile_pic', request)
                 }, status=status.HTTP_200_OK)
             else:
                 return Response({"error": "No profile picture found"}, status=status.HTTP_404_NOT_FOUND)
@@ -2824,7 +3040,7 @@ class TeacherProfilePicView(APIView):
             if request.user.role != Role.TEACHER:
                 return Response({"error": "Only teachers can update their profile pictures"}, status=status.HTTP_403_FORBIDDEN)
                 
-            teacher = Teacher.objects.get(email=request.user.email)
+            teacher = get_request_teacher(request)
             
             if 'profile_pic' not in request.FILES:
                 return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
@@ -2866,6 +3082,26 @@ class ProductViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(school=user.school)
             
         return queryset
+
+    @conditional_get('products')
+    def list(self, request, *args, **kwargs):
+        """
+        A school's catalog is served from the cache and only its stock is
+        read per request; searches run against the database
+        """
+        school_id = request.user.school_id
+        if not school_id or request.query_params.get('search'):
+            return super().list(request, *args, **kwargs)
+
+        products = get_catalog(
+            school_id,
+            request.build_absolute_uri('/'),
+            lambda: self.get_serializer(self.get_queryset().order_by('created_at', 'id'), many=True).data
+        )
+        page = self.paginate_queryset(products)
+        if page is not None:
+            return self.get_paginated_response(with_current_stock(page))
+        return Response(with_current_stock(products))
         
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
@@ -2917,7 +3153,7 @@ class TeacherExamViewSet(viewsets.ModelViewSet):
         if user.role == Role.TEACHER:
             # Teachers can only see their own PDFs
             try:
-                teacher = Teacher.objects.get(email=user.email)
+                teacher = get_request_teacher(self.request)
                 queryset = queryset.filter(teacher=teacher)
             except Teacher.DoesNotExist:
                 return ExamPDF.objects.none()
@@ -2931,7 +3167,7 @@ class TeacherExamViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Set the teacher and validate the file before saving"""
         try:
-            teacher = Teacher.objects.get(email=self.request.user.email)
+            teacher = get_request_teacher(self.request)
             
             # Validate file type
             file = self.request.FILES.get('file')
@@ -3051,6 +3287,11 @@ class SchoolEventViewSet(viewsets.ModelViewSet):
         # All users (parents, teachers, admins) can see all events in their school
             
         return queryset
+
+    # Events drop out of the list once they end, so the tag also expires
+    @conditional_get('events', max_age=60)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
         
     def perform_create(self, serializer):
         """Set the created_by and school fields"""
@@ -3275,18 +3516,14 @@ Educite Team
 © {timezone.now().year} Educite. All rights reserved.
             """
             
-            # Send the email
-            from django.core.mail import EmailMultiAlternatives
-            
+            # Queue the email, run_outbox delivers it outside the request
             try:
-                msg = EmailMultiAlternatives(
+                enqueue_email(
                     subject=subject,
                     body=text_message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    html_body=html_message,
                     to=[user.email]
                 )
-                msg.attach_alternative(html_message, "text/html")
-                msg.send()
 
                 return Response({
                     "status": "success",
@@ -3301,7 +3538,7 @@ Educite Team
                 import logging
                 import traceback
                 logger = logging.getLogger(__name__)
-                logger.error(f"SMTP Email failed for {email}: {str(email_error)}")
+                logger.error(f"Queueing reset email failed for {email}: {str(email_error)}")
                 logger.error(f"Full email traceback: {traceback.format_exc()}")
                 
                 # For development, we can return the actual error
@@ -3434,18 +3671,14 @@ Educite School Management System
 © {timezone.now().year} Educite. All rights reserved.
             """
             
-            # Send the email
-            from django.core.mail import EmailMultiAlternatives
-            
+            # Queue the email, run_outbox delivers it outside the request
             try:
-                msg = EmailMultiAlternatives(
+                enqueue_email(
                     subject=subject,
                     body=text_message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    html_body=html_message,
                     to=[user.email]
                 )
-                msg.attach_alternative(html_message, "text/html")
-                msg.send()
 
                 return Response({
                     "status": "success",
@@ -3460,7 +3693,7 @@ Educite School Management System
                 import logging
                 import traceback
                 logger = logging.getLogger(__name__)
-                logger.error(f"SMTP Email failed for {email}: {str(email_error)}")
+                logger.error(f"Queueing reset email failed for {email}: {str(email_error)}")
                 logger.error(f"Full email traceback: {traceback.format_exc()}")
                 
                 # For development, we can return the actual error
@@ -3736,6 +3969,13 @@ class IsSuperUser(IsAuthenticated):
     def has_permission(self, request, view):
         return bool(request.user and request.user.is_authenticated and request.user.role == Role.SUPERUSER)
 
+class MetricsView(APIView):
+    """Request latency and query histograms of this process, in Prometheus text format"""
+    permission_classes = [IsSuperUser]
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 class SuperUserViewSet(viewsets.ViewSet):
     """ViewSet for superuser operations"""
     permission_classes = [IsSuperUser]
@@ -3743,17 +3983,7 @@ class SuperUserViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
         """Get superuser dashboard statistics"""
-        school_count = School.objects.count()
-        users_count = User.objects.count()
-        teachers_count = Teacher.objects.count()
-        students_count = Student.objects.count()
-        
-        return Response({
-            'school_count': school_count,
-            'users_count': users_count,
-            'teachers_count': teachers_count,
-            'students_count': students_count
-        })
+        return Response(get_global_stats())
     
     @action(detail=False, methods=['post'])
     def create_school(self, request):
@@ -3798,17 +4028,14 @@ class SuperUserViewSet(viewsets.ViewSet):
         """Get statistics for a specific school"""
         try:
             school = School.objects.get(pk=pk)
-            admin_count = User.objects.filter(school=school, role=Role.ADMIN).count()
-            teacher_count = Teacher.objects.filter(school=school).count()
-            student_count = Student.objects.filter(school=school).count()
-            parent_count = User.objects.filter(school=school, role=Role.PARENT).count()
+            school_stats = get_school_stats(school)
             
             return Response({
                 'school_name': school.name,
-                'admin_count': admin_count,
-                'teacher_count': teacher_count,
-                'student_count': student_count,
-                'parent_count': parent_count
+                'admin_count': school_stats.admin_count,
+                'teacher_count': school_stats.teacher_count,
+                'student_count': school_stats.student_count,
+                'parent_count': school_stats.parent_user_count
             })
         except School.DoesNotExist:
             return Response({'error': 'School not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -3918,7 +4145,9 @@ class DirectMessagingView(APIView):
         if user.role == Role.TEACHER:
             # Teachers can ONLY message parents of students in their assigned class
             try:
-                teacher = Teacher.objects.get(email=user.email, school=user.school)
+                teacher = get_request_teacher(request)
+                if teacher.school_id != user.school_id:
+                    raise Teacher.DoesNotExist
                 
                 if not teacher.class_assigned:
                     return Response({
@@ -4093,7 +4322,9 @@ class DirectMessagingView(APIView):
             # Additional class-based security check for teachers
             if user.role == Role.TEACHER:
                 try:
-                    teacher = Teacher.objects.get(email=user.email, school=user.school)
+                    teacher = get_request_teacher(request)
+                    if teacher.school_id != user.school_id:
+                        raise Teacher.DoesNotExist
                     if receiver.role == Role.PARENT:
                         # Verify parent has children in teacher's class
                         has_children_in_class = Student.objects.filter(
@@ -4151,7 +4382,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         # If teacher, only show records for their assigned class
         if user.role == 'teacher':
             try:
-                teacher = Teacher.objects.get(email=user.email)
+                teacher = get_request_teacher(self.request)
                 if teacher.class_assigned:
                     queryset = queryset.filter(student__class_assigned=teacher.class_assigned)
             except Teacher.DoesNotExist:
@@ -4162,76 +4393,105 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Set the recorded_by field to the current teacher"""
         try:
-            teacher = Teacher.objects.get(email=self.request.user.email)
+            teacher = get_request_teacher(self.request)
             serializer.save(recorded_by=teacher)
         except Teacher.DoesNotExist:
             raise serializers.ValidationError("Teacher profile not found")
 
     @action(detail=False, methods=['post'])
     def mark_class_attendance(self, request):
-        """Mark attendance for multiple students in a class"""
-        try:
-            teacher = Teacher.objects.get(email=request.user.email)
-            
-            if not teacher.class_assigned:
+        """
+        Mark attendance for multiple students in one batch.
+        Teachers submit `attendance` for their assigned class. Admins can
+        submit several classes of their school at once with
+        `classes: [{"class_name": ..., "attendance": [...]}]`.
+        """
+        if not request.data.get('attendance') and not request.data.get('classes'):
+            return Response(
+                {"error": "No attendance data provided"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = MarkAttendanceSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        date = data.get('date', timezone.now().date())
+
+        user = request.user
+        if user.role == Role.ADMIN:
+            if not user.school:
                 return Response(
-                    {"error": "Teacher must be assigned to a class"},
+                    {"error": "No school associated with this user"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            
-            # Get attendance data from request
-            date = request.data.get('date', timezone.now().date())
-            attendance_data = request.data.get('attendance', [])
-            
-            # Validate attendance data
-            if not attendance_data:
+            school_id = user.school_id
+            recorded_by = None
+            # Without class names the rows may belong to any class of the school
+            batches = list(data.get('classes', []))
+            if data.get('attendance'):
+                batches.append({'class_name': None, 'attendance': data['attendance']})
+        else:
+            try:
+                teacher = get_request_teacher(request)
+            except Teacher.DoesNotExist:
                 return Response(
-                    {"error": "No attendance data provided"},
+                    {"error": "Teacher profile not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if not teacher.class_assigned:
+                return Response(
+                    {"error": "Teacher must be assigned to a class"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            
-            # Get all students in the teacher's class
-            students = Student.objects.filter(
-                class_assigned=teacher.class_assigned,
-                school=teacher.school
-            )
-            
-            # Create/Update attendance records
-            attendance_records = []
-            for record in attendance_data:
-                student_id = record.get('student_id')
-                status = record.get('status')
-                reason = record.get('reason', '')
-                
-                if not student_id or not status:
-                    continue
-                    
-                try:
-                    student = students.get(id=student_id)
-                    # Create or update attendance record
-                    attendance, created = Attendance.objects.update_or_create(
-                        student=student,
-                        date=date,
-                        defaults={
-                            'status': status,
-                            'reason': reason,
-                            'recorded_by': teacher
-                        }
-                    )
-                    attendance_records.append(attendance)
-                except Student.DoesNotExist:
-                    continue
-        
-            return Response({
-                    'message': f'Attendance marked for {len(attendance_records)} students',
-                    'attendance': AttendanceSerializer(attendance_records, many=True).data
-                })
+            school_id = teacher.school_id
+            recorded_by = teacher
+            batches = [{'class_name': teacher.class_assigned, 'attendance': data.get('attendance', [])}]
+
+        # Later rows for the same student win, ON CONFLICT cannot touch a row twice
+        entries = {}
+        for batch in batches:
+            for entry in batch['attendance']:
+                entries[entry['student_id']] = (batch['class_name'], entry)
+
+        students = Student.objects.filter(school_id=school_id, id__in=list(entries)).only('id', 'class_assigned')
+        class_by_student = {student.id: student.class_assigned for student in students}
+
+        records = []
+        skipped = []
+        for student_id, (class_name, entry) in entries.items():
+            if student_id not in class_by_student or (
+                class_name is not None and class_by_student[student_id] != class_name
+            ):
+                skipped.append(str(student_id))
+                continue
+            records.append(Attendance(
+                student_id=student_id,
+                date=date,
+                status=entry['status'],
+                reason=entry['reason'],
+                recorded_by=recorded_by
+            ))
+
+        Attendance.objects.bulk_create(
+            records,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['student', 'date'],
+            update_fields=['status', 'reason', 'recorded_by']
+        )
 
-        except Teacher.DoesNotExist:
-            return Response(
-                {"error": "Teacher profile not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        # Re-read so updated rows report their stored id and created_at
+        attendance_records = Attendance.objects.filter(
+            date=date,
+            student_id__in=[record.student_id for record in records]
+        ).select_related('student', 'recorded_by').order_by('student__name')
+
+        return Response({
+            'message': f'Attendance marked for {len(records)} students',
+            'attendance': AttendanceSerializer(attendance_records, many=True).data,
+            'skipped': skipped
+        })
 
     @action(detail=False, methods=['get'])
     def class_attendance_summary(self, request):
@@ -4256,7 +4516,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 )
             else:
                 # For teachers, use their assigned class
-                teacher = Teacher.objects.get(email=user.email)
+                teacher = get_request_teacher(request)
                 if not teacher.class_assigned:
                     return Response(
                         {"error": "Teacher must be assigned to a class"},
@@ -4356,41 +4616,33 @@ class OrderViewSet(viewsets.ModelViewSet):
     def process(self, request, pk=None):
         """Mark an order as processing"""
         order = self.get_object()
-        if order.status != 'pending':
+        if not transition_orders(Order.objects.filter(pk=order.pk), 'processing'):
             return Response(
                 {"error": "Only pending orders can be processed"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        order.status = 'processing'
-        order.save()
+
+        order.refresh_from_db()
         return Response(self.get_serializer(order).data)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAdmin])
     def complete(self, request, pk=None):
         """Mark an order as completed"""
         order = self.get_object()
-        if order.status != 'processing':
+        if not transition_orders(Order.objects.filter(pk=order.pk), 'completed'):
             return Response(
                 {"error": "Only processing orders can be completed"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        order.status = 'completed'
-        order.completed_at = timezone.now()
-        order.save()
+
+        order.refresh_from_db()
         return Response(self.get_serializer(order).data)
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
-        """Cancel an order (allowed for parents and admins)"""
+        """Cancel an order (allowed for parents and admins) and return its stock"""
         order = self.get_object()
-        if order.status not in ['pending', 'processing']:
-            return Response(
-                {"error": "Only pending or processing orders can be cancelled"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
+
         # Check permissions
         user = request.user
         if user.role == Role.PARENT and order.parent != user:
@@ -4398,14 +4650,57 @@ class OrderViewSet(viewsets.ModelViewSet):
                 {"error": "You can only cancel your own orders"},
                 status=status.HTTP_403_FORBIDDEN
             )
-        
-        order.status = 'cancelled'
-        order.save()
 
-        # Return stock to inventory
-        for item in order.items.all():
-            product = item.product
-            product.stock += item.quantity
-            product.save()
+        if not cancel_orders(Order.objects.filter(pk=order.pk)):
+            return Response(
+                {"error": "Only pending or processing orders can be cancelled"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        order.refresh_from_db()
         return Response(self.get_serializer(order).data)
+
+    def _bulk_selection(self, request):
+        """
+        The admin's orders picked by a list of `ids`, the `date` they were
+        placed on (YYYY-MM-DD), or both
+        """
+        ids = request.data.get('ids')
+        placed_on = request.data.get('date')
+        if not ids and not placed_on:
+            raise ValidationError({"error": "Provide a list of order 'ids', a 'date' or both"})
+
+        orders = self.get_queryset()
+        if ids:
+            try:
+                orders = orders.filter(id__in=[uuid.UUID(str(order_id)) for order_id in ids])
+            except (TypeError, ValueError):
+                raise ValidationError({"error": "'ids' must be a list of order IDs"})
+        if placed_on:
+            try:
+                day = parse_date(str(placed_on))
+            except ValueError:
+                day = None
+            if day is None:
+                raise ValidationError({"error": "'date' must be in YYYY-MM-DD format"})
+            orders = orders.filter(created_at__date=day)
+        return orders
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdmin])
+    def bulk_complete(self, request):
+        """Complete every processing order picked by `ids` and/or `date` in one UPDATE"""
+        completed = transition_orders(self._bulk_selection(request), 'completed')
+        return Response({
+            'message': f'Completed {completed} orders',
+            'completed': completed
+        })
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdmin])
+    def bulk_cancel(self, request):
+        """Cancel every pending or processing order picked by `ids` and/or `date` and return their stock"""
+        cancelled = cancel_orders(self._bulk_selection(request))
+        return Response({
+            'message': f'Cancelled {len(cancelled)} orders',
+            'cancelled': len(cancelled),
+            'ids': cancelled
+        })
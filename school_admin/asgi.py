@@ -16,13 +16,13 @@ django.setup()
 
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
+from admin_interface.middleware import WebSocketJWTAuthMiddleware
 from admin_interface.routing import websocket_urlpatterns
 
 # Create the ASGI application
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+    "websocket": WebSocketJWTAuthMiddleware(
         URLRouter(websocket_urlpatterns)
     ),
 })
\ No newline at end of file
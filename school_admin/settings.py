@@ -92,6 +92,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'admin_interface.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -222,16 +223,42 @@ CHANNEL_LAYERS = {
     },
 }
 
+# ETag versions, the product catalog and exam analytics are only cached when
+# every worker process shares the cache; without a Redis URL each process keeps
+# its own in-memory cache and those responses are always built afresh
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+        }
+    }
+
 # Update ASGI application
 ASGI_APPLICATION = 'school_admin.asgi.application'
 
+# Seconds a WebSocket-authenticated user stays in the in-process cache
+WEBSOCKET_USER_CACHE_TTL = 60
+
+# Chat messages are written in batches of this size, or after this delay
+CHAT_BUFFER_MAX_MESSAGES = 50
+CHAT_BUFFER_MAX_DELAY_MS = 200
+
+# Most notifications replayed to a reconnecting client from its last-seen time
+NOTIFICATION_CATCH_UP_LIMIT = 200
+
+# Per-request query/latency instrumentation (Server-Timing, /api/_metrics/)
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', 'True') == 'True'
+
 # Add Authentication Backends
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
 
 # Email Configuration
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Emails are queued in OutboxEmail and delivered by `manage.py run_outbox`.
+# Set EMAIL_BACKEND=django.core.mail.backends.console.EmailBackend locally.
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -249,4 +276,8 @@ FRONTEND_URL = os.environ.get('FRONTEND_URL', 'https://educitebackend.co.ke/app'
 CRONJOBS = [
     # Run the cleanup task every day at midnight
     ('0 0 * * *', 'django.core.management.call_command', ['cleanup_past_events']),
+    # Deliver queued emails every minute
+    ('* * * * *', 'django.core.management.call_command', ['run_outbox']),
+    # Resize uploaded images every minute
+    ('* * * * *', 'django.core.management.call_command', ['run_image_variants']),
 ]